@@ -0,0 +1,71 @@
+# python -m benchmarks.codec [iterations]
+#
+# per xsd type: parsing and formatting one value with simplesoap.codec
+# against the previous functions (dateutil.parser for every date / time,
+# re.sub over isoformat, a type(value) lookup per value), then a column of
+# 1000 repeated elements parsed one at a time against decode_column
+import sys, re, timeit, datetime, decimal, dateutil.parser
+from simplesoap import codec
+from simplesoap.client import Decoder, Leaf
+
+def legacy_time(text):
+    value = dateutil.parser.parse(text)
+    return value.time().replace(tzinfo=value.tzinfo)
+
+legacy_parsers = {
+    'boolean': lambda v: {'true': True, 'false': False}[v],
+    'int': int,
+    'decimal': decimal.Decimal,
+    'double': float,
+    'dateTime': dateutil.parser.parse,
+    'date': lambda v: dateutil.parser.parse(v).date(),
+    'time': legacy_time,
+}
+
+legacy_formatters = {
+    bool: lambda v: 'true' if v else 'false',
+    datetime.date: datetime.date.isoformat,
+    datetime.time: lambda v: re.sub(r'\.\d+(\+|Z|$)', r'\1', v.isoformat()),
+    datetime.datetime: lambda v: re.sub(r'\.\d+(\+|Z|$)', r'\1', v.isoformat()),
+}
+
+CASES = [
+    # xsd type, python type, lexical value
+    ('boolean', bool, 'true'),
+    ('int', int, '123456'),
+    ('decimal', decimal.Decimal, '1234.5678'),
+    ('double', float, '3.14159'),
+    ('dateTime', datetime.datetime, '2020-01-02T03:04:05.123+02:00'),
+    ('date', datetime.date, '2020-01-02'),
+    ('time', datetime.time, '03:04:05Z'),
+]
+
+def per_value(fn, value, iterations):
+    return timeit.timeit(lambda: fn(value), number=iterations) / iterations * 1e6
+
+def main(iterations=20000):
+    print('{:9} {:>12} {:>12} {:>8} {:>12} {:>12} {:>8}'.format(
+        'type', 'parse old', 'codec', '', 'format old', 'codec', ''))
+    for name, type_, text in CASES:
+        value = codec.parsers[type_](text)
+        assert value == legacy_parsers[name](text)
+        format_old = lambda v: legacy_formatters.get(type(v), str)(v)
+        format_new = codec.formatter(type_)
+        p_old = per_value(legacy_parsers[name], text, iterations)
+        p_new = per_value(codec.parsers[type_], text, iterations)
+        f_old = per_value(format_old, value, iterations)
+        f_new = per_value(format_new, value, iterations)
+        print('{:9} {:10.2f}us {:10.2f}us {:7.1f}x {:10.2f}us {:10.2f}us {:7.1f}x'.format(
+            name, p_old, p_new, p_old / p_new, f_old, f_new, f_old / f_new))
+
+    print()
+    for name, type_, text in CASES:
+        texts = [text] * 1000
+        leaf = Leaf(type=type_)
+        t_single = timeit.timeit(lambda: [Decoder.parse_value(t, leaf) for t in texts], number=iterations // 1000 or 1)
+        t_column = timeit.timeit(lambda: codec.decode_column(texts, type_), number=iterations // 1000 or 1)
+        print('{:9} column of 1000  per value {:8.1f}us  decode_column {:8.1f}us  ({:.1f}x)'.format(
+            name, t_single / (iterations // 1000 or 1) * 1e6, t_column / (iterations // 1000 or 1) * 1e6, t_single / t_column))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
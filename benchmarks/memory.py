@@ -0,0 +1,67 @@
+# python -m benchmarks.memory REVISION [types] [operations]
+#
+# memory held by the type tree of a large synthetic schema (every type, not
+# just those the operations reach), measured with tracemalloc, plus the
+# size of a pickled snapshot of its SoapCalls. the same is measured for
+# simplesoap/client.py as of REVISION (to compare with the model before the
+# compact one: the commit before it), read with git and run against the
+# current package's other modules
+import os, sys, gc, io, types, pickle, warnings, subprocess, tracemalloc, lxml.etree
+from simplesoap import client
+from benchmarks import synthetic
+
+def legacy(revision):
+    # client.py as of revision, as a module; None when git can't give it
+    try:
+        source = subprocess.check_output(['git', 'show', '{}:simplesoap/client.py'.format(revision)],
+                                         stderr=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    module = types.ModuleType('simplesoap.client_{}'.format(revision))
+    # importable by its name, so its classes can be pickled
+    sys.modules[module.__name__] = module
+    with warnings.catch_warnings():
+        # older sources have escapes newer pythons warn about
+        warnings.simplefilter('ignore', DeprecationWarning)
+        code = compile(source, 'simplesoap/client.py@{}'.format(revision), 'exec')
+    exec(code, module.__dict__)
+    return module
+
+def measure(module, xmls):
+    # (bytes held by the type tree, bytes of the snapshot)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    type_tree = module.WsdlParser.build_type_tree(xmls)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del type_tree
+    soap_calls = module.WsdlParser.get_soap_calls(xmls)
+    metadata = [{k: v for k, v in call.__dict__.items() if k != 'transport' and not k.startswith('_')}
+                for call in soap_calls]
+    f = io.BytesIO()
+    pickler = getattr(module.Snapshot, 'Pickler', pickle.Pickler)
+    pickler(f, protocol=pickle.HIGHEST_PROTOCOL).dump(metadata)
+    return after - before, len(f.getvalue())
+
+def main(baseline=None, types=20000, operations=200):
+    # baseline: the revision to compare with, None: the current one alone
+    xmls = [lxml.etree.XML(synthetic.wsdl(types=types, operations=operations))]
+    print('{} types, {} operations:'.format(types, operations))
+    results = {}
+    module = legacy(baseline) if baseline is not None else None
+    if baseline is not None and module is None:
+        print('  before ({}): not available'.format(baseline))
+    elif module is not None:
+        results['before'] = measure(module, xmls)
+        print('  before ({}): type tree {:.1f} MB, snapshot {:.1f} MB'.format(
+            baseline, results['before'][0] / 2**20, results['before'][1] / 2**20))
+    results['now'] = measure(client, xmls)
+    print('  now: type tree {:.1f} MB, snapshot {:.1f} MB'.format(results['now'][0] / 2**20, results['now'][1] / 2**20))
+    return results
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit('usage: python -m benchmarks.memory REVISION [types] [operations]')
+    main(sys.argv[1], *[int(arg) for arg in sys.argv[2:4]])
@@ -0,0 +1,60 @@
+# python -m benchmarks.schema_index [types]
+#
+# compares resolving the named parent + qualified name of every named schema
+# element with per-element ancestor:: XPath queries (what build_type_tree
+# used to do, reproduced here) against a single SchemaIndex walk, then times
+# build_type_tree
+import sys, time, lxml.etree
+from simplesoap.client import SOAP, XML, SchemaIndex, WsdlParser
+from benchmarks import synthetic
+
+def timed(f, *args):
+    start = time.perf_counter()
+    result = f(*args)
+    return time.perf_counter() - start, result
+
+def findparents(elem, xpath, namespaces=None):
+    return elem.xpath('ancestor::%s' % xpath, namespaces=namespaces or SOAP.namespaces)
+
+def findparent(elem, xpath, namespaces=None):
+    parents = findparents(elem, xpath, namespaces)
+    return parents[-1] if parents else None
+
+def qualname(elem):
+    name = []
+    for parent in findparents(elem, '*[@name]') + [elem]:
+        ns = findparent(elem, 'xs:schema[@targetNamespace]').attrib['targetNamespace']
+        name.append('{%s}%s' % (ns, parent.attrib['name']))
+    return '/'.join(name)
+
+def xpath_lookups(xmls):
+    elems = XML.findall(xmls, './/xs:schema//*[@name]')
+    for elem in elems:
+        parent = findparent(elem, '*[@name]', elem.nsmap)
+        qualname(elem)
+        if parent is not None:
+            qualname(parent)
+    return len(elems)
+
+def index_lookups(xmls):
+    index = SchemaIndex(xmls)
+    elems = [e for e in index.findall(attrib='name') if e in index.qualnames]
+    for elem in elems:
+        parent = index.parent(elem)
+        index.qualname(elem)
+        if parent is not None:
+            index.qualname(parent)
+    return len(elems)
+
+def main(types=10000):
+    xmls = [lxml.etree.XML(synthetic.wsdl(types=types, operations=100))]
+    t_index, n = timed(index_lookups, xmls)
+    print('{} named schema elements ({} types)'.format(n, types))
+    print('SchemaIndex walk + lookups:  {:8.3f}s'.format(t_index))
+    t_xpath, _ = timed(xpath_lookups, xmls)
+    print('ancestor:: XPath lookups:    {:8.3f}s  ({:.0f}x slower)'.format(t_xpath, t_xpath / t_index))
+    t_build, _ = timed(WsdlParser.build_type_tree, xmls)
+    print('build_type_tree:             {:8.3f}s'.format(t_build))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
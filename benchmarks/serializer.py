@@ -0,0 +1,123 @@
+# python -m benchmarks.serializer [iterations]
+#
+# per-call request serialization: the compiled Serializer plan against the
+# previous approach: a copy of the type tree with the values set on it,
+# written out with lxml. the library no longer has it; this is the original
+# code, fixed where it was broken so it writes the same envelopes
+import sys, copy, timeit, collections.abc, lxml.etree, lxml.builder
+from simplesoap.client import SOAP, WsdlParser, Leaf, Node
+from benchmarks import synthetic
+
+XSI_NIL = '{%s}nil' % SOAP.namespaces['xsi']
+_unset = object()
+
+class Empty(Exception):
+    # nothing to write for a field
+    pass
+
+def copied(template):
+    # leaves, and nodes one level only: update_over copies the children it
+    # writes to
+    if isinstance(template, Leaf):
+        return copy.copy(template)
+    node = Node(template.restriction)
+    node.base = template.base
+    node.type = template.type
+    node.inherited = template.inherited
+    node.occurs = template.occurs
+    for k, v in dict.items(template):
+        dict.__setitem__(node, k, v)
+    return node
+
+def update_over(node, other_k, other_v, values):
+    # sets the values of a user dict on this (copied) node; every child it
+    # touches is copied first. values: id(copied leaf) -> its value
+    if other_v is None:
+        return
+    if not isinstance(other_v, collections.abc.Mapping):
+        if node.type is None:
+            raise ValueError('{} takes a dict, not {!r}'.format(other_k or 'body', other_v))
+        other_v = {'#text': other_v}
+    for k, v in other_v.items():
+        try:
+            existing = node[k]
+        except KeyError:
+            if k != '#text' or node.type is None:
+                raise ValueError('{} has no field {!r}'.format(other_k or 'body', k))
+            existing = Leaf(type=node.type)
+        if isinstance(existing, list):
+            if not isinstance(v, (list, tuple)):
+                v = [v]
+            node[k] = [updated(existing[0], k, item, values) for item in v]
+        else:
+            node[k] = updated(existing, k, v, values)
+
+def updated(template, k, v, values):
+    if isinstance(template, Node):
+        node = copied(template)
+        update_over(node, k, v, values)
+        return node
+    leaf = copied(template)
+    values[id(leaf)] = v
+    return leaf
+
+def leaf_xml(leaf, values):
+    value = values.get(id(leaf), _unset)
+    if value is _unset:
+        if leaf.default is Leaf._sentinel:
+            raise Empty
+        value = leaf.default
+    formatted = SOAP.formatters[type(value)](value)
+    return '' if formatted is None else formatted
+
+def node_xml(node, values, root=None, nsmap=None):
+    E = lxml.builder.ElementMaker(namespace=node.get('#namespace'), nsmap=nsmap)
+    elem = E(root)
+    for k in node.keys():
+        v = node[k]
+        try:
+            if k == '#text':
+                elem.text = leaf_xml(v, values)
+            elif k.startswith('#'):
+                pass
+            elif k.startswith('@'):
+                elem.attrib[k[1:]] = leaf_xml(v, values)
+            else:
+                for v in v if isinstance(v, list) else [v]:
+                    if isinstance(v, Leaf):
+                        child = E(k)
+                        if values.get(id(v), _unset) is None:
+                            child.attrib[XSI_NIL] = 'true'
+                        else:
+                            child.text = leaf_xml(v, values)
+                    else:
+                        child = node_xml(v, values, root=k, nsmap=nsmap)
+                    elem.append(child)
+        except Empty:
+            continue
+    if not len(elem) and not elem.attrib and not elem.text:
+        raise Empty
+    return elem
+
+def legacy_envelope(call, body):
+    values = {}
+    input_body = copied(call.input_body)
+    update_over(input_body, None, body, values)
+    envelope = lxml.builder.ElementMaker(namespace=SOAP.namespaces['soapenv'], nsmap=SOAP.namespaces)('Envelope')
+    envelope.append(node_xml(input_body, values, root='Body', nsmap=SOAP.namespaces))
+    return lxml.etree.tostring(envelope, xml_declaration=True, encoding='UTF-8')
+
+def main(iterations=2000):
+    xmls = [lxml.etree.XML(synthetic.wsdl(types=40, operations=40))]
+    calls = {call.name: call for call in WsdlParser.get_soap_calls(xmls)}
+    for name in ['Op1', 'Op21', 'Op39']:
+        call = calls[name]
+        body = synthetic.sample(call.input_body, depth=2)
+        call.build_envelope(body=body) # compile the plan outside the timing
+        t_legacy = timeit.timeit(lambda: legacy_envelope(call, body), number=iterations) / iterations
+        t_plan = timeit.timeit(lambda: call.build_envelope(body=body), number=iterations) / iterations
+        print('{:5} {:6d} bytes  copied tree + lxml {:8.1f}us  compiled plan {:8.1f}us  ({:.1f}x)'.format(
+            name, len(call.build_envelope(body=body)), t_legacy * 1e6, t_plan * 1e6, t_legacy / t_plan))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,90 @@
+# python -m benchmarks.server [port] [types] [operations]
+#
+# in-process stand-in for a SOAP service described by a synthetic WSDL:
+# every operation answers with one canonical response (synthetic.sample of
+# its output type), built once, whatever the request. the WSDL itself is
+# served on GET, so clients can load it from Server.url + '?wsdl'. request
+# bodies are read and dropped, compressed or not; with compress=True responses
+# are gzipped for the clients that accept it
+import sys, gzip, threading, http.server, lxml.etree
+from simplesoap.client import WsdlParser, Serializer
+from benchmarks import synthetic
+
+class Server(object):
+    def __init__(self, port=0, sample_depth=2, compress=False, **knobs):
+        # knobs: synthetic.wsdl's (types, operations, fields, depth, ...)
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', port), self.Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.server = self
+        self.url = 'http://127.0.0.1:{}/bench'.format(self.httpd.server_address[1])
+        self.wsdl = synthetic.wsdl(url=self.url, **knobs)
+        self.requests = 0
+        self.compress = compress
+        self.responses = {}
+        for call in WsdlParser.get_soap_calls([lxml.etree.XML(self.wsdl)]):
+            name = '{%s}%sResponse' % (synthetic.TNS, call.name)
+            body = synthetic.sample(call.output_body, depth=sample_depth)
+            self.responses[call.SOAPAction] = Serializer(body_tree=call.output_body, body_name=name).envelope(body=body)
+        self.thread = None
+    
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+    
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+    
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # headers and body in one write: unbuffered, the separate small
+        # writes meet delayed ACKs and each call waits ~40ms
+        wbufsize = -1
+        
+        def do_GET(self):
+            self.send(200, self.server.server.wsdl)
+        
+        def do_POST(self):
+            if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+                while True:
+                    size = int(self.rfile.readline().split(b';')[0], 16)
+                    self.rfile.read(size + 2)
+                    if not size:
+                        break
+            else:
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            server = self.server.server
+            server.requests += 1
+            response = server.responses.get(self.headers.get('SOAPAction', '').strip('"'))
+            if response is None:
+                self.send(404, b'unknown SOAPAction')
+            else:
+                self.send(200, response)
+        
+        def send(self, status, content):
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/xml; charset=utf-8')
+            if self.server.server.compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                content = gzip.compress(content, 1)
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        
+        def log_message(self, *args):
+            pass
+
+def main(port=8080, types=100, operations=10):
+    server = Server(port=port, types=types, operations=operations)
+    print('serving {} operations on {} (WSDL: {}?wsdl)'.format(len(server.responses), server.url, server.url))
+    server.httpd.serve_forever()
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,165 @@
+# python -m benchmarks.suite [--types N] [--operations N] [--depth N] [--extensions N]
+#                            [--choices N] [--restrictions N] [--calls N] [--concurrency 1,4,16]
+#                            [--repeat N] [--output results.json]
+#
+# the tracked benchmarks, against a synthetic WSDL and the in-process
+# benchmarks.server stand-in:
+# - startup: Client from scratch (and its phases), from a snapshot, shared
+# - per call: envelope serialization, response parsing (dicts and views)
+# - end to end: calls / second through SoapCall.map at each concurrency
+# - memory: traced peaks of a cold startup and of parsing a response
+# results are printed and written as JSON ({"meta": ..., "results": [...]},
+# one {"name", "value", "unit", "params"} per measurement) for tracking
+import os, json, time, argparse, platform, statistics, subprocess, tempfile, tracemalloc, datetime
+import simplesoap.client
+from simplesoap.client import Client, Transport
+from simplesoap.metrics import Metrics
+from benchmarks import synthetic
+from benchmarks.server import Server
+
+def median_time(f, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def traced_peak(f):
+    tracemalloc.start()
+    try:
+        f()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class Suite(object):
+    def __init__(self, knobs, calls=2000, concurrency=(1, 4, 16), repeat=5):
+        self.knobs = knobs
+        self.calls = calls
+        self.concurrency = concurrency
+        self.repeat = repeat
+        self.results = []
+    
+    def record(self, name, value, unit, **params):
+        self.results.append({'name': name, 'value': value, 'unit': unit, 'params': params})
+        print('{:40} {:>14.6g} {:6} {}'.format(name, value, unit, ' '.join('{}={}'.format(k, v) for k, v in params.items())))
+    
+    def run(self):
+        with Server(**self.knobs) as server, tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.wsdl')
+            with open(path, 'wb') as f:
+                f.write(server.wsdl)
+            snapshots = simplesoap.client.Snapshot.directory
+            simplesoap.client.Snapshot.directory = os.path.join(directory, 'snapshots')
+            try:
+                self.startup(path)
+                client = Client(path, transport=Transport(pool_maxsize=max(self.concurrency)))
+                self.per_call(client, server)
+                self.end_to_end(client, server)
+                self.memory(path, client, server)
+                client.close()
+            finally:
+                simplesoap.client.Snapshot.directory = snapshots
+        return self.results
+    
+    def startup(self, path):
+        metrics = Metrics()
+        def cold():
+            Client(path, shared=False, snapshot=False, observers=[metrics]).close()
+        self.record('startup.cold', median_time(cold, self.repeat), 's')
+        for phase, summary in metrics.summary()['startup'].items():
+            if phase != 'total':
+                self.record('startup.cold.' + phase, summary['sum'] / summary['count'], 's')
+        Client(path, shared=False, snapshot=True).close() # writes the snapshot
+        self.record('startup.snapshot', median_time(lambda: Client(path, shared=False, snapshot=True).close(), self.repeat), 's')
+        keep = Client(path, snapshot=False)
+        self.record('startup.shared', median_time(lambda: Client(path, snapshot=False).close(), self.repeat), 's')
+        keep.close()
+    
+    def operations(self, client):
+        # a few operations spread over the WSDL, with a request body each
+        names = sorted(client._operations, key=lambda name: int(name[2:]))
+        names = sorted(set(names[i * (len(names) - 1) // 2] for i in range(3)), key=lambda name: int(name[2:]))
+        for name in names:
+            call = getattr(client, name)
+            yield name, call, synthetic.sample(call.input_body, depth=2)
+    
+    def per_call(self, client, server):
+        iterations = max(self.calls // 10, 10)
+        for name, call, body in self.operations(client):
+            envelope = call.build_envelope(body=body)
+            response = server.responses[call.SOAPAction]
+            self.record('call.serialize', median_time(lambda: call.build_envelope(body=body), iterations), 's',
+                        operation=name, request_bytes=len(envelope))
+            self.record('call.parse', median_time(lambda: call.parse_response(response), iterations), 's',
+                        operation=name, response_bytes=len(response))
+            self.record('call.parse_view', median_time(lambda: call.parse_view(response), iterations), 's',
+                        operation=name, response_bytes=len(response))
+    
+    def end_to_end(self, client, server):
+        name, call, body = next(self.operations(client))
+        call(body=body) # connect outside the timing
+        metrics = Metrics()
+        client.observers.append(metrics)
+        try:
+            for workers in self.concurrency:
+                metrics.clear()
+                start = time.perf_counter()
+                errors = sum(result.error is not None for result in call.map([body] * self.calls, workers=workers))
+                elapsed = time.perf_counter() - start
+                self.record('e2e.throughput', self.calls / elapsed, 'call/s', operation=name, concurrency=workers, errors=errors)
+                phases = metrics.summary()['calls'][name, call.url]['phases']
+                for phase in ('serialize', 'network', 'parse'):
+                    self.record('e2e.' + phase + '.mean', phases[phase]['mean'], 's', operation=name, concurrency=workers)
+        finally:
+            client.observers.remove(metrics)
+    
+    def memory(self, path, client, server):
+        self.record('memory.startup.peak', traced_peak(lambda: Client(path, shared=False, snapshot=False)) / 2**20, 'MB')
+        name, call, body = next(self.operations(client))
+        response = server.responses[call.SOAPAction]
+        self.record('memory.parse.peak', traced_peak(lambda: call.parse_response(response)) / 2**20, 'MB',
+                    operation=name, response_bytes=len(response))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+    parser.add_argument('--types', type=int, default=200)
+    parser.add_argument('--operations', type=int, default=50)
+    parser.add_argument('--fields', type=int, default=5)
+    parser.add_argument('--depth', type=int, default=1)
+    parser.add_argument('--extensions', type=int, default=1)
+    parser.add_argument('--choices', type=int, default=0)
+    parser.add_argument('--restrictions', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--concurrency', default='1,4,16')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args(argv)
+    knobs = {k: getattr(args, k) for k in ('types', 'operations', 'fields', 'depth', 'extensions', 'choices', 'restrictions', 'seed')}
+    concurrency = tuple(int(c) for c in args.concurrency.split(','))
+    results = Suite(knobs, calls=args.calls, concurrency=concurrency, repeat=args.repeat).run()
+    document = {'meta': {'version': simplesoap.client.__version__,
+                         'commit': commit(),
+                         'python': platform.python_version(),
+                         'platform': platform.platform(),
+                         'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                         'knobs': knobs,
+                         'calls': args.calls,
+                         'concurrency': concurrency},
+                'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+    return document
+
+if __name__ == '__main__':
+    main()
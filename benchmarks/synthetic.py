@@ -0,0 +1,118 @@
+import random, datetime, decimal
+from simplesoap.client import Leaf, Node
+
+TNS = 'urn:simplesoap:bench'
+
+HEADER = '''<?xml version="1.0" encoding="UTF-8"?>
+<wsdl:definitions xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/" xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/" xmlns:xs="http://www.w3.org/2001/XMLSchema" xmlns:tns="{tns}" targetNamespace="{tns}">
+  <wsdl:types>
+    <xs:schema targetNamespace="{tns}" elementFormDefault="qualified">
+'''
+
+SCALARS = ['xs:string', 'xs:int', 'xs:boolean', 'xs:decimal', 'xs:dateTime', 'xs:date']
+
+# named simple types for the `restrictions` knob, and values satisfying them
+RESTRICTED = '''
+<xs:simpleType name="Code"><xs:restriction base="xs:string"><xs:pattern value="[A-Z]{3}-[0-9]+"/></xs:restriction></xs:simpleType>
+<xs:simpleType name="Status"><xs:restriction base="xs:string"><xs:enumeration value="active"/><xs:enumeration value="closed"/></xs:restriction></xs:simpleType>
+<xs:simpleType name="Amount"><xs:restriction base="xs:decimal"><xs:minInclusive value="0"/><xs:maxInclusive value="1000000"/><xs:fractionDigits value="2"/></xs:restriction></xs:simpleType>
+<xs:simpleType name="Label"><xs:restriction base="xs:string"><xs:maxLength value="40"/></xs:restriction></xs:simpleType>
+'''
+RESTRICTED_TYPES = ['Code', 'Status', 'Amount', 'Label']
+PATTERN_SAMPLES = {'[A-Z]{3}-[0-9]+': 'ABC-123'}
+
+def nested(depth):
+    # `depth` levels of anonymous complex types
+    if depth <= 0:
+        return ''
+    return ('<xs:element name="nested" minOccurs="0"><xs:complexType><xs:sequence>'
+            '<xs:element name="value" type="xs:string"/>{}</xs:sequence></xs:complexType></xs:element>'.format(nested(depth - 1)))
+
+def wsdl(types=100, operations=10, fields=5, seed=0, url='http://127.0.0.1:8080/bench',
+         depth=1, extensions=1, choices=0, restrictions=0):
+    # complexTypes Type0..TypeN, each with `fields` scalar fields, a repeated
+    # string, `depth` levels of anonymous nested elements and a reference to
+    # an earlier type. types come in extension chains: each type but every
+    # (extensions + 1)th extends the one before it. optionally `restrictions`
+    # fields of restricted simple types and a choice between `choices`
+    # elements. operation i takes / returns Type(i % types)
+    rnd = random.Random(seed)
+    parts = [HEADER.format(tns=TNS)]
+    if restrictions:
+        parts.append(RESTRICTED)
+    for i in range(types):
+        body = []
+        for j in range(fields):
+            body.append('<xs:element name="field{}" type="{}" minOccurs="0"/>'.format(j, rnd.choice(SCALARS)))
+        body.append('<xs:element name="tags" type="xs:string" minOccurs="0" maxOccurs="unbounded"/>')
+        body.append(nested(depth))
+        if i:
+            body.append('<xs:element name="ref" type="tns:Type{}" minOccurs="0"/>'.format(rnd.randrange(i)))
+        for j in range(restrictions):
+            body.append('<xs:element name="restricted{}" type="tns:{}" minOccurs="0"/>'.format(j, RESTRICTED_TYPES[j % len(RESTRICTED_TYPES)]))
+        if choices:
+            body.append('<xs:choice>{}</xs:choice>'.format(''.join(
+                '<xs:element name="choice{}" type="xs:string"/>'.format(j) for j in range(choices))))
+        sequence = '<xs:sequence>{}</xs:sequence><xs:attribute name="id" type="xs:string"/>'.format(''.join(body))
+        if i % (extensions + 1):
+            parts.append('<xs:complexType name="Type{}"><xs:complexContent><xs:extension base="tns:Type{}">{}'
+                         '</xs:extension></xs:complexContent></xs:complexType>\n'.format(i, i - 1, sequence))
+        else:
+            parts.append('<xs:complexType name="Type{}">{}</xs:complexType>\n'.format(i, sequence))
+    for i in range(operations):
+        parts.append('<xs:element name="Op{0}Request" type="tns:Type{1}"/>\n'
+                     '<xs:element name="Op{0}Response" type="tns:Type{1}"/>\n'.format(i, i % types))
+    parts.append('</xs:schema>\n  </wsdl:types>\n')
+    for i in range(operations):
+        parts.append('<wsdl:message name="Op{0}Input"><wsdl:part name="parameters" element="tns:Op{0}Request"/></wsdl:message>\n'
+                     '<wsdl:message name="Op{0}Output"><wsdl:part name="parameters" element="tns:Op{0}Response"/></wsdl:message>\n'.format(i))
+    parts.append('<wsdl:portType name="BenchPortType">\n')
+    for i in range(operations):
+        parts.append('<wsdl:operation name="Op{0}"><wsdl:input message="tns:Op{0}Input"/>'
+                     '<wsdl:output message="tns:Op{0}Output"/></wsdl:operation>\n'.format(i))
+    parts.append('</wsdl:portType>\n<wsdl:binding name="BenchBinding" type="tns:BenchPortType">\n'
+                 '<soap:binding style="document" transport="http://schemas.xmlsoap.org/soap/http"/>\n')
+    for i in range(operations):
+        parts.append('<wsdl:operation name="Op{0}"><soap:operation soapAction="{1}#Op{0}"/>'
+                     '<wsdl:input><soap:body use="literal"/></wsdl:input>'
+                     '<wsdl:output><soap:body use="literal"/></wsdl:output></wsdl:operation>\n'.format(i, TNS))
+    parts.append('</wsdl:binding>\n<wsdl:service name="BenchService"><wsdl:port name="BenchPort" binding="tns:BenchBinding">'
+                 '<soap:address location="{}"/></wsdl:port></wsdl:service>\n</wsdl:definitions>\n'.format(url))
+    return ''.join(parts).encode()
+
+SAMPLES = {
+    str: 'sample value',
+    int: 42,
+    bool: True,
+    float: 1.5,
+    decimal.Decimal: decimal.Decimal('12.34'),
+    datetime.datetime: datetime.datetime(2020, 1, 2, 3, 4, 5),
+    datetime.date: datetime.date(2020, 1, 2),
+}
+
+def sample(type_tree, depth=3, repeat=3):
+    # a request / response body filling every field of a type tree, following
+    # nested types `depth` levels deep and repeating lists `repeat` times
+    if isinstance(type_tree, Leaf):
+        restriction = type_tree.restriction
+        if restriction is not None and restriction.enumeration:
+            return restriction.enumeration[0]
+        if restriction is not None and restriction.pattern:
+            return PATTERN_SAMPLES.get(restriction.pattern[0], 'sample value')
+        return SAMPLES.get(type_tree.type, 'sample value')
+    if depth < 0:
+        return None
+    body = {}
+    # one alternative of a choice
+    skipped = type_tree.restriction.choices[1:] if type_tree.restriction is not None and type_tree.restriction.choices else ()
+    for k in type_tree.keys():
+        if k.startswith('#') or k in skipped:
+            continue
+        v = type_tree[k]
+        if isinstance(v, list):
+            body[k] = [sample(v[0], depth - 1, repeat) for _ in range(repeat)]
+        elif isinstance(v, Node) and depth == 0:
+            continue
+        else:
+            body[k] = sample(v, depth - 1, repeat)
+    return body
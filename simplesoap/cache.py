@@ -0,0 +1,446 @@
+import os, re, time, json, asyncio, hashlib, tempfile, threading, collections, requests
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class WsdlCache(object):
+    # downloaded WSDL / schema documents on disk, shared by every process
+    # using the same directory. an entry is <sha1 of the url> with the
+    # document and <sha1>.meta with the validators the server sent (ETag,
+    # Last-Modified). the document's mtime is when it was last fetched or
+    # revalidated and its atime when it was last used:
+    # - younger than ttl: served from disk without a request
+    # - older: revalidated with If-None-Match / If-Modified-Since, a 304 only
+    #   refreshes the mtime
+    # - the server can't be reached: the stale copy is served
+    # fetches hold a lock on <sha1>.lock (fcntl, where there is one, removed
+    # after the fetch) so of many workers starting at once only one
+    # downloads, the others read its result. files are written to a temp file and renamed into place, and
+    # once the directory grows over max_size the least recently used
+    # entries are removed
+    entry_name = re.compile('^[0-9a-f]{40}$')
+    
+    def __init__(self, directory=os.path.join('/', 'tmp', 'wsdls'), ttl=24 * 60 * 60, max_size=256 * 2**20, timeout=60, session=None):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self.timeout = timeout
+        self.session = session or requests
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.stale = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+        self._directory_created = False
+    
+    def count(self, counter):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+    
+    def stats(self):
+        with self._stats_lock:
+            return {'hits': self.hits, 'misses': self.misses, 'revalidations': self.revalidations,
+                    'stale': self.stale, 'evictions': self.evictions}
+    
+    def filename(self, url):
+        if not self._directory_created:
+            os.makedirs(self.directory, exist_ok=True)
+            self._directory_created = True
+        return os.path.join(self.directory, hashlib.sha1(url.encode()).hexdigest())
+    
+    def get(self, url):
+        filename = self.filename(url)
+        content = self.read_fresh(filename)
+        if content is not None:
+            self.count('hits')
+            return content
+        with self.Lock(filename):
+            # someone else may have fetched it while we waited for the lock
+            content = self.read_fresh(filename)
+            if content is not None:
+                self.count('hits')
+                return content
+            return self.fetch(url, filename)
+    
+    def read_fresh(self, filename):
+        try:
+            mtime = os.stat(filename).st_mtime
+            if self.ttl is not None and time.time() - mtime > self.ttl:
+                return None
+            with open(filename, 'rb') as f:
+                content = f.read()
+            os.utime(filename, (time.time(), mtime))
+            return content
+        except FileNotFoundError:
+            return None
+    
+    def fetch(self, url, filename):
+        meta = self.read_meta(filename)
+        headers = {}
+        if os.path.exists(filename):
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last-modified'):
+                headers['If-Modified-Since'] = meta['last-modified']
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException:
+            content = self.read_stale(filename)
+            if content is None:
+                raise
+            self.count('stale')
+            return content
+        
+        if response.status_code == 304:
+            content = self.read_stale(filename)
+            if content is not None:
+                now = time.time()
+                os.utime(filename, (now, now))
+                self.count('revalidations')
+                return content
+            # deleted meanwhile
+            response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        content = response.content
+        self.write(filename, content)
+        self.write(filename + '.meta', json.dumps({'url': url,
+                                                   'etag': response.headers.get('ETag'),
+                                                   'last-modified': response.headers.get('Last-Modified')}).encode())
+        self.count('misses')
+        self.evict(keep=filename)
+        return content
+    
+    @staticmethod
+    def read_stale(filename):
+        try:
+            with open(filename, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    
+    @staticmethod
+    def read_meta(filename):
+        try:
+            with open(filename + '.meta', 'rb') as f:
+                return json.loads(f.read().decode())
+        except (FileNotFoundError, ValueError):
+            return {}
+    
+    def write(self, filename, content):
+        # write + rename so concurrent readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp, filename)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    
+    class Lock(object):
+        # the lock file is removed by its holder once done. whoever was
+        # waiting for it then holds a lock on a removed file: that one is
+        # dropped and the lock taken again on the file now at the path
+        def __init__(self, filename):
+            self.filename = filename + '.lock'
+            self.f = None
+        def __enter__(self):
+            if fcntl is not None:
+                while True:
+                    self.f = open(self.filename, 'ab')
+                    fcntl.flock(self.f, fcntl.LOCK_EX)
+                    try:
+                        if os.path.samestat(os.fstat(self.f.fileno()), os.stat(self.filename)):
+                            break
+                    except FileNotFoundError:
+                        pass
+                    self.f.close()
+            return self
+        def __exit__(self, *exc_info):
+            if self.f is not None:
+                try:
+                    os.unlink(self.filename)
+                except FileNotFoundError:
+                    pass
+                fcntl.flock(self.f, fcntl.LOCK_UN)
+                self.f.close()
+                self.f = None
+    
+    def entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not self.entry_name.match(entry.name) or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, entry.path))
+        return entries
+    
+    def evict(self, keep=None):
+        if self.max_size is None:
+            return
+        entries = self.entries()
+        size = sum(size for _, size, _ in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            if path == keep:
+                continue
+            for filename in (path, path + '.meta'):
+                try:
+                    os.unlink(filename)
+                except FileNotFoundError:
+                    pass
+            size -= entry_size
+            self.count('evictions')
+    
+    def clear(self):
+        for _, _, path in self.entries():
+            for filename in (path, path + '.meta'):
+                try:
+                    os.unlink(filename)
+                except FileNotFoundError:
+                    pass
+
+class ResponseCache(object):
+    # opt-in cache of the responses of idempotent operations (see
+    # Client.cache): successful, non-MTOM response bodies keyed by a sha256
+    # of url, SOAPAction and request envelope (whose layout the Serializer
+    # fixes, whatever the order of the keys given), kept `ttl` seconds in a
+    # store: MemoryStore (per process, the default) or DiskStore (shared).
+    # identical requests made while one is in flight wait for it instead of
+    # going out too (single-flight), and share its result or its error.
+    # hits are parsed again, so every caller gets its own objects
+    def __init__(self, ttl=300, store=None, max_entries=1024, max_size=64 * 2**20):
+        self.ttl = ttl
+        self.store = store if store is not None else MemoryStore(max_entries=max_entries, max_size=max_size)
+        self.hits = 0
+        self.misses = 0
+        self.merged = 0
+        self._inflight = {}
+        self._async_inflight = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(url, action, envelope):
+        h = hashlib.sha256()
+        for part in (url, action):
+            h.update((part or '').encode())
+            h.update(b'\0')
+        h.update(envelope)
+        return h.hexdigest()
+    
+    class Flight(object):
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+    
+    def get(self, key, fetch):
+        # the cached content for key, or what fetch() returns: (result, keep),
+        # result being stored (it must be bytes then) when keep is true
+        content = self.store.get(key)
+        if content is not None:
+            with self._lock:
+                self.hits += 1
+            return content
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = self.Flight()
+                self.misses += 1
+            else:
+                self.merged += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            result, keep = fetch()
+            if keep:
+                self.store.put(key, result, self.ttl)
+            flight.result = result
+            return result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+    
+    async def aget(self, key, fetch):
+        # get() for coroutines: fetch is a coroutine function, followers
+        # await the leader's future
+        content = self.store.get(key)
+        if content is not None:
+            self.hits += 1
+            return content
+        future = self._async_inflight.get(key)
+        if future is not None:
+            self.merged += 1
+            return await asyncio.shield(future)
+        self.misses += 1
+        future = self._async_inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result, keep = await fetch()
+            if keep:
+                self.store.put(key, result, self.ttl)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception() # retrieved: no warning when nobody was waiting
+            raise
+        finally:
+            del self._async_inflight[key]
+    
+    def stats(self):
+        with self._lock:
+            stats = {'hits': self.hits, 'misses': self.misses, 'merged': self.merged}
+        stats.update(self.store.stats())
+        return stats
+    
+    def clear(self):
+        self.store.clear()
+
+class MemoryStore(object):
+    # key -> (expiry, content), least recently used first; bounded by number
+    # of entries and total size of the contents
+    def __init__(self, max_entries=1024, max_size=64 * 2**20):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, content = entry
+            if expires is not None and expires < time.monotonic():
+                self.remove(key)
+                self.expirations += 1
+                return None
+            self.entries.move_to_end(key)
+            return content
+    
+    def put(self, key, content, ttl=None):
+        with self._lock:
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (time.monotonic() + ttl if ttl is not None else None, content)
+            self.size += len(content)
+            while self.entries and ((self.max_entries is not None and len(self.entries) > self.max_entries) or
+                                    (self.max_size is not None and self.size > self.max_size)):
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+    
+    def remove(self, key):
+        _, content = self.entries.pop(key)
+        self.size -= len(content)
+    
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self.entries), 'size': self.size, 'evictions': self.evictions, 'expirations': self.expirations}
+    
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+
+class DiskStore(object):
+    # entries as files <key> in a directory shared by processes, written
+    # atomically as in WsdlCache; a file's mtime is its expiry and its atime
+    # its last use, the least recently used going once the directory grows
+    # over max_size
+    entry_name = re.compile('^[0-9a-f]{64}$')
+    
+    def __init__(self, directory=os.path.join('/', 'tmp', 'simplesoap-responses'), max_size=256 * 2**20):
+        self.directory = directory
+        self.max_size = max_size
+        self.evictions = 0
+        self.expirations = 0
+        os.makedirs(directory, exist_ok=True)
+    
+    def get(self, key):
+        filename = os.path.join(self.directory, key)
+        try:
+            expires = os.stat(filename).st_mtime
+            if expires < time.time():
+                os.unlink(filename)
+                self.expirations += 1
+                return None
+            with open(filename, 'rb') as f:
+                content = f.read()
+            os.utime(filename, (time.time(), expires))
+            return content
+        except FileNotFoundError:
+            return None
+    
+    def put(self, key, content, ttl=None):
+        filename = os.path.join(self.directory, key)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            now = time.time()
+            # no ttl: a year
+            os.utime(tmp, (now, now + (ttl if ttl is not None else 365 * 24 * 60 * 60)))
+            os.replace(tmp, filename)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.evict(keep=filename)
+    
+    def entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not self.entry_name.match(entry.name):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, entry.path))
+        return entries
+    
+    def evict(self, keep=None):
+        if self.max_size is None:
+            return
+        entries = self.entries()
+        size = sum(size for _, size, _ in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+            self.evictions += 1
+    
+    def stats(self):
+        entries = self.entries()
+        return {'entries': len(entries), 'size': sum(size for _, size, _ in entries),
+                'evictions': self.evictions, 'expirations': self.expirations}
+    
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
@@ -1,23 +1,126 @@
-import lxml.etree, lxml.builder, requests, hashlib, os, decimal, dateutil.relativedelta, dateutil.parser, datetime, collections, re, itertools, reprlib, copy, textwrap, functools
+import lxml.etree, requests, queue, requests.adapters, urllib3.util.retry, hashlib, os, stat, decimal, dateutil.relativedelta, dateutil.parser, datetime, collections, collections.abc, re, itertools, reprlib, textwrap, functools, threading, asyncio, concurrent.futures, pickle, tempfile, io, numbers, operator, urllib.parse, weakref, sys, time, logging
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from simplesoap import codec, mtom, metrics
+from simplesoap.cache import WsdlCache, ResponseCache
+from simplesoap.resilience import Policy, DeadlineExceeded, CircuitOpen, Body
+from simplesoap.compression import Compression
+
+__version__ = '0.1.4'
+
+logger = logging.getLogger(__name__)
 
 STRICT_MODE = True
 
 class Client(object):
-    def __init__(self, wsdls):
+    soap_call_class = None
+    
+    def __init__(self, wsdls, transport=None, snapshot=True, lazy=False, shared=True, observers=None, policy=None):
+        # observers: callables given a metrics.StartupEvent for this client
+        # and a metrics.CallEvent per call of its operations (see Metrics);
+        # the list can be appended to later. policy: the resilience.Policy
+        # (deadline, retries, hedging, circuit breaking) of its operations,
+        # unless one is set on an operation itself
         self._wsdls = wsdls
+        self.transport = transport or Transport()
+        self.observers = list(observers or ())
+        self.policy = policy
         if isinstance(wsdls, str):
             wsdls = [wsdls]
-        xmls = []
-        for wsdl in wsdls:
-            xmls.append(WsdlParser.get_wsdl_xml(wsdl))
-        soap_calls = WsdlParser.get_soap_calls(xmls)
-        for call in soap_calls:
-            setattr(self, call.name, call)
-        xmls
+        start = metrics.clock()
+        phases = metrics.Phases()
+        with phases('fetch'):
+            documents = WsdlLoader().load(wsdls)
+        key = Snapshot.key([document.content for document in documents])
+        build = functools.partial(self.build, documents, key, snapshot, lazy, phases)
+        templates = Registry.get((key, lazy), build) if shared else build()
+        # this client's own copies of the (shared) calls, with its transport;
+        # bound on first access
+        self._operations = BoundSoapCalls(templates, self.transport, self.soap_call_class, self.observers, policy)
+        self.check_names()
+        if self.observers:
+            metrics.emit(self.observers, metrics.StartupEvent(wsdls, dict(phases), metrics.clock() - start))
+    
+    @staticmethod
+    def build(documents, key, snapshot=True, lazy=False, phases=None):
+        phases = phases if phases is not None else metrics.Phases()
+        if lazy:
+            # operations are resolved (and set as attributes) on first access
+            with phases('parse'):
+                return LazySoapCalls([document.xml for document in documents])
+        soap_calls = None
+        if snapshot:
+            with phases('snapshot'):
+                soap_calls = Snapshot.load(key)
+        if soap_calls is None:
+            with phases('parse'):
+                xmls = [document.xml for document in documents]
+            soap_calls = WsdlParser.get_soap_calls(xmls, phases=phases)
+            if snapshot:
+                with phases('snapshot'):
+                    Snapshot.save(key, soap_calls)
+        return SoapCalls((call.name, call) for call in soap_calls)
+    
+    def __getattr__(self, name):
+        operations = self.__dict__.get('_operations')
+        if operations is None or name not in operations:
+            raise AttributeError("'{}' object has no attribute '{}'".format(self.__class__.__name__, name))
+        call = operations[name]
+        setattr(self, name, call)
+        return call
+    
+    def __getitem__(self, name):
+        # operations by name, those an attribute of the client hides included
+        return self._operations[name]
+    
+    def check_names(self):
+        # client.close, client.cache... are the client's own: operations of
+        # those names are only reachable as client['close']
+        for name in self._operations:
+            if name in self.__dict__ or hasattr(type(self), name):
+                logger.warning("operation %r is hidden by the client's own attribute, use client[%r]", name, name)
+    
+    def __dir__(self):
+        return list(super().__dir__()) + list(self._operations)
+    
+    def cache(self, *names, cache=None, **options):
+        # caches the responses of the named (idempotent) operations in one
+        # ResponseCache, given or made with options (ttl, store, max_entries,
+        # max_size); returns it, for its stats(). cache=False turns caching off
+        if cache is None:
+            cache = ResponseCache(**options)
+        for name in names:
+            getattr(self, name).response_cache = cache or None
+        return cache
+    
+    def compress(self, url=None, compression=None, **options):
+        # compresses the request bodies sent to `url` (default: every endpoint)
+        # with one Compression, given or made with options (threshold,
+        # encoding, level); returns it. compression=False turns it off
+        if compression is None:
+            compression = Compression(**options)
+        for name in self._operations:
+            call = getattr(self, name)
+            if url is None or call.url == url:
+                call.compression = compression or None
+        return compression
+    
+    def close(self):
+        self.transport.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
     
     def __str__(self):
         parts = ['SOAP client, available actions:']
-        calls = sorted(call.name for call in self.__dict__.values() if isinstance(call, SoapCall))
+        calls = sorted(self._operations)
         parts.extend(calls)
         return '\n  '.join(parts)
     
@@ -32,42 +135,337 @@ class SoapCall(object):
     input_body = None
     output_header = None
     output_body = None
+    input_header_name = None
+    input_body_name = None
+    transport = None
+    response_cache = None
+    policy = None
+    compression = None
+    faults = None
+    _observers = ()
+    
+    def __call__(self, header=None, body=None, view=False, stream=False, deadline=None, **kwargs):
+        # with view=True the result is a ResultView, converting fields as they're read.
+        # with stream=True the envelope is written while it's sent, as a chunked
+        # body; being a generator it can't be replayed, so don't count on retries:
+        # it's sent once, with what's left of the deadline as its timeout.
+        # deadline: seconds for the whole call, overriding the policy's
+        if self.response_cache is not None and not stream:
+            return self.cached(header, body, view, kwargs, deadline)
+        if stream:
+            policy = self.policy
+            if policy is None and deadline is None:
+                return self.send(header, body, view, stream, kwargs)
+            return self.send(header, body, view, stream, kwargs, deadline if deadline is not None else policy.deadline)
+        return self.run(lambda timeout: self.send(header, body, view, False, kwargs, timeout), deadline)
+    
+    def run(self, attempt, deadline=None):
+        # attempt(timeout) as the policy says, or once without one
+        policy = self.policy
+        if policy is None and deadline is not None:
+            policy = Policy.plain
+        if policy is None:
+            return attempt(None)
+        return policy.run(self.name, self.url, attempt, deadline)
+    
+    def send(self, header, body, view, stream, kwargs, timeout=None, envelope=None, receive=None):
+        # one request; timeout: seconds, default: the transport's. envelope:
+        # the one to send, when it's built already; receive: what makes the
+        # result of the response, see receive()
+        if self._observers:
+            return self.observed(header, body, view, stream, kwargs, timeout, envelope, receive)
+        if envelope is None:
+            envelope = self.build_envelope(header, body, stream=stream, **kwargs)
+        data, headers = self.encode(envelope)
+        # the timeout bounds the whole response, its body included
+        until = time.monotonic() + timeout if timeout is not None else None
+        response = self.transport.post(self.url, data=data, headers=headers, timeout=timeout, stream=True)
+        with response:
+            response.raw.decode_content = True
+            return (receive or self.receive)(response.status_code, response.headers, Body(response.raw, until),
+                                             response.raise_for_status, view)
+    
+    def receive(self, status_code, headers, source, raise_for_status, view):
+        # the result of a response whose body is source (a file or bytes)
+        attachments = None
+        if mtom.is_multipart(headers.get('content-type')):
+            source, attachments = mtom.parse(source, headers['content-type'])
+        return self.handle_response(status_code, source, raise_for_status, view, attachments)
+    
+    def cached(self, header, body, view, kwargs, deadline=None):
+        # __call__ through the response cache: on a miss the request is sent
+        # as any other, with the policy and the observers; only 200s that
+        # aren't MTOM are kept, faults and errors are raised to every caller
+        # waiting for the same request, anything else is handled by each
+        envelope = self.build_envelope(header, body, **kwargs)
+        def fetch():
+            return self.run(lambda timeout: self.send(header, body, view, False, kwargs, timeout, envelope, self.keep),
+                            deadline)
+        result = self.response_cache.get(ResponseCache.key(self.url, self.SOAPAction, envelope), fetch)
+        if isinstance(result, bytes):
+            return self.handle_response(200, result, lambda: None, view)
+        status_code, content_type, content = result
+        return self.receive(status_code, {'content-type': content_type}, content, lambda: None, view)
+    
+    def keep(self, status_code, headers, source, raise_for_status, view):
+        # receive() for the response cache's fetch: (result, whether to store it)
+        content = source if isinstance(source, bytes) else source.read()
+        content_type = headers.get('content-type')
+        if status_code == 200 and not mtom.is_multipart(content_type):
+            return content, True
+        if status_code >= 400:
+            self.receive(status_code, headers, content, raise_for_status, view) # raises
+            raise_for_status()
+        return (status_code, content_type, content), False
+    
+    def observed(self, header, body, view, stream, kwargs, timeout=None, envelope=None, receive=None):
+        # send(), timing each phase for the client's observers
+        clock = metrics.clock
+        serialized = responded = request = response = sent = received = None
+        start = clock()
+        try:
+            data = envelope if envelope is not None else self.build_envelope(header, body, stream=stream, **kwargs)
+            # a streamed envelope is serialized while it's sent: the time
+            # spent producing (and compressing) its chunks is counted as serialize
+            request = metrics.IterMeter(data) if stream else len(data)
+            data, headers = self.encode(request if stream else data)
+            sent = metrics.IterMeter(data) if stream else len(data)
+            serialized = clock()
+            until = time.monotonic() + timeout if timeout is not None else None
+            http_response = self.transport.post(self.url, data=sent if stream else data, headers=headers,
+                                                 timeout=timeout, stream=True)
+            responded = clock()
+            with http_response:
+                http_response.raw.decode_content = True
+                # and the response is read while it's parsed: reads are network
+                response = metrics.ReadMeter(Body(http_response.raw, until))
+                result = (receive or self.receive)(http_response.status_code, http_response.headers, response,
+                                                   http_response.raise_for_status, view)
+                # bytes read off the socket, before decompression
+                received = http_response.raw.tell()
+        except Exception as e:
+            self.observe(start, serialized, responded, request, response, e, sent)
+            raise
+        self.observe(start, serialized, responded, request, response, None, sent, received)
+        return result
+    
+    def observe(self, start, serialized, responded, request, response, error, sent=None, received=None):
+        # request / response: the envelopes (a Meter, or a length), sent /
+        # received: what went over the wire, compressed or not
+        end = metrics.clock()
+        produced = sent.seconds if isinstance(sent, metrics.Meter) else 0.0
+        read = response.seconds if response is not None else 0.0
+        serialize = network = parse = None
+        if serialized is None:
+            serialize = end - start
+        else:
+            serialize = serialized - start + produced
+            network = (responded if responded is not None else end) - serialized - produced + read
+            if responded is not None:
+                parse = end - responded - read
+        metrics.emit(self._observers, metrics.CallEvent(
+            self.name, self.url, serialize, network, parse, end - start,
+            request.bytes if isinstance(request, metrics.Meter) else request,
+            response.bytes if response is not None else None, error,
+            sent.bytes if isinstance(sent, metrics.Meter) else sent, received))
     
-    # todo
-    def __call__(self, header=None, body=None, **kwargs):
-        input_header = copy.deepcopy(self.input_header)
-        input_body = copy.deepcopy(self.input_body)
+    def records(self, header=None, body=None, path=None, **kwargs):
+        # yields the repeated elements at `path` (default: the first maxOccurs > 1
+        # field of the response) one by one as they are read off the socket: a
+        # query of one page, see paginate()
+        return self.paginate(None, body=body, header=header, records=path, **kwargs)
+    
+    def page(self, header, body, records, kwargs, emit):
+        # one page: emit(record) for each of its records as they're decoded off
+        # the socket, returns the rest of the response. sent as any call, with
+        # the policy and the observers
+        envelope = self.build_envelope(header, body, **kwargs)
+        receive = self.pager(records, emit)
+        return self.run(lambda timeout: self.send(header, body, False, False, kwargs, timeout, envelope, receive))
+    
+    def pager(self, records, emit):
+        # receive() for page(): a retried or hedged attempt only emits the
+        # records the ones before it haven't
+        emitted = [0]
+        lock = threading.Lock()
+        def receive(status_code, headers, source, raise_for_status, view):
+            if status_code != 500:
+                raise_for_status()
+            decoder = Decoder(self.output_body, self.output_header, records=records, faults=self.faults)
+            for i, record in enumerate(decoder.decode(source)):
+                with lock:
+                    if i == emitted[0]:
+                        emit(record)
+                        emitted[0] += 1
+            return decoder.body
+        return receive
+    
+    def paginate(self, cursor, body=None, header=None, records=None, prefetch=1, **kwargs):
+        # yields the records of every page of a query, see Cursor. pages are
+        # fetched on a background thread, at most `prefetch` pages ahead of
+        # the one being consumed; records: as for records() (per call when
+        # the next pages come from cursor.call). closing the generator stops
+        # the fetching, errors are raised where the page would have been.
+        # cursor=None: there's only the one page
+        cursor = Cursor.of(cursor) if cursor is not None else None
+        # the records, each page's followed by `done`, then `end`
+        items = queue.Queue()
+        slots = threading.Semaphore(prefetch + 1)
+        stopped = threading.Event()
+        done, end = object(), object()
+        errors = []
         
-        if input_header:
-            input_header.update_over(None, header)
-        elif header:
-            raise ValueError('No header can be parsed from the WSDL; give me a header!')
+        def emit(record):
+            if not stopped.is_set():
+                items.put(record)
         
-        if input_body:
-            input_body.update_over(None, body)
-        elif body:
+        def fetch():
+            call, page_body = self, body
+            try:
+                while True:
+                    while not slots.acquire(timeout=0.1):
+                        if stopped.is_set():
+                            return
+                    if stopped.is_set():
+                        return
+                    rest = call.page(header, page_body, records or SOAP.find_repeated(call.output_body), kwargs, emit)
+                    items.put(done)
+                    page_body = cursor.next_body(body, rest) if cursor is not None else None
+                    if page_body is None:
+                        break
+                    call = cursor.call or self
+            except Exception as e:
+                errors.append(e)
+            items.put(end)
+        
+        thread = threading.Thread(target=fetch, daemon=True)
+        thread.start()
+        try:
+            while True:
+                record = items.get()
+                if record is end:
+                    if errors:
+                        raise errors[0]
+                    return
+                if record is done:
+                    slots.release()
+                    continue
+                yield record
+        finally:
+            stopped.set()
+    
+    def handle_response(self, status_code, source, raise_for_status, view=False, attachments=None):
+        # soap faults come back as 500s, with the Fault in the body
+        if status_code != 500:
+            raise_for_status()
+        try:
+            result = self.parse_view(source, attachments) if view else self.parse_response(source, attachments)
+        except lxml.etree.XMLSyntaxError:
+            raise_for_status()
+            raise
+        raise_for_status()
+        return result
+    
+    def build_envelope(self, header=None, body=None, stream=False, **kwargs):
+        if header and self.input_header is None:
+            raise ValueError('No header can be parsed from the WSDL; give me a header!')
+        if body and self.input_body is None:
             raise ValueError('No body can be parsed from the WSDL; give me a body!')
         
         for k, v in kwargs.items():
             # todo
             pass
         
-        soap_envelope = lxml.builder.ElementMaker(namespace=SOAP.namespaces['soapenv'], nsmap=SOAP.namespaces)('Envelope')
-        if input_header:
-            soap_envelope.append(input_header.xml(root='Header', nsmap=SOAP.namespaces))
-        if input_body:
-            soap_envelope.append(input_body.xml(root='Body', nsmap=SOAP.namespaces))
-        
-        body = lxml.etree.tostring(soap_envelope, xml_declaration=True, encoding='UTF-8')
-        
-        response = requests.post(url=self.url, headers=self.http_headers, body=body)
-        
-        response.raise_for_status()
-        
-        response_xml = lxml.etree.XML(response.content)
-        
-        # todo: make it a dict
-        return response_xml
+        if stream:
+            return self.serializer.stream(header, body)
+        return self.serializer.envelope(header, body)
+    
+    def validate_many(self, bodies, header=None):
+        # checks bodies against the WSDL's restrictions without sending them;
+        # yields a BatchResult per body, with a ValidationError for invalid ones
+        serializer = self.serializer
+        for index, body in enumerate(bodies):
+            errors = serializer.validate(header, body)
+            yield BatchResult(index, body, not errors, ValidationError(errors) if errors else None)
+    
+    @property
+    def serializer(self):
+        serializer = self.__dict__.get('_serializer')
+        if serializer is None:
+            template = self.__dict__.get('_template')
+            if template is not None:
+                serializer = self._serializer = template.serializer
+            else:
+                serializer = self._serializer = Serializer(self.input_header, self.input_header_name,
+                                                           self.input_body, self.input_body_name)
+        return serializer
+    
+    def bind(self, transport, soap_call_class=None, observers=None, policy=None):
+        # a copy for one client: the type trees and the serializer stay shared
+        # with this call, url / headers / transport can be changed per copy
+        soap_call = (soap_call_class or self.__class__)()
+        soap_call.__dict__.update((k, v) for k, v in self.__dict__.items() if not k.startswith('_'))
+        soap_call.transport = transport
+        soap_call._template = self
+        if observers is not None:
+            soap_call._observers = observers
+        if policy is not None:
+            soap_call.policy = policy
+        return soap_call
+    
+    def parse_response(self, content, attachments=None):
+        return Decoder(self.output_body, self.output_header, attachments=attachments, faults=self.faults).parse(content)
+    
+    def parse_view(self, content, attachments=None):
+        if isinstance(content, (bytes, str)):
+            root = lxml.etree.fromstring(content.encode() if isinstance(content, str) else content)
+        else:
+            root = lxml.etree.parse(content, lxml.etree.XMLParser(huge_tree=True)).getroot()
+        payload = root
+        if root.tag == Decoder.envelope_tag:
+            body = root.find(Decoder.body_tag)
+            payload = next((child for child in body if isinstance(child.tag, str)), None) if body is not None else None
+            if payload is None:
+                return None
+            if payload.tag == Decoder.fault_tag:
+                return self.parse_response(root) # raises the Fault
+        return ResultView.value(payload, self.output_body, attachments)
+    
+    def map(self, bodies, workers=10, ordered=True, header=None, backlog=None):
+        # calls the operation once per body on a thread pool, all sharing this
+        # call's transport (size its pool_maxsize to at least `workers`), and
+        # yields a BatchResult per body; errors are returned, not raised. at most
+        # `backlog` bodies are pulled from the iterable ahead of the consumer
+        backlog = backlog or workers * 2
+        bodies = enumerate(bodies)
+        pending = collections.OrderedDict()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        try:
+            while True:
+                for index, body in itertools.islice(bodies, backlog - len(pending)):
+                    pending[executor.submit(self, header, body)] = (index, body)
+                if not pending:
+                    break
+                if ordered:
+                    done = [next(iter(pending))]
+                    concurrent.futures.wait(done)
+                else:
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    index, body = pending.pop(future)
+                    try:
+                        result, error = future.result(), None
+                    except Exception as e:
+                        result, error = None, e
+                    yield BatchResult(index, body, result, error)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def encode(self, data):
+        # the body as it's sent and its headers, compressed if it should be
+        if self.compression is None:
+            return data, self.http_headers
+        return self.compression.encode(data, self.http_headers)
     
     @property
     def http_headers(self):
@@ -82,6 +480,380 @@ class SoapCall(object):
         # todo
         return object.__str__(self)
 
+class Transport(object):
+    # one connection pool per host, shared by every SoapCall of a Client; the
+    # pools live in a single HTTPAdapter (urllib3 pools are thread-safe) while
+    # each thread gets its own Session, since Session cookie / header state isn't
+    def __init__(self, pool_connections=10, pool_maxsize=10, keep_alive=True, timeout=None,
+                 retries=0, backoff_factor=0, status_forcelist=None, pool_block=False):
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        # read errors aren't retried: the request may have been processed, and
+        # a read timeout is raised as such (requests.Timeout), not as a
+        # ConnectionError for running out of retries
+        self.retry = urllib3.util.retry.Retry(total=retries,
+                                              read=False,
+                                              backoff_factor=backoff_factor,
+                                              status_forcelist=status_forcelist,
+                                              allowed_methods=None,
+                                              raise_on_status=False)
+        self.adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections,
+                                                     pool_maxsize=pool_maxsize,
+                                                     max_retries=self.retry,
+                                                     pool_block=pool_block)
+        self._local = threading.local()
+    
+    @property
+    def session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+            if not self.keep_alive:
+                session.headers['Connection'] = 'close'
+            self._local.session = session
+        return session
+    
+    def post(self, url, data=None, headers=None, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.timeout
+        return self.session.post(url, data=data, headers=headers, timeout=timeout, **kwargs)
+    
+    def get(self, url, headers=None, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.timeout
+        return self.session.get(url, headers=headers, timeout=timeout, **kwargs)
+    
+    def close(self):
+        self.adapter.close()
+    
+    def __repr__(self):
+        return 'Transport(pool_maxsize={}, keep_alive={}, timeout={}, retries={})'.format(
+            self.adapter._pool_maxsize, self.keep_alive, self.timeout, self.retry.total)
+
+class AsyncSoapCall(SoapCall):
+    # same envelope building / response parsing as SoapCall, only the I/O is awaited
+    async def __call__(self, header=None, body=None, view=False, stream=False, deadline=None, **kwargs):
+        if self.response_cache is not None and not stream:
+            return await self.cached(header, body, view, kwargs, deadline)
+        if stream:
+            policy = self.policy
+            if policy is None and deadline is None:
+                return await self.send(header, body, view, stream, kwargs)
+            return await self.send(header, body, view, stream, kwargs, deadline if deadline is not None else policy.deadline)
+        return await self.run(lambda timeout: self.send(header, body, view, False, kwargs, timeout), deadline)
+    
+    async def run(self, attempt, deadline=None):
+        policy = self.policy
+        if policy is None and deadline is not None:
+            policy = Policy.plain
+        if policy is None:
+            return await attempt(None)
+        return await policy.arun(self.name, self.url, attempt, deadline)
+    
+    async def send(self, header, body, view, stream, kwargs, timeout=None, envelope=None, receive=None):
+        clock = metrics.clock
+        observed = bool(self._observers)
+        serialized = responded = request = response = sent = received = None
+        start = clock() if observed else None
+        try:
+            data = envelope if envelope is not None else self.build_envelope(header, body, stream=stream, **kwargs)
+            if observed:
+                request = metrics.IterMeter(data) if stream else len(data)
+                data = request if stream else data
+            data, headers = self.encode(data)
+            if observed:
+                sent = metrics.IterMeter(data) if stream else len(data)
+                data = sent if stream else data
+                serialized = clock()
+            if stream:
+                data = self.chunks(data)
+            http_response, content = await self.transport.post(self.url, data=data, headers=headers, timeout=timeout)
+            if observed:
+                # aiohttp has read (and decompressed) the whole body by now
+                responded = clock()
+                response = metrics.ReadMeter(io.BytesIO(content))
+                content = response.read()
+                received = getattr(http_response.content, 'total_raw_bytes', None)
+            result = (receive or self.receive)(http_response.status, http_response.headers, content,
+                                               http_response.raise_for_status, view)
+        except (Exception, asyncio.CancelledError) as e:
+            # attempts cut short by the policy's deadline, or a faster hedge, included
+            if observed:
+                self.observe(start, serialized, responded, request, response, e, sent)
+            raise
+        if observed:
+            self.observe(start, serialized, responded, request, response, None, sent, received)
+        return result
+    
+    async def cached(self, header, body, view, kwargs, deadline=None):
+        envelope = self.build_envelope(header, body, **kwargs)
+        async def fetch():
+            return await self.run(lambda timeout: self.send(header, body, view, False, kwargs, timeout, envelope, self.keep),
+                                  deadline)
+        result = await self.response_cache.aget(ResponseCache.key(self.url, self.SOAPAction, envelope), fetch)
+        if isinstance(result, bytes):
+            return self.handle_response(200, result, lambda: None, view)
+        status_code, content_type, content = result
+        return self.receive(status_code, {'content-type': content_type}, content, lambda: None, view)
+    
+    async def page(self, header, body, records, kwargs, emit):
+        envelope = self.build_envelope(header, body, **kwargs)
+        receive = self.pager(records, emit)
+        return await self.run(lambda timeout: self.send(header, body, False, False, kwargs, timeout, envelope, receive))
+    
+    async def paginate(self, cursor, body=None, header=None, records=None, prefetch=1, **kwargs):
+        # async generator counterpart of SoapCall.paginate, the pages being
+        # fetched by a task
+        cursor = Cursor.of(cursor) if cursor is not None else None
+        items = asyncio.Queue()
+        slots = asyncio.Semaphore(prefetch + 1)
+        done, end = object(), object()
+        errors = []
+        
+        async def fetch():
+            call, page_body = self, body
+            try:
+                while True:
+                    await slots.acquire()
+                    rest = await call.page(header, page_body, records or SOAP.find_repeated(call.output_body), kwargs,
+                                           items.put_nowait)
+                    items.put_nowait(done)
+                    page_body = cursor.next_body(body, rest) if cursor is not None else None
+                    if page_body is None:
+                        break
+                    call = cursor.call or self
+            except Exception as e:
+                errors.append(e)
+            items.put_nowait(end)
+        
+        task = asyncio.ensure_future(fetch())
+        try:
+            while True:
+                record = await items.get()
+                if record is end:
+                    if errors:
+                        raise errors[0]
+                    return
+                if record is done:
+                    slots.release()
+                    continue
+                yield record
+        finally:
+            task.cancel()
+    
+    @staticmethod
+    async def chunks(data):
+        # aiohttp streams async iterables
+        for chunk in data:
+            yield chunk
+    
+    async def map(self, bodies, workers=10, ordered=True, header=None, backlog=None):
+        # async generator counterpart of SoapCall.map; `workers` bounds the
+        # number of calls in flight instead of a thread pool
+        backlog = backlog or workers
+        bodies = enumerate(bodies)
+        pending = collections.OrderedDict()
+        try:
+            while True:
+                for index, body in itertools.islice(bodies, backlog - len(pending)):
+                    pending[asyncio.ensure_future(self(header, body))] = (index, body)
+                if not pending:
+                    break
+                if ordered:
+                    done = [next(iter(pending))]
+                    await asyncio.wait(done)
+                else:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, body = pending.pop(task)
+                    error = task.exception()
+                    yield BatchResult(index, body, task.result() if error is None else None, error)
+        finally:
+            for task in pending:
+                task.cancel()
+
+class AsyncTransport(object):
+    # aiohttp counterpart of Transport; the session is created lazily since it
+    # has to be bound to the running event loop. concurrency caps the number of
+    # requests in flight, on top of the connector's own pool limits
+    def __init__(self, limit=100, limit_per_host=10, keep_alive=True, timeout=None, concurrency=None):
+        if aiohttp is None:
+            raise ImportError('AsyncTransport requires aiohttp')
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self._session = None
+        self._semaphore = None
+    
+    @property
+    def session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit,
+                                             limit_per_host=self.limit_per_host,
+                                             force_close=not self.keep_alive)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+    
+    @property
+    def semaphore(self):
+        if self._semaphore is None and self.concurrency:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+    
+    async def post(self, url, data=None, headers=None, timeout=None):
+        # returns the (released) response along with its body
+        if self.semaphore is None:
+            return await self._post(url, data, headers, timeout)
+        async with self.semaphore:
+            return await self._post(url, data, headers, timeout)
+    
+    async def _post(self, url, data, headers, timeout):
+        kwargs = {}
+        if timeout is not None:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=timeout)
+        async with self.session.post(url, data=data, headers=headers, **kwargs) as response:
+            return response, await response.read()
+    
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    def __repr__(self):
+        return 'AsyncTransport(limit_per_host={}, concurrency={}, timeout={})'.format(
+            self.limit_per_host, self.concurrency, self.timeout)
+
+class AsyncClient(Client):
+    soap_call_class = AsyncSoapCall
+    
+    def __init__(self, wsdls, transport=None, concurrency=None, snapshot=True, lazy=False, shared=True, observers=None,
+                 policy=None):
+        super().__init__(wsdls, transport=transport or AsyncTransport(concurrency=concurrency), snapshot=snapshot, lazy=lazy,
+                         shared=shared, observers=observers, policy=policy)
+    
+    async def close(self):
+        await self.transport.close()
+    
+    def __enter__(self):
+        raise TypeError('use "async with" with an AsyncClient')
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
+    
+    def __repr__(self):
+        return 'AsyncClient(wsdls={})'.format(self._wsdls)
+
+BatchResult = collections.namedtuple('BatchResult', ['index', 'body', 'result', 'error'])
+
+class Cursor(object):
+    # where the continuation token of a paged query lives: `response` is its
+    # path in a response ('a/b'), `request` its path in the request (default:
+    # the same), `call` the operation fetching the next pages (query /
+    # queryMore; default: the same one, with the first request's body and the
+    # token set), `done` the path of a flag saying it was the last page. the
+    # query ends on that flag, or when the response has no token
+    def __init__(self, response, request=None, call=None, done=None):
+        self.response = self.path(response)
+        self.request = self.path(request) if request is not None else self.response
+        self.call = call
+        self.done = self.path(done) if done is not None else None
+    
+    @staticmethod
+    def of(cursor):
+        return cursor if isinstance(cursor, Cursor) else Cursor(cursor)
+    
+    @staticmethod
+    def path(path):
+        return tuple(path.split('/')) if isinstance(path, str) else tuple(path)
+    
+    @staticmethod
+    def get(value, path):
+        for key in path:
+            if not isinstance(value, collections.abc.Mapping):
+                return None
+            value = value.get(key)
+        return value
+    
+    def next_body(self, body, response):
+        # the body of the next request, None when there's no next page
+        token = self.get(response, self.response)
+        if token is None or token == '' or (self.done is not None and self.get(response, self.done)):
+            return None
+        # copies along the path only, the rest is shared with the first body
+        root = dict(body or {}) if self.call is None else {}
+        node = root
+        for key in self.request[:-1]:
+            node[key] = dict(node.get(key) or {})
+            node = node[key]
+        node[self.request[-1]] = token
+        return root
+
+class SoapCalls(collections.OrderedDict):
+    # operation name -> SoapCall; a class of its own so the Registry can hold it weakly
+    pass
+
+class BoundSoapCalls(collections.abc.Mapping):
+    # one client's view of shared SoapCalls: each is bound to the client's
+    # transport (SoapCall.bind) on first access
+    def __init__(self, templates, transport, soap_call_class=None, observers=None, policy=None):
+        self.templates = templates
+        self.transport = transport
+        self.soap_call_class = soap_call_class
+        self.observers = observers
+        self.policy = policy
+        self.soap_calls = {}
+    
+    def __getitem__(self, name):
+        soap_call = self.soap_calls.get(name)
+        if soap_call is None:
+            soap_call = self.templates[name].bind(self.transport, self.soap_call_class, self.observers, self.policy)
+            soap_call = self.soap_calls.setdefault(name, soap_call)
+        return soap_call
+    
+    def __iter__(self):
+        return iter(self.templates)
+    
+    def __len__(self):
+        return len(self.templates)
+
+class Registry(object):
+    # process-wide: the SoapCalls built from a set of WSDL contents (and
+    # whether they're lazy), shared by every Client of those WSDLs as long
+    # as one of them is alive. built once even when clients are created
+    # concurrently; type trees and serializers are never modified after
+    # they're built, anything per client lives on the bound copies
+    templates = weakref.WeakValueDictionary()
+    locks = weakref.WeakValueDictionary()
+    lock = threading.Lock()
+    
+    @staticmethod
+    def get(key, build):
+        templates = Registry.templates.get(key)
+        if templates is not None:
+            return templates
+        with Registry.lock:
+            key_lock = Registry.locks.get(key)
+            if key_lock is None:
+                key_lock = Registry.locks[key] = threading.RLock()
+        with key_lock:
+            templates = Registry.templates.get(key)
+            if templates is None:
+                templates = build()
+                Registry.templates[key] = templates
+            return templates
+    
+    @staticmethod
+    def clear():
+        Registry.templates.clear()
+
 class OrderedSet(collections.OrderedDict):
     def add(self, key):
         self[key] = True
@@ -101,39 +873,169 @@ class OrderedDefaultDict(collections.OrderedDict):
     def __missing__(self, key):
         self[key] = self.keyfunc()
         return self[key]
+    def __reduce__(self):
+        return (self.__class__, (self.keyfunc,), None, None, iter(self.items()))
 
 class Restriction(object):
-    minExclusive = None
-    minInclusive = None
-    maxExclusive = None
-    maxInclusive = None
-    totalDigits = None
-    fractionDigits = None
-    length = None
-    minLength = None
-    maxLength = None
-    enumeration = None
-    whiteSpace = None
-    pattern = None
-    custom = None
-    minOccurs = None
-    maxOccurs = None
-    nillable = False
-    use = None
-    choices = None
-    
-    def __init__(self, **kwargs):
-        self.update(kwargs)
-        
-    def update(self, kwargs):
+    # immutable once built, and interned: equal restrictions are one shared
+    # object (empty ones are Restriction.empty), so changes go through
+    # updated(), which returns another restriction
+    __slots__ = ('minExclusive', 'minInclusive', 'maxExclusive', 'maxInclusive', 'totalDigits', 'fractionDigits',
+                 'length', 'minLength', 'maxLength', 'enumeration', 'whiteSpace', 'pattern', 'custom',
+                 'minOccurs', 'maxOccurs', 'nillable', 'use', 'choices', '_validator', '__weakref__')
+    facets = __slots__[:-2]
+    multivalued = ('enumeration', 'pattern', 'choices')
+    _interned = weakref.WeakValueDictionary()
+    _lock = threading.Lock()
+    
+    def __new__(cls, **kwargs):
+        values = {}
         for k, v in kwargs.items():
-            if k not in Restriction.__dict__:
+            if k not in cls.facets or v is None or (k == 'nillable' and not v):
                 continue
+            if k in cls.multivalued:
+                v = tuple(sys.intern(e) if isinstance(e, str) else e for e in (v if isinstance(v, (list, tuple)) else [v]))
+            else:
+                try:
+                    v = int(v)
+                except (TypeError, ValueError):
+                    pass
+            values[k] = v
+        key = tuple(sorted(values.items()))
+        with cls._lock:
+            restriction = cls._interned.get(key)
+            if restriction is None:
+                restriction = object.__new__(cls)
+                for k in cls.facets:
+                    object.__setattr__(restriction, k, values.get(k, False if k == 'nillable' else None))
+                object.__setattr__(restriction, '_validator', None)
+                cls._interned[key] = restriction
+        return restriction
+    
+    def __setattr__(self, name, value):
+        raise AttributeError('Restriction is immutable, use updated()')
+    
+    def updated(self, kwargs):
+        values = self.facet_values()
+        values.update(kwargs)
+        return Restriction(**values)
+    
+    def facet_values(self):
+        # the facets that are set
+        values = {k: getattr(self, k) for k in self.facets}
+        return {k: v for k, v in values.items() if v is not None and v is not False}
+    
+    def __reduce__(self):
+        return (functools.partial(Restriction, **{k: getattr(self, k) for k in self.facets}), ())
+    
+    def __copy__(self):
+        return self
+    
+    def __deepcopy__(self, memo):
+        return self
+    
+    @property
+    def validator(self):
+        # compiled on first use: a function returning the facets a value
+        # violates (phrased like __repr__), or None if there's nothing to check
+        if self._validator is None:
+            object.__setattr__(self, '_validator', self._compile() or False)
+        return self._validator or None
+    
+    @staticmethod
+    def _number(bound):
+        if isinstance(bound, numbers.Number):
+            return bound
+        try:
+            return decimal.Decimal(bound)
+        except (TypeError, ValueError, decimal.InvalidOperation):
+            return None
+    
+    @staticmethod
+    def _lexical(value):
+        value = SOAP.formatters[type(value)](value)
+        return '' if value is None else value
+    
+    @staticmethod
+    def _ordered(value):
+        # value as a number to compare with a bound, None if it isn't one.
+        # values of typed fields come parsed (Serializer.compiled), strings
+        # are those of simple content
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, numbers.Number):
+            return value
+        if isinstance(value, str):
+            number = Restriction._number(value.strip())
+            if number is not None and number.is_finite():
+                return number
+        return None
+    
+    @staticmethod
+    def _digits(value):
+        # (total digits, fraction digits), None for what isn't a decimal number
+        if isinstance(value, str):
+            value = Restriction._ordered(value)
+        if isinstance(value, bool) or not isinstance(value, (int, decimal.Decimal)):
+            return None
+        sign, digits, exponent = decimal.Decimal(value).normalize().as_tuple()
+        # normalize() makes trailing zeros an exponent: 100 is 1E+2
+        return len(digits) + max(0, exponent), max(0, -exponent)
+    
+    def _compile(self):
+        checks = []
+        for facet, op, message in (('minExclusive', operator.gt, 'value > {}'),
+                                   ('minInclusive', operator.ge, 'value >= {}'),
+                                   ('maxExclusive', operator.lt, 'value < {}'),
+                                   ('maxInclusive', operator.le, 'value <= {}')):
+            bound = self._number(getattr(self, facet))
+            if bound is not None:
+                # mappings are complex values, anything else has to be a number
+                checks.append((lambda v, op=op, bound=bound: isinstance(v, collections.abc.Mapping) or
+                               self._ordered(v) is not None and op(self._ordered(v), bound), message.format(bound)))
+        if isinstance(self.totalDigits, int):
+            checks.append((lambda v, n=self.totalDigits: isinstance(v, (collections.abc.Mapping, float)) or
+                           self._digits(v) is not None and self._digits(v)[0] <= n,
+                           'total digits <= {}'.format(self.totalDigits)))
+        if isinstance(self.fractionDigits, int):
+            checks.append((lambda v, n=self.fractionDigits: isinstance(v, (collections.abc.Mapping, float)) or
+                           self._digits(v) is not None and self._digits(v)[1] <= n,
+                           'fraction digits <= {}'.format(self.fractionDigits)))
+        for facet, op, message in (('length', operator.eq, 'len(value) == {}'),
+                                   ('minLength', operator.ge, 'len(value) >= {}'),
+                                   ('maxLength', operator.le, 'len(value) <= {}')):
+            bound = getattr(self, facet)
+            if isinstance(bound, int):
+                checks.append((lambda v, op=op, bound=bound: not hasattr(v, '__len__') or op(len(v), bound),
+                               message.format(bound)))
+        if self.enumeration is not None:
+            enumeration = frozenset(str(e) for e in self.enumeration)
+            checks.append((lambda v: self._lexical(v) in enumeration,
+                           'value in {}'.format(sorted(enumeration))))
+        if self.pattern is not None:
+            patterns = self.pattern
             try:
-                v = int(v)
-            except (TypeError, ValueError):
-                pass
-            setattr(self, k, v)
+                # patterns of one restriction are alternatives, and always anchored
+                pattern = re.compile('|'.join('(?:%s)' % p for p in patterns))
+            except re.error:
+                pass # xsd regex features python doesn't have; not checked
+            else:
+                checks.append((lambda v: pattern.fullmatch(self._lexical(v)) is not None,
+                               're.match("{}", value)'.format('|'.join(str(p) for p in patterns))))
+        if self.choices:
+            low = self.minOccurs if isinstance(self.minOccurs, int) else 1
+            high = self.maxOccurs if isinstance(self.maxOccurs, int) else float('inf')
+            choices = frozenset(self.choices)
+            checks.append((lambda v: not isinstance(v, collections.abc.Mapping) or low <= len(choices.intersection(v)) <= high,
+                           'between {} and {} of [{}] are allowed'.format(low, high, ', '.join(repr(c) for c in self.choices))))
+        if not checks:
+            return None
+        
+        def validator(value):
+            if value is None:
+                return []
+            return [message for check, message in checks if not check(value)]
+        return validator
     
     @property
     def required(self):
@@ -158,9 +1060,9 @@ class Restriction(object):
         if self.maxInclusive is not None:
             substrings.append('value <= {}'.format(self.maxInclusive))
         if self.totalDigits is not None:
-            substrings.append('str(value) must have <= {} digits'.format(self.totalDigits))
+            substrings.append('total digits <= {}'.format(self.totalDigits))
         if self.fractionDigits is not None:
-            substrings.append('str(value) must have <= {} digits after the decimal point'.format(self.fractionDigits))
+            substrings.append('fraction digits <= {}'.format(self.fractionDigits))
         if self.length is not None:
             substrings.append('len(value) == {}'.format(self.length))
         if self.minLength is not None:
@@ -168,12 +1070,12 @@ class Restriction(object):
         if self.maxLength is not None:
             substrings.append('len(value) <= {}'.format(self.maxLength))
         if self.enumeration is not None:
-            substrings.append('value in {}'.format(self.enumeration))
+            substrings.append('value in {}'.format(list(self.enumeration)))
         if self.whiteSpace is not None:
             # we don't care about this
             pass
         if self.pattern is not None:
-            substrings.append('re.match("{}", value)'.format('|'.join(self.pattern)))
+            substrings.append('re.match("{}", value)'.format('|'.join(str(p) for p in self.pattern)))
         if self.custom is not None:
             substrings.append(self.custom)
         if self.minOccurs is not None and self.minOccurs > 0:
@@ -194,20 +1096,33 @@ class Restriction(object):
         
         return ', '.join(substrings).strip(', ')
 
-class Empty(Exception):
-    pass
+Restriction.empty = Restriction()
+
+class ValidationError(ValueError):
+    def __init__(self, errors):
+        super().__init__('\n'.join(errors))
+        self.errors = errors
+
+class Fault(Exception):
+    # the endpoint's answer, for the policy's circuit breakers
+    answered = True
+    
+    def __init__(self, faultcode=None, faultstring=None, detail=None, **kwargs):
+        super().__init__(faultcode, faultstring)
+        self.faultcode = faultcode
+        self.faultstring = faultstring
+        self.detail = detail
+    
+    def __str__(self):
+        return '{}: {}'.format(self.faultcode, self.faultstring)
 
 class Leaf(object):
+    __slots__ = ('type', 'default', 'documentation', 'restriction')
     _sentinel = object()
-    
-    type = type('UNKNOWN', (object,), {})
-    value = _sentinel
-    default = _sentinel
-    documentation = ''
-    restriction = None
+    unknown = type('UNKNOWN', (object,), {})
     
     def __init__(self, type=None, default=_sentinel, documentation='', restriction=None):
-        self.type = type or Leaf.type
+        self.type = type or Leaf.unknown
         self.default = default
         self.documentation = documentation
         self.restriction = restriction
@@ -219,8 +1134,12 @@ class Leaf(object):
         return False
     
     def __repr__(self):
+        return self.describe()
+    
+    def describe(self, required=False):
+        # required: whether the field this is the type of is, see Node.occurs
         substrings = [repr(self.default) if self.default is not self._sentinel else '...', ', #']
-        if self.required:
+        if required or self.required:
             substrings.append('REQUIRED')
         else:
             substrings.append('(optional)')
@@ -233,93 +1152,51 @@ class Leaf(object):
             pass
         
         return ' '.join(substrings)
-    
-    @property
-    def xml(self):
-        if self.value is not self._sentinel:
-            return self._format(self.value)
-        if self.default is not self._sentinel:
-            return self._format(self.default)
-        raise Empty
-    
-    @staticmethod
-    def _format(value):
-        formatter = SOAP.formatters[type(value)]
-        formatted_value = formatter(value)
-        if formatted_value is None:
-            return ''
-        return formatted_value
-    
-    # todo
-    def __deepcopy__(self, memo):
-        pass
 
-class Node(collections.OrderedDict):
-    restriction = None
-    base = None
+class Node(dict):
+    # fields in schema order; `type` is set for simple content, `base` for
+    # extensions. once flatten() has run (build_type_tree does it) the fields
+    # of the whole base chain are in the node itself, base ones first, and
+    # `inherited` tells which base node declared them. `occurs` holds the
+    # Restriction (minOccurs, maxOccurs, use) of the fields that have one to
+    # check, by key: it's the field's, not its type's, which others may share
+    __slots__ = ('restriction', 'base', 'type', 'inherited', 'occurs')
     
-    def __init__(self, restriction, *args, **kwargs):
-        self.restriction = restriction or Restriction()
+    def __init__(self, restriction=None, *args, **kwargs):
+        self.restriction = restriction or Restriction.empty
+        self.base = None
+        self.type = None
+        self.inherited = None
+        self.occurs = None
         super().__init__(*args, **kwargs)
     
-    def __getitem__(self, key):
-        try:
-            return super().__getitem__(key)
-        except KeyError:
-            if self.base is not None:
-                return self.base[key]
-            raise
-    
-    def keys(self):
-        keys = OrderedSet()
-        if self.base is not None:
-            keys.extend(self.base)
-        keys.extend(self)
-        return keys
-    
-    def update_over(self, other_k, other_v):
-        if isinstance(other_v, str):
-            self[other_k]
-            pass
-        if isinstance(other_v, collections.abc.Mapping):
-            pass
-        if isinstance(other_v, collections.abc.Iterable):
-            pass
-        for k,v in other.items():
-            existing = self.get(k)
-            if isinstance(existing, Node):
-                existing.update_over(v)
-            elif isinstance(existing, Leaf):
-                self[k] = v
-
-    def xml(self, root=None, nsmap=None):
-        E = lxml.builder.ElementMaker(namespace=self.get('#namespace'), nsmap=nsmap)
-        elem = E(root)
-        for k in self.keys():
-            v = self[k]
-            try:
-                if k == '#text':
-                    elem.text = v.xml
-                elif k.startswith('#'):
-                    pass
-                elif k.startswith('@'):
-                    elem.attrib[k[1:]] = v.xml
-                else:
-                    if isinstance(v, list):
-                        vs = v
-                    else:
-                        vs = [v]
-                    for v in vs:
-                        val = v.xml(root=k, nsmap=nsmap)
-                        if val is None:
-                            elem.attrib['{%s}%s'%(SOAP.namespaces['xsi'], 'nil')] = 'true'
-                        else:
-                            elem.append(val)
-            except Empty:
+    def flatten(self):
+        base = self.base
+        if not isinstance(base, Node) or self.inherited is not None:
+            return
+        base.flatten()
+        own = list(dict.items(self))
+        dict.clear(self)
+        inherited = {}
+        for k, v in dict.items(base):
+            if k == '#namespace':
                 continue
-        if not len(elem) and not elem.attrib and not elem.text:
-            raise Empty
-        return elem
+            dict.__setitem__(self, k, v)
+            inherited[k] = base.inherited.get(k, base) if base.inherited else base
+        for k, v in own:
+            dict.__setitem__(self, k, v)
+            inherited.pop(k, None)
+        self.inherited = inherited
+        if base.occurs:
+            occurs = {k: v for k, v in base.occurs.items() if k in inherited}
+            occurs.update(self.occurs or ())
+            self.occurs = occurs
+        if self.type is None:
+            self.type = base.type
+        if self.restriction is Restriction.empty:
+            self.restriction = base.restriction
+        elif base.restriction is not Restriction.empty:
+            self.restriction = base.restriction.updated(self.restriction.facet_values())
     
     _f = collections.defaultdict(lambda : '%s: %s,', {
         Leaf: '%s: %s',
@@ -331,24 +1208,30 @@ class Node(collections.OrderedDict):
             if self.restriction and repr(self.restriction):
                 body = body + ' | Additional restrictions: {}'.format(repr(self.restriction))
             return body
-        keys = sorted(self.keys(), key=lambda item: (item.startswith('#'), item.startswith('@')), reverse=True)
+        keys = sorted((k for k in self.keys() if k != '#namespace'), key=lambda item: (item.startswith('#'), item.startswith('@')), reverse=True)
         if keys == ['#text']:
             n = Leaf(type=self['#text'].type)
             n.restriction = self.restriction
             return repr(n)
         body = []
+        occurs = self.occurs or {}
         for k in keys:
             v = self[k]
+            field_occurs = occurs.get(k)
+            required = field_occurs is not None and field_occurs.required
             formatter = self._f[type(v)]
             formatted_kv = []
             if isinstance(v, list):
                 v = v[0]
-                repr_v = repr(v)
+                repr_v = v.describe(required) if isinstance(v, Leaf) else repr(v)
                 repr_v = textwrap.indent('%s,\n...' % repr_v, prefix='    ')
+                if field_occurs is not None and repr(field_occurs):
+                    # how many items
+                    formatted_kv.append('# %s' % repr(field_occurs))
             else:
-                repr_v = repr(v)
+                repr_v = v.describe(required) if isinstance(v, Leaf) else repr(v)
             if isinstance(v, Node) and v.restriction is not None and len(repr_v.splitlines()) > 1:
-                if v.restriction.required:
+                if v.restriction.required or required:
                     formatted_kv.append('# REQUIRED')
                 else:
                     formatted_kv.append('# (optional)')
@@ -356,19 +1239,15 @@ class Node(collections.OrderedDict):
                     max_count = 1 if v.restriction.maxOccurs is None else v.restriction.maxOccurs
                     min_count = 1 if v.restriction.minOccurs is None else v.restriction.minOccurs
                     if max_count == min_count:
-                        formatted_kv.append('# only %s of a subset of %s may appear' % (max_count, v.restriction.choices))
+                        formatted_kv.append('# only %s of a subset of %s may appear' % (max_count, list(v.restriction.choices)))
                     else:
-                        formatted_kv.append('# between %s and %s items of a subset of %s may appear' % (min_count, max_count, v.restriction.choices))
+                        formatted_kv.append('# between %s and %s items of a subset of %s may appear' % (min_count, max_count, list(v.restriction.choices)))
                 restriction = repr(v.restriction)
                 if restriction:
                     formatted_kv.append('# %s' % restriction)
             formatted_kv.append(formatter % (repr(k), repr_v))
             body.extend(formatted_kv)
         return '{\n%s\n}' % textwrap.indent('\n'.join(body), prefix='    ')
-    
-    # todo
-    def __deepcopy__(self, memo):
-        pass
 
 class SOAP(object):
     types = {
@@ -382,83 +1261,37 @@ class SOAP(object):
         '{http://www.w3.org/2001/XMLSchema}time': datetime.time,
         '{http://www.w3.org/2001/XMLSchema}date': datetime.date,
         '{http://www.w3.org/2001/XMLSchema}integer': int,
-        '{http://www.w3.org/2001/XMLSchema}byte': Leaf(type=int, restriction=Restriction(minInclusive=0, maxExclusivee=2**8)),
-        '{http://www.w3.org/2001/XMLSchema}short': Leaf(type=int, restriction=Restriction(minInclusive=0, maxExclusivee=2**16)),
-        '{http://www.w3.org/2001/XMLSchema}int': Leaf(type=int, restriction=Restriction(minInclusive=0, maxExclusivee=2**32)),
-        '{http://www.w3.org/2001/XMLSchema}long': Leaf(type=int, restriction=Restriction(minInclusive=0, maxExclusivee=2**64)),
-        '{http://www.w3.org/2001/XMLSchema}unsignedByte': Leaf(type=int, restriction=Restriction(minInclusive=-2**7, maxInclusive=2**7)),
-        '{http://www.w3.org/2001/XMLSchema}unsignedShort': Leaf(type=int, restriction=Restriction(minInclusive=-2**15, maxInclusive=2**15)),
-        '{http://www.w3.org/2001/XMLSchema}unsignedInt': Leaf(type=int, restriction=Restriction(minInclusive=-2**31, maxInclusive=2**31)),
-        '{http://www.w3.org/2001/XMLSchema}unsignedLong': Leaf(type=int, restriction=Restriction(minInclusive=-2**63, maxInclusive=2**63)),
+        '{http://www.w3.org/2001/XMLSchema}byte': Leaf(type=int, restriction=Restriction(minInclusive=-2**7, maxInclusive=2**7-1)),
+        '{http://www.w3.org/2001/XMLSchema}short': Leaf(type=int, restriction=Restriction(minInclusive=-2**15, maxInclusive=2**15-1)),
+        '{http://www.w3.org/2001/XMLSchema}int': Leaf(type=int, restriction=Restriction(minInclusive=-2**31, maxInclusive=2**31-1)),
+        '{http://www.w3.org/2001/XMLSchema}long': Leaf(type=int, restriction=Restriction(minInclusive=-2**63, maxInclusive=2**63-1)),
+        '{http://www.w3.org/2001/XMLSchema}unsignedByte': Leaf(type=int, restriction=Restriction(minInclusive=0, maxInclusive=2**8-1)),
+        '{http://www.w3.org/2001/XMLSchema}unsignedShort': Leaf(type=int, restriction=Restriction(minInclusive=0, maxInclusive=2**16-1)),
+        '{http://www.w3.org/2001/XMLSchema}unsignedInt': Leaf(type=int, restriction=Restriction(minInclusive=0, maxInclusive=2**32-1)),
+        '{http://www.w3.org/2001/XMLSchema}unsignedLong': Leaf(type=int, restriction=Restriction(minInclusive=0, maxInclusive=2**64-1)),
         '{http://www.w3.org/2001/XMLSchema}negativeInteger': Leaf(type=int, restriction=Restriction(maxExclusive=0)),
         '{http://www.w3.org/2001/XMLSchema}positiveInteger': Leaf(type=int, restriction=Restriction(minExclusive=0)),
         '{http://www.w3.org/2001/XMLSchema}nonNegativeInteger': Leaf(type=int, restriction=Restriction(minInclusive=0)),
         '{http://www.w3.org/2001/XMLSchema}nonPositiveInteger': Leaf(type=int, restriction=Restriction(maxInclusive=0)),
         '{http://www.w3.org/2001/XMLSchema}anyURI': Leaf(type=str, restriction=Restriction(custom='value must be a valid URI')),
         '{http://www.w3.org/2001/XMLSchema}language': Leaf(type=str, restriction=Restriction(custom='value must be a language according to RFC 1766', pattern=['([a-zA-Z]{2}|[iI]-[a-zA-Z]+|[xX]-[a-zA-Z]{1,8})(-[a-zA-Z]{1,8})*'])),
+        '{http://www.w3.org/2001/XMLSchema}base64Binary': codec.Base64Binary,
+        '{http://www.w3.org/2001/XMLSchema}hexBinary': codec.HexBinary,
         }
     types = {k:v if isinstance(v, Leaf) else Leaf(type=v) for k,v in types.items()}
     
-    @staticmethod
-    def _format_relativedelta(v):
-        s = 'P{years}Y{months}M{days}DT{hours}H{minutes}M{seconds}S'.format(**v.__dict__)
-        if '-' in s:
-            # todo: handle this correctly
-            s = s.replace('-', '')
-            s = '-' + s
-        return s
-    formatters = collections.defaultdict(lambda: str, {
-        type(''): str,
-        bool: lambda v: 'true' if v else 'false',
-        type(None): lambda v: None,
-        datetime.date: datetime.date.isoformat,
-        datetime.time: lambda v: re.sub(r'\.\d+(\+|Z|$)', r'\1', v.isoformat()),
-        datetime.datetime: lambda v: re.sub(r'\.\d+(\+|Z|$)', r'\1', v.isoformat()),
-        type(lambda : None): lambda v: SOAP.formatters[type(v())](v()),
-        type(repr): lambda v: SOAP.formatters[type(v())](v()),
-        dateutil.relativedelta.relativedelta: _format_relativedelta,
-        list: lambda v: ' '.join(SOAP.formatters[type(item)](item) for item in v),
-    })
+    formatters = codec.formatters
     
-    @staticmethod
-    def _parse_relativedelta(v):
-        kwargs = re.search('(?P<negative>-)?P'
-                           '(?P<years>\d+Y)?'
-                           '(?P<months>\d+M)?'
-                           '(?P<days>\d+D)?'
-                           'T?'
-                           '(?P<hours>\d+H)?'
-                           '(?P<minutes>\d+M)?'
-                           '(?P<seconds>\d+S)?', 
-                           v).groupdict('0')
-        negative = kwargs.pop('negative')
-        kwargs = {k:int(re.sub('\D', '', v)) for k,v in kwargs.items()}
-        rd = dateutil.relativedelta.relativedelta(**kwargs)
-        if negative != '0':
-            return -rd
-        return rd
-    @staticmethod
-    def _parse_time(val):
-        val = dateutil.parser.parse(val)
-        return val.time().replace(tzinfo=val.tzinfo)
-    @staticmethod
-    def _parse_bool(val):
-        if val == 'false':
-            return False
-        elif val == 'true':
-            return True
-        else:
-            raise ValueError('{} not a boolean'.format(val))
     parsers = collections.defaultdict(lambda : str, {
         '{http://www.w3.org/2001/XMLSchema}string': str,
-        '{http://www.w3.org/2001/XMLSchema}boolean': _parse_bool,
+        '{http://www.w3.org/2001/XMLSchema}boolean': codec.parse_bool,
         '{http://www.w3.org/2001/XMLSchema}decimal': decimal.Decimal,
         '{http://www.w3.org/2001/XMLSchema}float': float,
         '{http://www.w3.org/2001/XMLSchema}double': float,
-        '{http://www.w3.org/2001/XMLSchema}duration': _parse_relativedelta,
-        '{http://www.w3.org/2001/XMLSchema}dateTime': dateutil.parser.parse,
-        '{http://www.w3.org/2001/XMLSchema}time': _parse_time,
-        '{http://www.w3.org/2001/XMLSchema}date': lambda v: dateutil.parser.parse(v).date(),
+        '{http://www.w3.org/2001/XMLSchema}duration': codec.parse_duration,
+        '{http://www.w3.org/2001/XMLSchema}dateTime': codec.parse_datetime,
+        '{http://www.w3.org/2001/XMLSchema}time': codec.parse_time,
+        '{http://www.w3.org/2001/XMLSchema}date': codec.parse_date,
         '{http://www.w3.org/2001/XMLSchema}integer': int,
         '{http://www.w3.org/2001/XMLSchema}byte': int,
         '{http://www.w3.org/2001/XMLSchema}short': int,
@@ -474,13 +1307,30 @@ class SOAP(object):
         '{http://www.w3.org/2001/XMLSchema}nonPositiveInteger': int,
         '{http://www.w3.org/2001/XMLSchema}anyURI': str,
         '{http://www.w3.org/2001/XMLSchema}language': str,
+        '{http://www.w3.org/2001/XMLSchema}base64Binary': codec.parse_base64,
+        '{http://www.w3.org/2001/XMLSchema}hexBinary': codec.parse_hex,
     })
     
-    # todo
     @staticmethod
     def parse(xml, type_tree):
-        return {}
-
+        return Decoder(type_tree).parse(xml)
+    
+    @staticmethod
+    def find_repeated(type_tree, path=(), seen=None):
+        # path to the first field with maxOccurs > 1, depth first
+        seen = seen or set()
+        if not isinstance(type_tree, Node) or id(type_tree) in seen:
+            return None
+        seen.add(id(type_tree))
+        for k in type_tree.keys():
+            v = type_tree[k]
+            if isinstance(v, list):
+                return path + (k,)
+            found = SOAP.find_repeated(v, path + (k,), seen)
+            if found:
+                return found
+        return None
+    
     namespaces = {'wsdl': 'http://schemas.xmlsoap.org/wsdl/',
                   'soap': 'http://schemas.xmlsoap.org/wsdl/soap/',
                   'soap12': 'http://schemas.xmlsoap.org/wsdl/soap12/',
@@ -488,54 +1338,916 @@ class SOAP(object):
                   'mime': 'http://schemas.xmlsoap.org/wsdl/mime/',
                   'soapenc': 'http://schemas.xmlsoap.org/soap/encoding/',
                   'soapenv': 'http://schemas.xmlsoap.org/soap/envelope/',
-                  'xsi': 'http://www.w3.org/2000/10/XMLSchema-instance ',
+                  'xsi': 'http://www.w3.org/2001/XMLSchema-instance',
                   'xsd': 'http://www.w3.org/2000/10/XMLSchema',
                   'xs': 'http://www.w3.org/2001/XMLSchema',
                   }
 
+SOAP.type_parsers = collections.defaultdict(lambda: str, {leaf.type: SOAP.parsers[k] for k, leaf in SOAP.types.items()})
+# xs:list simple types, by item type
+SOAP.type_parsers.update((type_, codec.parsers[type_]) for type_ in codec.List.of.values())
+
+class Decoder(object):
+    # converts a SOAP envelope (or a bare payload element) into python values,
+    # using the type tree to pick the parser of every leaf and to tell which
+    # fields are lists. it runs over iterparse events and clears every element
+    # once it's converted, so only the python result is kept in memory.
+    # with `records` (a path like 'result/item' relative to the payload) those
+    # elements are yielded one at a time by decode() instead of being collected
+    envelope_tag = '{%s}Envelope' % SOAP.namespaces['soapenv']
+    header_tag = '{%s}Header' % SOAP.namespaces['soapenv']
+    body_tag = '{%s}Body' % SOAP.namespaces['soapenv']
+    fault_tag = '{%s}Fault' % SOAP.namespaces['soapenv']
+    nil_attrib = '{%s}nil' % SOAP.namespaces['xsi']
+    
+    class Frame(object):
+        __slots__ = ('type', 'name', 'path', 'repeated', 'children', 'columns', 'attachment')
+        def __init__(self, type, name, path, repeated):
+            self.type = type
+            self.name = name
+            self.path = path
+            self.repeated = repeated
+            self.children = None
+            self.columns = None
+            self.attachment = None
+    
+    class Arrived(object):
+        # a file whose read(size) returns what has arrived (read1) instead of
+        # waiting for `size` bytes, so a slow response is decoded as it comes
+        __slots__ = ('read',)
+        def __init__(self, source):
+            self.read = source.read1
+    
+    def __init__(self, body_tree=None, header_tree=None, records=None, attachments=None, faults=None):
+        # attachments: the parts of an MTOM response by content id. faults: the
+        # operation's (SoapCall.faults), whose elements type a Fault's detail
+        self.body_tree = body_tree
+        self.header_tree = header_tree
+        self.attachments = attachments
+        if isinstance(records, str):
+            records = tuple(records.split('/'))
+        self.records = records
+        self.header = None
+        self.body = None
+        self.fault_tree = None
+        if faults:
+            detail = Node(None)
+            for element_name, type_ in faults.values():
+                detail[element_name.rpartition('}')[2]] = type_
+            self.fault_tree = Node(None, detail=detail)
+    
+    def parse(self, source):
+        for _ in self.decode(source):
+            pass
+        return self.body
+    
+    def decode(self, source):
+        if isinstance(source, lxml.etree._Element):
+            events = lxml.etree.iterwalk(source, events=('start', 'end'))
+            clear = False
+        else:
+            if isinstance(source, (bytes, str)):
+                source = io.BytesIO(source.encode() if isinstance(source, str) else source)
+            elif getattr(source, 'read1', None) is not None:
+                source = self.Arrived(source)
+            events = lxml.etree.iterparse(source, events=('start', 'end'), huge_tree=True)
+            clear = True
+        
+        stack = []
+        depth = 0
+        payload_depth = None
+        section = self.body_tag
+        for event, elem in events:
+            if event == 'start':
+                depth += 1
+                if payload_depth is None:
+                    # a bare payload element is decoded as if it was the body
+                    payload_depth = 3 if elem.tag == self.envelope_tag else 1
+                if depth == payload_depth - 1:
+                    section = elem.tag
+                if depth < payload_depth or section not in (self.body_tag, self.header_tag):
+                    continue
+                name = elem.tag.rpartition('}')[2]
+                if stack:
+                    parent = stack[-1]
+                    type_, repeated = self.field(parent.type, name)
+                    stack.append(self.Frame(type_, name, parent.path + (name,), repeated))
+                elif section == self.header_tag:
+                    stack.append(self.Frame(self.header_tree, name, (), False))
+                elif elem.tag == self.fault_tag:
+                    stack.append(self.Frame(self.fault_tree, name, (), False))
+                else:
+                    stack.append(self.Frame(self.body_tree, name, (), False))
+                continue
+            
+            depth -= 1
+            if not stack or depth < payload_depth - 1 or section not in (self.body_tag, self.header_tag):
+                continue
+            frame = stack.pop()
+            if elem.tag == mtom.XOP_INCLUDE and self.attachments is not None and stack:
+                # the content of the binary field it's in
+                stack[-1].attachment = mtom.resolve(elem.get('href', ''), self.attachments)
+                continue
+            # repeated leaves are kept as text and parsed as one column when
+            # their parent ends
+            column = frame.repeated and frame.path != self.records and isinstance(frame.type, Leaf)
+            if frame.attachment is not None:
+                value = frame.attachment
+            elif column:
+                value = None if elem.get(self.nil_attrib) == 'true' else elem.text or ''
+            else:
+                value = self.convert(elem, frame)
+            if clear:
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+            
+            if stack:
+                if frame.path == self.records:
+                    yield value
+                else:
+                    self.attach(stack[-1], frame, value)
+                    if column:
+                        # in document order, as the generated readers parse them
+                        stack[-1].columns = stack[-1].columns or {}
+                        stack[-1].columns[frame.name] = None
+            elif section == self.header_tag:
+                self.header = self.header or {}
+                self.header[frame.name] = value
+            elif elem.tag == self.fault_tag:
+                raise Fault(**(value if isinstance(value, dict) else {}))
+            else:
+                self.body = value
+    
+    @staticmethod
+    def field(node, name):
+        if not isinstance(node, Node):
+            return None, False
+        try:
+            type_ = node[name]
+        except KeyError:
+            return None, False
+        if isinstance(type_, list):
+            return type_[0], True
+        return type_, False
+    
+    @staticmethod
+    def attach(parent, frame, value):
+        if parent.children is None:
+            parent.children = {}
+        children = parent.children
+        if frame.repeated:
+            children.setdefault(frame.name, []).append(value)
+        elif frame.name in children:
+            # repeated although the schema says otherwise
+            if not isinstance(children[frame.name], list):
+                children[frame.name] = [children[frame.name]]
+            children[frame.name].append(value)
+        else:
+            children[frame.name] = value
+    
+    @staticmethod
+    def parse_value(text, leaf):
+        if text is None:
+            text = ''
+        type_ = leaf.type if isinstance(leaf, Leaf) else getattr(leaf, 'type', str)
+        if text == '' and type_ is not str:
+            return None
+        return SOAP.type_parsers[type_](text)
+    
+    def convert(self, elem, frame):
+        if elem.get(self.nil_attrib) == 'true':
+            return None
+        type_ = frame.type
+        if frame.columns:
+            for name in frame.columns:
+                frame.children[name] = codec.decode_column(frame.children[name], self.field(type_, name)[0].type)
+        if isinstance(type_, Leaf):
+            return self.parse_value(elem.text, type_)
+        
+        value = frame.children
+        if elem.attrib:
+            for k, v in elem.attrib.items():
+                if k.startswith('{%s}' % SOAP.namespaces['xsi']):
+                    continue
+                k = '@' + k.rpartition('}')[2]
+                attribute_type, _ = self.field(type_, k)
+                value = value if value is not None else {}
+                value[k] = self.parse_value(v, attribute_type) if attribute_type is not None else v
+        
+        text = elem.text
+        if text is not None and not text.strip() and value is not None:
+            text = None
+        if value is None:
+            # no child elements or attributes: simple content
+            if isinstance(type_, Node) and getattr(type_, 'type', None) is not None:
+                return self.parse_value(text, type_)
+            return text
+        if text is not None:
+            value['#text'] = self.parse_value(text, type_) if getattr(type_, 'type', None) is not None else text
+        return value
+
+class ResultView(collections.abc.Mapping):
+    # read-only mapping over one element of a response document, with the
+    # keys and values Decoder would give it. the children are only grouped by
+    # name on first use, and a value is converted (and kept) when it's read:
+    # complex children are views themselves, repeated ones ResultSequences
+    xsi_prefix = '{%s}' % SOAP.namespaces['xsi']
+    
+    def __init__(self, elem, type_=None, attachments=None):
+        self._elem = elem
+        self._type = type_
+        self._attachments = attachments
+        self._fields = None
+        self._values = {}
+    
+    @staticmethod
+    def value(elem, type_, attachments=None):
+        # the python value of an element: a scalar, None or a view
+        if elem.get(Decoder.nil_attrib) == 'true':
+            return None
+        if isinstance(type_, Leaf):
+            if attachments is not None and len(elem) and elem[0].tag == mtom.XOP_INCLUDE:
+                return mtom.resolve(elem[0].get('href', ''), attachments)
+            return Decoder.parse_value(elem.text, type_)
+        if len(elem) or any(not k.startswith(ResultView.xsi_prefix) for k in elem.attrib):
+            return ResultView(elem, type_, attachments)
+        # simple content
+        if getattr(type_, 'type', None) is not None:
+            return Decoder.parse_value(elem.text, type_)
+        return elem.text
+    
+    @property
+    def fields(self):
+        # key -> element(s) / attribute value / '#text', in Decoder's order
+        if self._fields is None:
+            fields = {}
+            elem = self._elem
+            for child in elem:
+                if isinstance(child.tag, str):
+                    fields.setdefault(child.tag.rpartition('}')[2], []).append(child)
+            for k, v in elem.attrib.items():
+                if not k.startswith(self.xsi_prefix):
+                    fields['@' + k.rpartition('}')[2]] = v
+            text = elem.text
+            if text is not None and text.strip():
+                fields['#text'] = text
+            self._fields = fields
+        return self._fields
+    
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        field = self.fields[key]
+        type_, repeated = Decoder.field(self._type, key)
+        if key.startswith('@'):
+            value = Decoder.parse_value(field, type_) if type_ is not None else field
+        elif key == '#text':
+            value = Decoder.parse_value(field, self._type) if getattr(self._type, 'type', None) is not None else field
+        elif repeated or len(field) > 1:
+            value = ResultSequence(field, type_, self._attachments)
+        else:
+            value = self.value(field[0], type_, self._attachments)
+        self._values[key] = value
+        return value
+    
+    def __iter__(self):
+        return iter(self.fields)
+    
+    def __len__(self):
+        return len(self.fields)
+    
+    def __contains__(self, key):
+        return key in self.fields
+    
+    def to_dict(self):
+        # the whole element converted at once, as Decoder does
+        return Decoder(self._type, attachments=self._attachments).parse(self._elem)
+    
+    def __repr__(self):
+        return 'ResultView({!r})'.format(self.to_dict())
+
+class ResultSequence(collections.abc.Sequence):
+    # read-only list over the elements of a repeated field, converted by item
+    def __init__(self, elems, type_=None, attachments=None):
+        self._elems = elems
+        self._type = type_
+        self._attachments = attachments
+        self._values = {}
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self._elems)))]
+        if index < 0:
+            index += len(self._elems)
+        try:
+            return self._values[index]
+        except KeyError:
+            pass
+        value = self._values[index] = ResultView.value(self._elems[index], self._type, self._attachments)
+        return value
+    
+    def __len__(self):
+        return len(self._elems)
+    
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, ResultSequence)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+    
+    def __repr__(self):
+        return 'ResultSequence({!r})'.format(list(self))
+
+class Serializer(object):
+    # request envelope plan, compiled once per SoapCall from its input type
+    # trees: for every node the accepted keys, its attributes, its text and
+    # its child elements in order, each with a precomputed tag (namespace
+    # included) and formatter. building an envelope is then one walk over the
+    # user's dict; the type tree is never copied
+    envelope_tag = '{%s}Envelope' % SOAP.namespaces['soapenv']
+    header_tag = '{%s}Header' % SOAP.namespaces['soapenv']
+    body_tag = '{%s}Body' % SOAP.namespaces['soapenv']
+    nil_attrib = '{%s}nil' % SOAP.namespaces['xsi']
+    _missing = object()
+    
+    class Plan(object):
+        __slots__ = ('fields', 'attributes', 'elements', 'text', 'check', 'text_check', 'required')
+    
+    class Errors(list):
+        # the violations found while writing (strict mode). the items of
+        # generators are checked as they're consumed, after the rest was
+        # validated: the first failing one's are only raised when there are no others
+        deferred = None
+    
+    # the xsd names of the types whose values' lexical form is checked, when
+    # they're given as something else (a str for an int field...)
+    lexical_names = {bool: 'boolean', int: 'integer', float: 'double', decimal.Decimal: 'decimal',
+                     datetime.datetime: 'dateTime', datetime.date: 'date', datetime.time: 'time',
+                     dateutil.relativedelta.relativedelta: 'duration'}
+    _validators = {}
+    
+    def __init__(self, header_tree=None, header_name=None, body_tree=None, body_name=None):
+        self.plans = {}
+        self.namespaces = OrderedSet()
+        self.header = self.compile_root(header_tree, header_name)
+        self.body = self.compile_root(body_tree, body_name)
+        self.nsmap = {'soapenv': SOAP.namespaces['soapenv'], 'xsi': SOAP.namespaces['xsi']}
+        for i, ns in enumerate(self.namespaces):
+            self.nsmap['ns%d' % i] = ns
+    
+    def compile_root(self, type_tree, name):
+        if type_tree is None:
+            return None
+        if name and name.startswith('{'):
+            self.namespaces.add(name[1:].partition('}')[0])
+        return (name, self.compile(type_tree), self.leaf_formatter(type_tree), self.validator(type_tree))
+    
+    @staticmethod
+    def leaf_formatter(leaf):
+        if not isinstance(leaf, Leaf):
+            return None
+        return (leaf.type, SOAP.formatters[leaf.type])
+    
+    @staticmethod
+    def validator(type_):
+        return Serializer.compiled(type_.type if isinstance(type_, Leaf) else None, getattr(type_, 'restriction', None))
+    
+    @staticmethod
+    def compiled(type_, restriction):
+        # the checks of a field's values, compiled once per (python type,
+        # restriction): the lexical form of values of another type than the
+        # field's, then the restriction's facets, on those values as parsed
+        # with the field's type. None if there's nothing to check
+        key = (type_, restriction)
+        validator = Serializer._validators.get(key)
+        if validator is None:
+            facets = restriction.validator if restriction is not None else None
+            lexical = Serializer.lexical(type_)
+            if lexical is None or facets is None:
+                validator = lexical or facets or False
+            else:
+                parse = SOAP.type_parsers[type_]
+                def validator(value):
+                    problems = lexical(value)
+                    if problems:
+                        return problems
+                    if value is not None and type(value) is not type_:
+                        value = parse(Restriction._lexical(value))
+                    return facets(value)
+            validator = Serializer._validators.setdefault(key, validator)
+        return validator or None
+    
+    @staticmethod
+    def lexical(type_):
+        name = Serializer.lexical_names.get(type_)
+        if isinstance(type_, type) and issubclass(type_, codec.List) and type_.item in Serializer.lexical_names:
+            name = 'list of {}'.format(Serializer.lexical_names[type_.item])
+        if name is None:
+            return None
+        parse = SOAP.type_parsers[type_]
+        message = ['value must be a valid {}'.format(name)]
+        def lexical(value):
+            if type(value) is type_ or value is None:
+                return []
+            try:
+                parse(Restriction._lexical(value))
+            except (ValueError, TypeError, ArithmeticError, AttributeError):
+                return message
+            return []
+        return lexical
+    
+    @staticmethod
+    def owner(node, key):
+        # the node in the base chain that declares key
+        if node.inherited:
+            return node.inherited.get(key, node)
+        return node
+    
+    def compile(self, node):
+        if not isinstance(node, Node):
+            return None
+        plan = self.plans.get(id(node))
+        if plan is not None:
+            return plan
+        plan = self.plans[id(node)] = self.Plan()
+        plan.attributes = []
+        plan.elements = []
+        plan.text = None
+        plan.check = self.validator(node)
+        if getattr(node, 'type', None) is not None:
+            plan.text = (node.type, SOAP.formatters[node.type])
+        occurs = node.occurs or {}
+        required = []
+        for k in node.keys():
+            v = node[k]
+            if k == '#text':
+                plan.text = self.leaf_formatter(v) or plan.text
+            elif k.startswith('#'):
+                continue
+            elif k.startswith('@'):
+                plan.attributes.append((k, k[1:], self.leaf_formatter(v), self.validator(v)))
+                if k in occurs and occurs[k].required:
+                    required.append(k)
+            else:
+                repeated = isinstance(v, list)
+                if repeated:
+                    v = v[0]
+                ns = (self.owner(node, k) or node).get('#namespace')
+                if ns:
+                    self.namespaces.add(ns)
+                tag = '{%s}%s' % (ns, k) if ns else k
+                default = v.default if isinstance(v, Leaf) else Leaf._sentinel
+                # how many items a repeated field takes, (at least, at most or None)
+                bounds = None
+                if k in occurs:
+                    if occurs[k].required and default is Leaf._sentinel:
+                        required.append(k)
+                    if repeated:
+                        bounds = (occurs[k].minOccurs or 0, occurs[k].maxOccurs if isinstance(occurs[k].maxOccurs, int) else None)
+                plan.elements.append((k, tag, repeated, self.compile(v), self.leaf_formatter(v), default, self.validator(v), bounds))
+        plan.text_check = self.compiled(plan.text[0], None) if plan.text is not None else None
+        plan.required = tuple(required)
+        plan.fields = frozenset([k for k, *_ in plan.elements] + [k for k, *_ in plan.attributes] + ['#text'])
+        return plan
+    
+    @staticmethod
+    def format(value, formatter):
+        if formatter is not None and (type(value) is formatter[0] or formatter[0] in codec.binary):
+            value = formatter[1](value)
+        else:
+            value = SOAP.formatters[type(value)](value)
+        return '' if value is None else value
+    
+    # the checks made while writing, on `errors` (an Errors, or None when
+    # nothing is checked): some problems are raised right away without it
+    
+    @staticmethod
+    def check(validator, path, value, errors):
+        problems = validator(value)
+        if problems:
+            errors.extend('{}: {!r} does not satisfy {}'.format(path, value, message) for message in problems)
+    
+    @staticmethod
+    def not_a_dict(tag, path, value, errors):
+        if errors is None:
+            raise ValueError('{} takes a dict, not {!r}'.format(tag, value))
+        errors.append('{}: takes a dict, not {!r}'.format(path, value))
+    
+    @staticmethod
+    def unknown_fields(tag, path, value, fields, errors):
+        unknown = [k for k in value if k not in fields]
+        if errors is None:
+            raise ValueError('{} has no field(s) {}'.format(tag, ', '.join(repr(k) for k in unknown)))
+        errors.extend('{}: unknown field {!r}'.format(path, k) for k in unknown)
+    
+    @staticmethod
+    def missing_fields(path, value, required, errors):
+        errors.extend('{}: missing required field {!r}'.format(path, k) for k in required if k not in value)
+    
+    @staticmethod
+    def count(path, count, bounds, errors):
+        low, high = bounds
+        if count < low:
+            errors.append('{}: {} given, at least {} are required'.format(path, count, low))
+        elif high is not None and count > high:
+            errors.append('{}: {} given, at most {} are allowed'.format(path, count, high))
+    
+    @staticmethod
+    def raise_errors(errors):
+        if errors:
+            raise ValidationError(errors)
+        if errors is not None and errors.deferred:
+            raise ValidationError(errors.deferred)
+    
+    def write(self, parent, tag, plan, formatter, check, value, path, errors):
+        elem = lxml.etree.SubElement(parent, tag)
+        if value is None:
+            elem.set(self.nil_attrib, 'true')
+            return elem
+        if errors is not None and check is not None:
+            self.check(check, path, value, errors)
+        if plan is None:
+            elem.text = self.format(value, formatter)
+            return elem
+        if not isinstance(value, collections.abc.Mapping):
+            if plan.text is None:
+                self.not_a_dict(tag, path, value, errors)
+                return elem
+            if errors is not None and plan.text_check is not None:
+                self.check(plan.text_check, path, value, errors)
+            elem.text = self.format(value, plan.text)
+            return elem
+        if not plan.fields.issuperset(value):
+            self.unknown_fields(tag, path, value, plan.fields, errors)
+        if errors is not None and plan.required:
+            self.missing_fields(path, value, plan.required, errors)
+        
+        for key, name, formatter, check in plan.attributes:
+            v = value.get(key)
+            if v is not None:
+                if errors is not None and check is not None:
+                    self.check(check, '{}/{}'.format(path, key), v, errors)
+                elem.set(name, self.format(v, formatter))
+        if plan.text is not None and value.get('#text') is not None:
+            if errors is not None and plan.text_check is not None:
+                self.check(plan.text_check, path, value['#text'], errors)
+            elem.text = self.format(value['#text'], plan.text)
+        missing = self._missing
+        for key, tag, repeated, sub_plan, formatter, default, check, bounds in plan.elements:
+            v = value.get(key, missing)
+            if v is missing:
+                if default is Leaf._sentinel:
+                    continue
+                v = default
+            if not (repeated and self.iterable(v)):
+                if errors is not None and bounds is not None:
+                    self.count('{}/{}'.format(path, key), 1, bounds, errors)
+                self.write(elem, tag, sub_plan, formatter, check, v, None if errors is None else '{}/{}'.format(path, key), errors)
+            elif not isinstance(v, (list, tuple)):
+                self.write_items(elem, tag, sub_plan, formatter, check, bounds, path, key, v, errors)
+            elif sub_plan is None:
+                if errors is not None:
+                    self.check_items(check, bounds, path, key, v, errors)
+                self.write_column(elem, tag, formatter, v)
+            else:
+                if errors is not None and bounds is not None:
+                    self.count('{}/{}'.format(path, key), len(v), bounds, errors)
+                for i, item in enumerate(v):
+                    self.write(elem, tag, sub_plan, formatter, check, item,
+                               None if errors is None else '{}/{}[{}]'.format(path, key, i), errors)
+        return elem
+    
+    def check_items(self, check, bounds, path, key, values, errors):
+        # the items of a repeated leaf given as a list
+        if bounds is not None:
+            self.count('{}/{}'.format(path, key), len(values), bounds, errors)
+        if check is not None:
+            for i, item in enumerate(values):
+                if item is not None:
+                    self.check(check, '{}/{}[{}]'.format(path, key, i), item, errors)
+    
+    def write_column(self, parent, tag, formatter, values):
+        for text in codec.encode_column(values, formatter[0] if formatter is not None else None):
+            elem = lxml.etree.SubElement(parent, tag)
+            if text is None:
+                elem.set(self.nil_attrib, 'true')
+            else:
+                elem.text = text
+    
+    def write_items(self, parent, tag, plan, formatter, check, bounds, path, key, values, errors):
+        # a repeated field given as a generator: see Errors
+        count = 0
+        for item in values:
+            problems = self.item_errors(errors)
+            self.write(parent, tag, plan, formatter, check, item,
+                       None if problems is None else '{}/{}[{}]'.format(path, key, count), problems)
+            self.defer(errors, problems)
+            count += 1
+        if errors is not None and bounds is not None:
+            self.count('{}/{}'.format(path, key), count, bounds, errors)
+    
+    def item_errors(self, errors):
+        # where the violations of a generator's next item go, if it's checked
+        if errors is None:
+            return None
+        return self.Errors()
+    
+    @staticmethod
+    def defer(errors, problems):
+        if problems is not None and errors.deferred is None:
+            errors.deferred = list(problems) or problems.deferred
+    
+    @staticmethod
+    def iterable(value):
+        # what a repeated field takes for its items: lists, tuples, generators...
+        return isinstance(value, collections.abc.Iterable) and not isinstance(value, (str, bytes, collections.abc.Mapping))
+    
+    def tree(self, header, body, errors):
+        envelope = lxml.etree.Element(self.envelope_tag, nsmap=self.nsmap)
+        if self.header is not None and header is not None:
+            name, plan, formatter, check = self.header
+            self.write(lxml.etree.SubElement(envelope, self.header_tag), name, plan, formatter, check, header,
+                       XML.stripns(name or '') or 'body', errors)
+        body_elem = lxml.etree.SubElement(envelope, self.body_tag)
+        if self.body is not None:
+            name, plan, formatter, check = self.body
+            # no body, no checks: it's sent empty
+            self.write(body_elem, name, plan, formatter, check, {} if body is None else body,
+                       XML.stripns(name or '') or 'body', None if body is None else errors)
+        return envelope
+    
+    def validate(self, header=None, body=None):
+        # every violation in the header / body, as messages: the envelope is
+        # written as it would be sent, and dropped
+        errors = self.Errors()
+        self.tree(header, body, errors)
+        return list(errors) or list(errors.deferred or ())
+    
+    def envelope(self, header=None, body=None):
+        # in strict mode the values are checked while they're written, and
+        # the envelope is only returned if there was nothing wrong with them
+        errors = self.Errors() if STRICT_MODE else None
+        envelope = self.tree(header, body, errors)
+        self.raise_errors(errors)
+        return lxml.etree.tostring(envelope, xml_declaration=True, encoding='UTF-8')
+    
+    class Buffer(object):
+        # the bytes xmlfile has written so far, handed out in chunks; errors:
+        # the Errors of the envelope being written, if it's checked
+        def __init__(self, errors=None):
+            self.parts = []
+            self.size = 0
+            self.errors = errors
+        def write(self, data):
+            self.parts.append(bytes(data))
+            self.size += len(data)
+        def drain(self, errors=None):
+            # raising instead if what's in it was found invalid; errors: those
+            # of the generator item being written, if any
+            Serializer.raise_errors(self.errors)
+            if errors is not self.errors:
+                Serializer.raise_errors(errors)
+            data = b''.join(self.parts)
+            self.parts = []
+            self.size = 0
+            return data
+    
+    def stream(self, header=None, body=None, chunk_size=64 * 2**10):
+        # the same envelope as envelope(), as a generator of byte chunks of
+        # about chunk_size: it's written with lxml.etree.xmlfile while it's
+        # consumed, so repeated fields given as generators are never held in
+        # memory, neither as a tree nor as bytes. in strict mode a chunk
+        # holding invalid values isn't handed out, the ValidationError is raised instead
+        errors = self.Errors() if STRICT_MODE else None
+        buffer = self.Buffer(errors)
+        with lxml.etree.xmlfile(buffer, encoding='UTF-8') as xf:
+            xf.write_declaration()
+            with xf.element(self.envelope_tag, nsmap=self.nsmap):
+                if self.header is not None and header is not None:
+                    name, plan, formatter, check = self.header
+                    with xf.element(self.header_tag):
+                        yield from self.stream_write(xf, buffer, chunk_size, name, plan, formatter, check, header,
+                                                     XML.stripns(name or '') or 'body', errors)
+                with xf.element(self.body_tag):
+                    if self.body is not None:
+                        name, plan, formatter, check = self.body
+                        yield from self.stream_write(xf, buffer, chunk_size, name, plan, formatter, check,
+                                                     {} if body is None else body, XML.stripns(name or '') or 'body',
+                                                     None if body is None else errors)
+        if buffer.size or errors:
+            yield buffer.drain(errors)
+        self.raise_errors(errors)
+    
+    def stream_write(self, xf, buffer, chunk_size, tag, plan, formatter, check, value, path, errors):
+        # write() for an xmlfile; yields a chunk whenever chunk_size bytes
+        # have accumulated between two items of a repeated field
+        if value is None:
+            with xf.element(tag, {self.nil_attrib: 'true'}):
+                pass
+            return
+        if errors is not None and check is not None:
+            self.check(check, path, value, errors)
+        if plan is None:
+            with xf.element(tag):
+                if formatter is not None and formatter[0] in codec.binary:
+                    # files / buffers are encoded a piece at a time
+                    for text in codec.encode_binary(value, formatter[0]):
+                        xf.write(text)
+                        xf.flush()
+                        if buffer.size >= chunk_size:
+                            yield buffer.drain(errors)
+                else:
+                    xf.write(self.format(value, formatter))
+            return
+        if not isinstance(value, collections.abc.Mapping):
+            if plan.text is None:
+                self.not_a_dict(tag, path, value, errors)
+                return
+            if errors is not None and plan.text_check is not None:
+                self.check(plan.text_check, path, value, errors)
+            with xf.element(tag):
+                xf.write(self.format(value, plan.text))
+            return
+        if not plan.fields.issuperset(value):
+            self.unknown_fields(tag, path, value, plan.fields, errors)
+        if errors is not None and plan.required:
+            self.missing_fields(path, value, plan.required, errors)
+        
+        attrib = {}
+        for key, name, formatter, check in plan.attributes:
+            v = value.get(key)
+            if v is not None:
+                if errors is not None and check is not None:
+                    self.check(check, '{}/{}'.format(path, key), v, errors)
+                attrib[name] = self.format(v, formatter)
+        with xf.element(tag, attrib):
+            if plan.text is not None and value.get('#text') is not None:
+                if errors is not None and plan.text_check is not None:
+                    self.check(plan.text_check, path, value['#text'], errors)
+                xf.write(self.format(value['#text'], plan.text))
+            missing = self._missing
+            for key, tag, repeated, sub_plan, formatter, default, check, bounds in plan.elements:
+                v = value.get(key, missing)
+                if v is missing:
+                    if default is Leaf._sentinel:
+                        continue
+                    v = default
+                if not (repeated and self.iterable(v)):
+                    if errors is not None and bounds is not None:
+                        self.count('{}/{}'.format(path, key), 1, bounds, errors)
+                    yield from self.stream_write(xf, buffer, chunk_size, tag, sub_plan, formatter, check, v,
+                                                 None if errors is None else '{}/{}'.format(path, key), errors)
+                    continue
+                generator = not isinstance(v, (list, tuple))
+                if not generator and errors is not None:
+                    if sub_plan is None:
+                        self.check_items(check, bounds, path, key, v, errors)
+                    elif bounds is not None:
+                        self.count('{}/{}'.format(path, key), len(v), bounds, errors)
+                binary = formatter is not None and formatter[0] in codec.binary
+                count = 0
+                for item in v:
+                    # the items of a list were checked with the rest, a generator's see Errors
+                    problems, item_path = errors, None
+                    if generator:
+                        problems = self.item_errors(errors)
+                    if problems is not None:
+                        item_path = '{}/{}[{}]'.format(path, key, count)
+                    if sub_plan is None and not binary:
+                        # a leaf, inline rather than a generator per item
+                        if item is None:
+                            with xf.element(tag, {self.nil_attrib: 'true'}):
+                                pass
+                        else:
+                            if generator and problems is not None and check is not None:
+                                self.check(check, item_path, item, problems)
+                            with xf.element(tag):
+                                xf.write(self.format(item, formatter))
+                    else:
+                        item_check = check if generator or sub_plan is not None else None
+                        yield from self.stream_write(xf, buffer, chunk_size, tag, sub_plan, formatter, item_check, item, item_path, problems)
+                    if generator:
+                        self.defer(errors, problems)
+                    count += 1
+                    xf.flush()
+                    if buffer.size >= chunk_size:
+                        yield buffer.drain(errors)
+                if generator and errors is not None and bounds is not None:
+                    self.count('{}/{}'.format(path, key), count, bounds, errors)
+
 class XML(object):
     @staticmethod
     def findall(xmls=None, xpath=None, use_ns=False):
         elems = OrderedSet()
+        if not use_ns:
+            xpath = XML.compile(xpath)
         for xml in xmls:
             if use_ns:
                 elems.extend(xml.xpath(xpath, namespaces=xml.nsmap))
             else:
-                elems.extend(xml.xpath(xpath, namespaces=SOAP.namespaces))
+                elems.extend(xpath(xml))
         return elems
-        
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def compile(xpath):
+        return lxml.etree.XPath(xpath, namespaces=SOAP.namespaces)
+    
     @staticmethod
     def stripns(text):
-        text = re.sub('^\{.*?\}', '', text, 1)
+        text = re.sub(r'^\{.*?\}', '', text, 1)
         text = re.sub('^.*?:', '', text, 1)
         return text
     
-    @staticmethod
-    def qualname(elem):
-        name = []
-        for parent in XML.findparents(elem, '*[@name]') + [elem]:
-            ns = XML.findparent(elem, 'xs:schema[@targetNamespace]').attrib['targetNamespace']
-            name.append('{%s}%s' % (ns, parent.attrib['name']))
-        return '/'.join(name)
-    
     @staticmethod
     def type(tag, nsmap=None):
         ns, name = tag.split(':')
         return '{%s}%s' % ((nsmap or SOAP.namespaces)[ns], name)
+
+class SchemaIndex(object):
+    # built in a single walk over the documents: the nearest named ancestor,
+    # qualified name and targetNamespace of every element, plus the elements
+    # grouped by tag and by attribute, so that build_type_tree / get_soap_calls
+    # don't have to run ancestor:: or .// queries per element.
+    # named ancestors are only tracked below the root, so a named
+    # wsdl:definitions doesn't end up in the type names; outside of schemas
+    # names are in the definitions' targetNamespace
+    indexed_attributes = ('name', 'type', 'base', 'ref', 'default', 'minOccurs', 'maxOccurs')
+    schema_tag = '{%s}schema' % SOAP.namespaces['xs']
     
-    @staticmethod
-    def findparents(xml, xpath, use_ns=False):
-        if use_ns:
-            return xml.xpath('ancestor::%s'%xpath, namespaces=xml.nsmap)
+    def __init__(self, xmls):
+        self.parents = {}
+        self.qualnames = {}
+        self.namespaces = {}
+        self.qualified = {}
+        self.by_tag = collections.defaultdict(list)
+        self.by_attrib = collections.defaultdict(list)
+        for xml in xmls:
+            self.add(xml)
+    
+    def add(self, xml):
+        # the root itself is only context, like the './/' queries this replaces
+        if xml.tag == self.schema_tag:
+            self.walk(list(xml), (None, (), xml.get('targetNamespace'), xml.get('elementFormDefault') == 'qualified'))
         else:
-            return xml.xpath('ancestor::%s'%xpath, namespaces=SOAP.namespaces)
+            self.walk(list(xml), (None, (), xml.get('targetNamespace'), False))
     
-    @staticmethod
-    def findparent(xml, xpath, use_ns=False):
-        parents = XML.findparents(xml, xpath, use_ns)
-        if parents:
-            return parents[-1]
+    def walk(self, elems, context):
+        # context: (named parent, names of the named ancestors, targetNamespace,
+        # whether local elements are namespace qualified)
+        schema_tag = self.schema_tag
+        parents, qualnames, namespaces, qualified = self.parents, self.qualnames, self.namespaces, self.qualified
+        by_tag, by_attrib, indexed_attributes = self.by_tag, self.by_attrib, self.indexed_attributes
+        
+        stack = [(elem, context) for elem in reversed(elems)]
+        while stack:
+            elem, (parent, path, ns, form) = stack.pop()
+            tag = elem.tag
+            if not isinstance(tag, str): # comments, processing instructions
+                continue
+            parents[elem] = parent
+            namespaces[elem] = ns
+            by_tag[tag].append(elem)
+            attrib = elem.attrib
+            for k in indexed_attributes:
+                if k in attrib:
+                    by_attrib[k].append(elem)
+            
+            name = attrib.get('name')
+            if tag == schema_tag:
+                context = (None, (), attrib.get('targetNamespace', ns), attrib.get('elementFormDefault') == 'qualified')
+            elif name is not None:
+                path = path + (name,)
+                qualnames[elem] = '/'.join(['{%s}%s' % (ns, n) for n in path])
+                qualified[elem] = form if 'form' not in attrib else attrib['form'] == 'qualified'
+                context = (elem, path, ns, form)
+            else:
+                context = (parent, path, ns, form)
+            if len(elem):
+                stack.extend((child, context) for child in reversed(elem))
+    
+    def parent(self, elem):
+        return self.parents.get(elem)
+    
+    def qualname(self, elem):
+        return self.qualnames[elem]
+    
+    def namespace(self, elem):
+        # namespace of a named element's tag: top-level ones are always in the
+        # targetNamespace, local ones depend on elementFormDefault / form
+        if self.parents.get(elem) is None or self.qualified.get(elem):
+            return self.namespaces.get(elem)
         return None
+    
+    def findall(self, tag=None, attrib=None):
+        if tag is not None:
+            elems = self.by_tag.get(XML.type(tag) if ':' in tag else tag, [])
+            if attrib is not None:
+                return [e for e in elems if attrib in e.attrib]
+            return elems
+        return self.by_attrib.get(attrib, [])
 
 class SoapMessage(object):
     parts = None
@@ -547,32 +2259,24 @@ class SoapMessage(object):
 
 class WsdlParser(object):
     cache_directory = os.path.join('/', 'tmp', 'wsdls')
+    # downloads; replace with a WsdlCache of another directory / ttl / size
+    cache = WsdlCache(cache_directory)
     @staticmethod
     def get_wsdl_xml(wsdl_path):
+        return lxml.etree.XML(WsdlParser.get_wsdl_content(wsdl_path))
+    
+    @staticmethod
+    def get_wsdl_content(wsdl_path):
         try:
-            return lxml.etree.XML(open(wsdl_path, 'rb').read())
+            with open(wsdl_path, 'rb') as f:
+                return f.read()
         except FileNotFoundError:
             pass
-        
-        try:
-            return lxml.etree.XML(open(WsdlParser.get_cache_filename(wsdl_path), 'rb').read())
-        except FileNotFoundError:
-            req = requests.get(wsdl_path)
-            req.raise_for_status()
-            raw_xml = req.content
-            with open(WsdlParser.get_cache_filename(wsdl_path), 'wb') as f:
-                f.write(raw_xml)
-            return lxml.etree.XML(raw_xml)
+        return WsdlParser.cache.get(wsdl_path)
     
     @staticmethod
     def get_cache_filename(wsdl):
-        try:
-            os.mkdir(WsdlParser.cache_directory)
-        except FileExistsError:
-            pass
-        filename = os.path.join(WsdlParser.cache_directory,
-                                hashlib.sha1(wsdl.encode()).hexdigest())
-        return filename
+        return WsdlParser.cache.filename(wsdl)
     
     @staticmethod
     def get_soap_messages(wsdls):
@@ -585,28 +2289,33 @@ class WsdlParser(object):
         return soap_messages
     
     @staticmethod
-    def build_type_tree(wsdls):
-        non_type_tags = {XML.type(tag) for tag in ['wsdl:message', 'wsdl:part', 'wsdl:portType', 'wsdl:operation', 'wsdl:binding', 'wsdl:service', 'wsdl:port', 'wsdl:message', 'wsdl:input', 'wsdl:output']}
-                
-        type_tree = OrderedDefaultDict(keyfunc=functools.partial(Node, None))
+    def build_type_tree(wsdls, index=None, type_tree=None):
+        # with a type_tree given, only the elements in index are added to it
+        index = index or SchemaIndex(wsdls)
+        # messages, operations, faults... have names too, but aren't types
+        non_type_namespaces = tuple('{%s}' % SOAP.namespaces[k] for k in ('wsdl', 'soap', 'soap12', 'http', 'mime'))
+        
+        if type_tree is None:
+            type_tree = OrderedDefaultDict(keyfunc=functools.partial(Node, None))
+            # get all the leaf types into the tree
+            type_tree.update(SOAP.types)
         
-        # get all the leaf types into the tree
-        type_tree.update(SOAP.types)
-        for elem in [e for e in XML.findall(wsdls, './/xs:simpleType') if e.tag not in non_type_tags]:
+        for elem in index.findall('xs:simpleType'):
             name = elem.attrib.get('name')
             if name is not None: # has a name -> add it to the type tree root
-                type_tree[XML.qualname(elem)] = Leaf()
+                type_tree[index.qualname(elem)] = Leaf()
             else: # otherwise it's defined under something -> add it under the parent
-                parent = XML.findparent(elem, '*[@name]', True)
-                type_tree[XML.qualname(parent)] = Leaf()
+                parent = index.parent(elem)
+                type_tree[index.qualname(parent)] = Leaf()
         
         # get all the node types into the tree
-        for elem in [e for e in XML.findall(wsdls, './/*[@name]') if e.tag not in non_type_tags]:
+        for elem in [e for e in index.findall(attrib='name') if not e.tag.startswith(non_type_namespaces)]:
             # todo: handle group + attributeGroup correctly
             
             name = elem.attrib['name']
             if elem.tag == '{http://www.w3.org/2001/XMLSchema}attribute':
                 name = '@'+name
+            name = sys.intern(name)
             
             if elem.attrib.get('type'):
                 # has a type -> get it from the tree and add it by name
@@ -615,147 +2324,557 @@ class WsdlParser(object):
                 # no type -> type declaration
                 type_ = None
             
-            parent = XML.findparent(elem, '*[@name]', True)
+            parent = index.parent(elem)
+            
+            if parent is not None and elem.tag == '{http://www.w3.org/2001/XMLSchema}element':
+                # namespace of the parent's child elements
+                type_tree[index.qualname(parent)]['#namespace'] = index.namespace(elem)
             
             if parent is not None:
                 if type_ is not None: # has a parent -> add it to the parent by name
-                    type_tree[XML.qualname(parent)][name] = type_
+                    type_tree[index.qualname(parent)][name] = type_
                 else: # or make sure it exists at the root level
-                    type_tree[XML.qualname(parent)][name] = type_tree[XML.qualname(elem)]
+                    type_tree[index.qualname(parent)][name] = type_tree[index.qualname(elem)]
             else:
                 if type_ is not None: # no parent -> top-level element -> add it to the type tree
-                    type_tree[XML.qualname(elem)] = type_
+                    type_tree[index.qualname(elem)] = type_
                 else: # or make sure it exists in the tree
-                    type_tree[XML.qualname(elem)]
-        
-        # todo: #namespace
+                    type_tree[index.qualname(elem)]
         
         # todo: union type
-        for elem in XML.findall(wsdls, './/xs:union'):
+        for elem in index.findall('xs:union'):
             pass
         
-        # todo: list type
-        for elem in XML.findall(wsdls, './/xs:list'):
-            pass
         
         # todo: ref="..." attribute in place of name
-        for elem in XML.findall(wsdls, './/*[@ref]'):
+        for elem in index.findall(attrib='ref'):
             pass
         
         # todo: qualified attribute names
         
         # todo: fixed element value
         
-        # todo: minOccurs + maxOccurs
-        for elem in XML.findall(wsdls, './/*[(@minOccurs or @maxOccurs) and @name]'):
-            elem_restrictions = {
-                'minOccurs': elem.attrib.get('minOccurs'),
-                'maxOccurs': elem.attrib.get('maxOccurs'),
-            }
-            elem_restrictions = {k:v for k,v in elem_restrictions.items() if v is not None}
+        # occurs of the fields (elements are required unless minOccurs="0",
+        # attributes only with use="required"), kept on the parent: see
+        # Node.occurs. elements of a choice, or of an optional sequence, are
+        # never required by themselves; the choice has its own restriction
+        xs = '{%s}' % SOAP.namespaces['xs']
+        compositors = (xs + 'sequence', xs + 'choice', xs + 'all')
+        for elem in index.findall(attrib='name'):
+            if elem.tag not in (xs + 'element', xs + 'attribute'):
+                continue
+            parent = index.parent(elem)
+            if parent is None:
+                continue
+            node = type_tree[index.qualname(parent)]
+            if not isinstance(node, Node):
+                continue
+            if elem.tag == xs + 'attribute':
+                if elem.get('use') != 'required':
+                    continue
+                occurs = Restriction(use='required')
+            else:
+                low, high = elem.get('minOccurs', '1'), elem.get('maxOccurs', '1')
+                ancestor = elem.getparent()
+                while ancestor is not None and ancestor.tag in compositors + (xs + 'extension', xs + 'complexContent'):
+                    if ancestor.tag == xs + 'choice' or ancestor.get('minOccurs') == '0':
+                        low = '0'
+                    ancestor = ancestor.getparent()
+                if low == '0' and high in ('1', 'unbounded'):
+                    continue
+                occurs = Restriction(minOccurs=low, maxOccurs=None if high == 'unbounded' else high)
+            node.occurs = node.occurs if node.occurs is not None else {}
+            node.occurs[sys.intern(('@' if elem.tag == xs + 'attribute' else '') + elem.attrib['name'])] = occurs
+        
+        # maxOccurs > 1 -> the field holds a list of its type; one (never
+        # modified) list per type, however many fields repeat it
+        repeated = {}
+        for elem in index.findall(attrib='maxOccurs'):
+            if elem.attrib['maxOccurs'] in ('0', '1') or 'name' not in elem.attrib:
+                continue
+            parent = index.parent(elem)
+            if parent is None:
+                continue
+            node = type_tree[index.qualname(parent)]
+            name = elem.attrib['name']
+            if name in node and not isinstance(node[name], list):
+                node[name] = repeated.setdefault(id(node[name]), [node[name]])
         
         # todo: handle xs:any
         
         # handle extensions
-        extended_types = [e for e in XML.findall(wsdls, './/*[@base]') if e.tag not in non_type_tags]
+        extended_types = [e for e in index.findall(attrib='base') if not e.tag.startswith(non_type_namespaces)]
         for elem in extended_types:
-            extended_type = XML.findparent(elem, '*[@name]', True)
+            extended_type = index.parent(elem)
             base_type = type_tree[XML.type(elem.attrib['base'], elem.nsmap)]
             if isinstance(base_type, Leaf):
-                type_tree[XML.qualname(extended_type)].type = base_type.type
+                type_tree[index.qualname(extended_type)].type = base_type.type
             else:
-                type_tree[XML.qualname(extended_type)].base = base_type
-            
+                type_tree[index.qualname(extended_type)].base = base_type
+        
+        # xs:list simple types -> a codec.List of the itemType, or of the type
+        # an inline simpleType restricts. its facets are the items', which
+        # aren't checked
+        for elem in index.findall('xs:list'):
+            leaf = type_tree[index.qualname(index.parent(elem))]
+            if not isinstance(leaf, Leaf):
+                continue
+            if elem.get('itemType'):
+                item = type_tree[XML.type(elem.attrib['itemType'], elem.nsmap)]
+                leaf.type = codec.list_type(item.type if isinstance(item, Leaf) else str)
+            else:
+                leaf.type = codec.list_type(leaf.type)
+        
         # handle other restrictions
-        for elem in XML.findall(wsdls, './/xs:restriction'):
-            elem_restrictions = {k: XML.findall([elem], 'xs:%s'%k) for k in Restriction.__dict__}
-            elem_restrictions = {k: [vi.attrib['value'] for vi in v] for k,v in elem_restrictions.items() if v}
+        facet_tags = {'{%s}%s' % (SOAP.namespaces['xs'], k): k for k in Restriction.facets}
+        list_tag = '{%s}list' % SOAP.namespaces['xs']
+        for elem in index.findall('xs:restriction'):
+            if elem.getparent().getparent() is not None and elem.getparent().getparent().tag == list_tag:
+                continue # an inline item type's
+            elem_restrictions = collections.OrderedDict()
+            for facet in elem:
+                if facet.tag in facet_tags:
+                    elem_restrictions.setdefault(facet_tags[facet.tag], []).append(facet.attrib['value'])
             elem_restrictions = {k: v[0] if len(v) == 1 else v for k,v in elem_restrictions.items()}
-            parent = XML.findparent(elem, '*[@name]', True)
-            type_tree[XML.qualname(parent)].restriction = type_tree[XML.qualname(parent)].restriction or Restriction()
-            type_tree[XML.qualname(parent)].restriction.update(elem_restrictions)
+            parent = type_tree[index.qualname(index.parent(elem))]
+            parent.restriction = (parent.restriction or Restriction.empty).updated(elem_restrictions)
         
         # handle choices
-        choice_elems = XML.findall(wsdls, './/xs:choice')
+        choice_elems = index.findall('xs:choice')
         for elem in choice_elems:
-            parent = XML.findparent(elem, '*[@name]', True)
-            type_tree[XML.qualname(parent)].restriction = type_tree[XML.qualname(parent)].restriction or Restriction()
-            type_tree[XML.qualname(parent)].restriction.update({
-                'choices': [e.attrib['name'] for e in XML.findall([elem], '*[@name]')],
+            parent = type_tree[index.qualname(index.parent(elem))]
+            parent.restriction = (parent.restriction or Restriction.empty).updated({
+                'choices': [e.attrib['name'] for e in elem if isinstance(e.tag, str) and 'name' in e.attrib],
                 'minOccurs': elem.attrib.get('minOccurs', '1'),
                 'maxOccurs': elem.attrib.get('maxOccurs', '1'),
             })
         
+        # extension hierarchies -> flat field layouts, now that every type is complete
+        for elem in extended_types:
+            extended = type_tree[index.qualname(index.parent(elem))]
+            if isinstance(extended, Node):
+                extended.flatten()
+        
         # todo: handle defaults
-        default_elems = XML.findall(wsdls, './/*[@default]')
+        default_elems = index.findall(attrib='default')
         for elem in default_elems:
             name = elem.attrib['name']
             #if name is not None: # has a name -> add it to the type tree
-            #    type_tree[XML.qualname(elem)].default = 
+            #    type_tree[index.qualname(elem)].default = 
             #else:  # otherwise add it to the parent
-            #    parent = XML.findparent(elem, '*[@name]', True)
-            #    type_tree[XML.qualname(parent)].default = 
+            #    parent = index.parent(elem)
+            #    type_tree[index.qualname(parent)].default = 
         return type_tree
     
     @staticmethod
-    def get_soap_calls(wsdls):
-        soap_messages = WsdlParser.get_soap_messages(wsdls)
-        type_tree = WsdlParser.build_type_tree(wsdls)
+    def get_soap_calls(wsdls, transport=None, soap_call_class=None, phases=None):
+        return WsdlParser.get_soap_calls_and_types(wsdls, transport, soap_call_class, phases)[0]
+    
+    @staticmethod
+    def get_soap_calls_and_types(wsdls, transport=None, soap_call_class=None, phases=None):
+        # the calls and the type tree they were built from
+        # phases: a metrics.Phases, given the time of build_type_tree and of the rest
+        phases = phases if phases is not None else metrics.Phases()
+        with phases('get_soap_calls'):
+            soap_messages = WsdlParser.get_soap_messages(wsdls)
+        with phases('build_type_tree'):
+            type_tree = WsdlParser.build_type_tree(wsdls)
+        with phases('get_soap_calls'):
+            ports = WsdlParser.get_ports(wsdls)
+            
+            soap_calls = []
+            for name, xmls in WsdlParser.get_operations(wsdls).items():
+                soap_calls.append(WsdlParser.get_soap_call(name, xmls, soap_messages, type_tree, ports,
+                                                           transport=transport, soap_call_class=soap_call_class))
+        return soap_calls, type_tree
+    
+    @staticmethod
+    def get_operations(wsdls):
+        operations = collections.OrderedDict()
+        for operation in XML.findall(wsdls, './/wsdl:operation'):
+            operations.setdefault(operation.attrib['name'], []).append(operation)
+        return operations
+    
+    @staticmethod
+    def get_ports(wsdls):
+        ports = collections.defaultdict(list)
+        for port in XML.findall(wsdls, './/wsdl:port[@binding]'):
+            ports[XML.stripns(port.attrib['binding'])].append(port)
+        return ports
+    
+    @staticmethod
+    def get_soap_call(name, xmls, soap_messages, type_tree, ports, transport=None, soap_call_class=None):
+        soap_call = (soap_call_class or SoapCall)()
+        soap_call.name = name
+        # None for templates: binding them to a client gives them its transport
+        soap_call.transport = transport
+        
+        for soapAction in XML.findall(xmls, 'soap:operation'):
+            soap_call.SOAPAction = soapAction.attrib['soapAction']
+        
+        for binding in XML.findall(xmls, 'ancestor::wsdl:binding'):
+            addresses = XML.findall(ports[binding.attrib['name']], 'soap:address[@location]')
+            for address in addresses:
+                soap_call.url = address.attrib['location']
+        
+        # normalize body / header elements with 'message' attribute
+        for elem in XML.findall(xmls, 'wsdl:*[@message]'):
+            message = elem.attrib['message']
+            for soap_elem in XML.findall(xmls, 'wsdl:%s/soap:*'%XML.stripns(elem.tag)):
+                if 'message' not in soap_elem.attrib:
+                    soap_elem.attrib['message'] = message
+        
+        for input_header in XML.findall(xmls, 'wsdl:input/soap:header'):
+            message = XML.stripns(input_header.attrib['message'])
+            part = input_header.attrib.get('part')
+            for elem in soap_messages[message][part]:
+                # for now only allow one part per body / header
+                soap_call.input_header_name = XML.type(elem, nsmap=input_header.nsmap)
+                soap_call.input_header = type_tree[soap_call.input_header_name]
         
-        operations_xmls = XML.findall(wsdls, './/wsdl:operation')
-        operations = {o.attrib['name'] : [] for o in operations_xmls}
-        for operations_xml in operations_xmls:
-            operations[operations_xml.attrib['name']].append(operations_xml)
+        for input_body in XML.findall(xmls, 'wsdl:input/soap:body'):
+            message = XML.stripns(input_body.attrib['message'])
+            parts = input_body.attrib.get('parts')
+            for elem in soap_messages[message][parts]:
+                # for now only allow one part per body / header
+                soap_call.input_body_name = XML.type(elem, nsmap=input_body.nsmap)
+                soap_call.input_body = type_tree[soap_call.input_body_name]
         
+        for output_header in XML.findall(xmls, 'wsdl:output/soap:header'):
+            message = XML.stripns(output_header.attrib['message'])
+            part = output_header.attrib.get('part')
+            for elem in soap_messages[message][part]:
+                # for now only allow one part per body / header
+                soap_call.output_header = type_tree[XML.type(elem, nsmap=output_header.nsmap)]
+        
+        for output_body in XML.findall(xmls, 'wsdl:output/soap:body'):
+            message = XML.stripns(output_body.attrib['message'])
+            parts = output_body.attrib.get('parts')
+            for elem in soap_messages[message][parts]:
+                # for now only allow one part per body / header
+                soap_call.output_body = type_tree[XML.type(elem, nsmap=output_body.nsmap)]
+        
+        # fault name, in the targetNamespace of the definitions declaring it ->
+        # type of its detail element
+        for fault in XML.findall(xmls, 'wsdl:fault[@message]'):
+            message = soap_messages.get(XML.stripns(fault.attrib['message']))
+            if message is None:
+                continue
+            name = '{%s}%s' % (fault.getroottree().getroot().get('targetNamespace'), fault.attrib['name'])
+            for elem in message[None]:
+                element_name = XML.type(elem, nsmap=fault.nsmap)
+                soap_call.faults = soap_call.faults or collections.OrderedDict()
+                soap_call.faults[name] = (element_name, type_tree[element_name])
+        
+        return soap_call
+
+class WsdlDocument(object):
+    # a fetched WSDL / schema document, parsed when first needed
+    references_cache = {} # contents digest -> references, for the process
+    
+    def __init__(self, location, content):
+        self.location = location
+        self.content = content
+        self.digest = hashlib.sha1(content).digest()
+        self.imports = []
+        self._xml = None
+    
+    @property
+    def xml(self):
+        if self._xml is None:
+            self._xml = lxml.etree.XML(self.content)
+        return self._xml
+    
+    def references(self):
+        # without any import / include there's nothing to follow, and no need
+        # to parse the document yet
+        references = self.references_cache.get(self.digest)
+        if references is None:
+            references = []
+            if b'import' in self.content or b'include' in self.content:
+                references = [str(location) for location in XML.compile(WsdlLoader.imports_xpath)(self.xml)]
+            self.references_cache[self.digest] = references
+        return references
+    
+    def __repr__(self):
+        return 'WsdlDocument({!r})'.format(self.location)
+
+class WsdlLoader(object):
+    # fetches the documents a Client is given plus everything they import
+    # (wsdl:import, xs:import and xs:include with a schemaLocation) on a
+    # thread pool. a document is fetched as soon as one that references it has
+    # been, so independent documents load concurrently and startup takes
+    # about as long as the slowest chain of imports. every location is loaded
+    # once and documents with the same contents (a schema under two urls) are
+    # returned once, ordered: each given document followed by what it imports.
+    # an import that can't be loaded is left out (see `failed`, each is
+    # logged as a warning), as imports were never followed before; the given
+    # documents must load
+    imports_xpath = '//wsdl:import/@location | //xs:import/@schemaLocation | //xs:include/@schemaLocation'
+    url = re.compile('^[a-zA-Z][a-zA-Z0-9+.-]*://')
+    
+    def __init__(self, workers=8):
+        self.workers = workers
+        self.failed = {}
+    
+    @staticmethod
+    def resolve(base, location):
+        if WsdlLoader.url.match(location) or os.path.isabs(location):
+            return location
+        if WsdlLoader.url.match(base):
+            return urllib.parse.urljoin(base, location)
+        return os.path.normpath(os.path.join(os.path.dirname(base), location))
+    
+    def fetch(self, location):
+        document = WsdlDocument(location, WsdlParser.get_wsdl_content(location))
+        document.imports = [self.resolve(location, reference) for reference in document.references()]
+        return document
+    
+    def load(self, locations):
+        locations = list(collections.OrderedDict.fromkeys(locations))
+        documents = {}
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as executor:
+            pending = {executor.submit(self.fetch, location): location for location in locations}
+            requested = set(locations)
+            importers = {}
+            while pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    location = pending.pop(future)
+                    try:
+                        document = future.result()
+                    except Exception as e:
+                        if location in locations:
+                            for other in pending:
+                                other.cancel()
+                            raise
+                        self.failed[location] = e
+                        logger.warning('could not load %s (imported by %s), left out: %r', location,
+                                       ', '.join(sorted(importers.get(location, ()))), e)
+                        continue
+                    documents[location] = document
+                    for imported in document.imports:
+                        importers.setdefault(imported, set()).add(location)
+                        if imported not in requested:
+                            requested.add(imported)
+                            pending[executor.submit(self.fetch, imported)] = imported
+        
+        ordered = []
+        seen, contents = set(), set()
+        stack = list(reversed(locations))
+        while stack:
+            location = stack.pop()
+            if location in seen or location not in documents:
+                continue
+            seen.add(location)
+            document = documents[location]
+            if document.digest not in contents:
+                contents.add(document.digest)
+                ordered.append(document)
+            stack.extend(reversed(document.imports))
+        return ordered
+
+class LazyTypeTree(object):
+    # stands in for the type tree in get_soap_call: the first lookup of a name
+    # builds only the schema components reachable from it (through type=,
+    # base= and ref=), into one type tree shared by all later lookups
+    reference_attributes = ('type', 'base', 'ref')
+    
+    def __init__(self, wsdls):
+        self.wsdls = wsdls
+        self.type_tree = OrderedDefaultDict(keyfunc=functools.partial(Node, None))
+        self.type_tree.update(SOAP.types)
+        self.built = set()
+        self.lock = threading.RLock()
+        self._definitions = None
+    
+    @property
+    def definitions(self):
+        # qualname -> [(top-level schema component, SchemaIndex.walk context)], in document order
+        if self._definitions is None:
+            definitions = collections.OrderedDict()
+            for schema in XML.findall(self.wsdls, 'descendant-or-self::xs:schema'):
+                context = (None, (), schema.get('targetNamespace'), schema.get('elementFormDefault') == 'qualified')
+                for elem in schema.iterchildren(lxml.etree.Element):
+                    if elem.get('name') is not None:
+                        definitions.setdefault('{%s}%s' % (context[2], elem.get('name')), []).append((elem, context))
+            self._definitions = definitions
+        return self._definitions
+    
+    def __getitem__(self, qualname):
+        with self.lock:
+            if qualname not in self.built:
+                self.build(qualname)
+            return self.type_tree[qualname]
+    
+    def build(self, qualname):
+        definitions = self.definitions
+        new = []
+        pending = [qualname]
+        while pending:
+            qualname = pending.pop()
+            if qualname in self.built:
+                continue
+            self.built.add(qualname)
+            for elem, context in definitions.get(qualname, ()):
+                new.append((elem, context))
+                for child in elem.iter(lxml.etree.Element):
+                    for k in self.reference_attributes:
+                        ref = child.get(k)
+                        if ref is not None and ':' in ref:
+                            pending.append(XML.type(ref, child.nsmap))
+        if not new:
+            return
+        index = SchemaIndex([])
+        for elem, context in new:
+            index.walk([elem], context)
+        WsdlParser.build_type_tree(self.wsdls, index=index, type_tree=self.type_tree)
+
+class LazySoapCalls(collections.abc.Mapping):
+    # operation name -> SoapCall, built and memoized on first access; only the
+    # operation names are looked up up front
+    def __init__(self, wsdls, transport=None, soap_call_class=None):
+        self.wsdls = wsdls
+        self.transport = transport
+        self.soap_call_class = soap_call_class
+        self.operations = WsdlParser.get_operations(wsdls)
+        self.type_tree = LazyTypeTree(wsdls)
+        self.soap_calls = {}
+        self.lock = threading.RLock()
+        self._soap_messages = None
+        self._ports = None
+    
+    def __getitem__(self, name):
+        with self.lock:
+            soap_call = self.soap_calls.get(name)
+            if soap_call is None:
+                xmls = self.operations[name]
+                if self._soap_messages is None:
+                    self._soap_messages = WsdlParser.get_soap_messages(self.wsdls)
+                    self._ports = WsdlParser.get_ports(self.wsdls)
+                soap_call = WsdlParser.get_soap_call(name, xmls, self._soap_messages, self.type_tree, self._ports,
+                                                     transport=self.transport, soap_call_class=self.soap_call_class)
+                self.soap_calls[name] = soap_call
+            return soap_call
+    
+    def __iter__(self):
+        return iter(self.operations)
+    
+    def __len__(self):
+        return len(self.operations)
+    
+    def __contains__(self, name):
+        return name in self.operations
+
+class Snapshot(object):
+    # pickled SoapCall metadata (and the type tree it points into), keyed by the
+    # WSDL contents + library version, so workers can skip get_soap_calls.
+    # unpickling runs code: snapshots are kept in a directory of the user's
+    # own (default_directory(), created 0700) and only loaded from files that
+    # user owns and nobody else can write to, in a directory alike
+    # bumped when what's pickled changes shape within a version
+    format = 4
+    
+    @staticmethod
+    def default_directory():
+        cache = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(cache, 'simplesoap', 'snapshots')
+    
+    @staticmethod
+    def private(path_or_fd):
+        # owned by the current user and writable by no one else
+        if not hasattr(os, 'getuid'):
+            return True
+        info = os.fstat(path_or_fd) if isinstance(path_or_fd, int) else os.stat(path_or_fd)
+        return info.st_uid == os.getuid() and not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+    
+    @staticmethod
+    def key(contents):
+        h = hashlib.sha256('{}/{}'.format(__version__, Snapshot.format).encode())
+        for content in contents:
+            h.update(str(len(content)).encode())
+            h.update(b':')
+            h.update(content)
+        return h.hexdigest()
+    
+    @staticmethod
+    def filename(key):
+        return os.path.join(Snapshot.directory, key + '.pickle')
+    
+    # module-level singletons must come back as the same objects, not copies
+    @staticmethod
+    def _persistent_ids():
+        ids = {id(Leaf.unknown): 'Leaf.unknown', id(Leaf._sentinel): 'Leaf._sentinel', id(Restriction.empty): 'Restriction.empty'}
+        ids.update({id(v): k for k, v in SOAP.types.items()})
+        return ids
+    
+    @staticmethod
+    def _persistent_objects():
+        objects = {'Leaf.unknown': Leaf.unknown, 'Leaf._sentinel': Leaf._sentinel, 'Restriction.empty': Restriction.empty}
+        objects.update(SOAP.types)
+        return objects
+    
+    class Pickler(pickle.Pickler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.ids = Snapshot._persistent_ids()
+        def persistent_id(self, obj):
+            return self.ids.get(id(obj))
+    
+    class Unpickler(pickle.Unpickler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.objects = Snapshot._persistent_objects()
+        def persistent_load(self, pid):
+            return self.objects[pid]
+    
+    @staticmethod
+    def save(key, soap_calls):
+        metadata = [{k: v for k, v in call.__dict__.items() if k != 'transport' and not k.startswith('_')}
+                    for call in soap_calls]
+        # snapshots only save time: a directory that can't be made or written
+        # to leaves the client without one
+        try:
+            os.makedirs(Snapshot.directory, mode=0o700, exist_ok=True)
+            if not Snapshot.private(Snapshot.directory):
+                return
+            # write + rename so concurrent workers never see a partial snapshot
+            fd, tmp = tempfile.mkstemp(dir=Snapshot.directory, suffix='.tmp')
+        except OSError as e:
+            logger.warning('could not save a snapshot in %s: %s', Snapshot.directory, e)
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                Snapshot.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL).dump(metadata)
+            os.replace(tmp, Snapshot.filename(key))
+        except OSError as e:
+            os.unlink(tmp)
+            logger.warning('could not save a snapshot in %s: %s', Snapshot.directory, e)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    
+    @staticmethod
+    def load(key, transport=None, soap_call_class=None):
+        try:
+            with open(Snapshot.filename(key), 'rb') as f:
+                if not Snapshot.private(f.fileno()) or not Snapshot.private(Snapshot.directory):
+                    return None
+                metadata = Snapshot.Unpickler(f).load()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning('could not load the snapshot %s: %s', Snapshot.filename(key), e)
+            return None
+        except Exception:
+            # stale or corrupt snapshot -> rebuild it
+            return None
         soap_calls = []
-        for name, xmls in operations.items():
-            soap_call = SoapCall()
+        for attrs in metadata:
+            soap_call = (soap_call_class or SoapCall)()
+            soap_call.__dict__.update(attrs)
+            soap_call.transport = transport
             soap_calls.append(soap_call)
-            
-            soap_call.name = name
-            
-            for soapAction in XML.findall(xmls, 'soap:operation'):
-                soap_call.SOAPAction = soapAction.attrib['soapAction']
-
-            for binding in XML.findall(xmls, 'ancestor::wsdl:binding'):
-                ports = XML.findall(wsdls, './/wsdl:port[contains(@binding,\':%s\')]'%binding.attrib['name'])
-                addresses = XML.findall(ports, 'soap:address[@location]')
-                for address in addresses:
-                    soap_call.url = address.attrib['location']
-            
-            # normalize body / header elements with 'message' attribute
-            for elem in XML.findall(xmls, 'wsdl:*[@message]'):
-                message = elem.attrib['message']
-                for soap_elem in XML.findall(xmls, 'wsdl:%s/soap:*'%XML.stripns(elem.tag)):
-                    if 'message' not in soap_elem.attrib:
-                        soap_elem.attrib['message'] = message
-            
-            for input_header in XML.findall(xmls, 'wsdl:input/soap:header'):
-                message = XML.stripns(input_header.attrib['message'])
-                part = input_header.attrib.get('part')
-                for elem in soap_messages[message][part]:
-                    # for now only allow one part per body / header
-                    soap_call.input_header = type_tree[XML.type(elem, nsmap=input_header.nsmap)]
-            
-            for input_body in XML.findall(xmls, 'wsdl:input/soap:body'):
-                message = XML.stripns(input_body.attrib['message'])
-                parts = input_body.attrib.get('parts')
-                for elem in soap_messages[message][parts]:
-                    # for now only allow one part per body / header
-                    soap_call.input_body = type_tree[XML.type(elem, nsmap=input_body.nsmap)]
-            
-            for output_header in XML.findall(xmls, 'wsdl:output/soap:header'):
-                message = XML.stripns(output_header.attrib['message'])
-                part = output_header.attrib.get('part')
-                for elem in soap_messages[message][part]:
-                    # for now only allow one part per body / header
-                    soap_call.output_header = type_tree[XML.type(elem, nsmap=output_header.nsmap)]
-            
-            for output_body in XML.findall(xmls, 'wsdl:output/soap:body'):
-                message = XML.stripns(output_body.attrib['message'])
-                parts = output_body.attrib.get('parts')
-                for elem in soap_messages[message][parts]:
-                    # for now only allow one part per body / header
-                    soap_call.output_body = type_tree[XML.type(elem, nsmap=output_body.nsmap)]
-        
         return soap_calls
+
+Snapshot.directory = Snapshot.default_directory()
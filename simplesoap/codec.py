@@ -0,0 +1,277 @@
+import datetime, decimal, re, base64, binascii, functools, collections, dateutil.parser, dateutil.relativedelta
+
+# scalar conversion between xsd lexical forms and python values. parsers and
+# formatters are keyed by python type (the Leaf.type of a schema field), so
+# callers pick the function once per field instead of once per value.
+# the date / time parsers take the canonical forms schema-valid documents use
+# and only hand anything else to dateutil, which accepts (nearly) anything
+
+DATETIME = re.compile(r'(-?\d{4,})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)?')
+DATE = re.compile(r'(-?\d{4,})-(\d\d)-(\d\d)(Z|[+-]\d\d:\d\d)?')
+TIME = re.compile(r'(\d\d):(\d\d):(\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)?')
+DURATION = re.compile(r'(?P<negative>-)?P'
+                      r'(?P<years>\d+Y)?'
+                      r'(?P<months>\d+M)?'
+                      r'(?P<days>\d+D)?'
+                      r'T?'
+                      r'(?P<hours>\d+H)?'
+                      r'(?P<minutes>\d+M)?'
+                      r'(?P<seconds>\d+S)?')
+
+@functools.lru_cache(maxsize=None)
+def timezone(text):
+    if text is None:
+        return None
+    if text == 'Z':
+        return datetime.timezone.utc
+    offset = datetime.timedelta(hours=int(text[1:3]), minutes=int(text[4:6]))
+    return datetime.timezone(-offset if text[0] == '-' else offset)
+
+def microseconds(fraction):
+    return int((fraction + '00000')[:6]) if fraction else 0
+
+def parse_datetime(text):
+    m = DATETIME.fullmatch(text)
+    if m is not None:
+        try:
+            return datetime.datetime.fromisoformat(text)
+        except ValueError:
+            pass # before python 3.11: no Z, only 3 or 6 fraction digits
+        year, month, day, hour, minute, second, fraction, tz = m.groups()
+        try:
+            if hour == '24' and minute == second == '00' and not int(fraction or 0):
+                # end of day, which xsd allows: midnight of the next one
+                return datetime.datetime(int(year), int(month), int(day), tzinfo=timezone(tz)) + datetime.timedelta(days=1)
+            return datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second),
+                                     microseconds(fraction), timezone(tz))
+        except (ValueError, OverflowError):
+            pass # years outside 1..9999, ...
+    return dateutil.parser.parse(text)
+
+def parse_date(text):
+    m = DATE.fullmatch(text)
+    if m is not None:
+        try:
+            return datetime.date.fromisoformat(text)
+        except ValueError:
+            pass
+        try:
+            return datetime.date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        except ValueError:
+            pass
+    return dateutil.parser.parse(text).date()
+
+def parse_time(text):
+    m = TIME.fullmatch(text)
+    if m is not None:
+        try:
+            return datetime.time.fromisoformat(text)
+        except ValueError:
+            pass
+        hour, minute, second, fraction, tz = m.groups()
+        try:
+            return datetime.time(int(hour), int(minute), int(second), microseconds(fraction), timezone(tz))
+        except ValueError:
+            pass
+    value = dateutil.parser.parse(text)
+    return value.time().replace(tzinfo=value.tzinfo)
+
+BOOLEANS = {'true': True, 'false': False, '1': True, '0': False}
+
+def parse_bool(text):
+    try:
+        return BOOLEANS[text]
+    except KeyError:
+        pass
+    try:
+        return BOOLEANS[text.strip()]
+    except KeyError:
+        raise ValueError('{} not a boolean'.format(text))
+
+def parse_duration(text):
+    kwargs = DURATION.search(text).groupdict('0')
+    negative = kwargs.pop('negative')
+    kwargs = {k:int(re.sub(r'\D', '', v)) for k,v in kwargs.items()}
+    rd = dateutil.relativedelta.relativedelta(**kwargs)
+    if negative != '0':
+        return -rd
+    return rd
+
+def format_duration(v):
+    s = 'P{years}Y{months}M{days}DT{hours}H{minutes}M{seconds}S'.format(**v.__dict__)
+    if '-' in s:
+        # todo: handle this correctly
+        s = s.replace('-', '')
+        s = '-' + s
+    return s
+
+def format_float(v):
+    s = repr(v)
+    if s[-1] in 'fn': # inf, -inf, nan
+        return {'inf': 'INF', '-inf': '-INF', 'nan': 'NaN'}[s]
+    return s
+
+def format_decimal(v):
+    s = str(v)
+    if 'E' in s:
+        # xs:decimal has no exponent
+        return '{:f}'.format(v)
+    return s
+
+class Base64Binary(bytes):
+    # the Leaf.type of xs:base64Binary fields; values are bytes (parsed), or
+    # bytes-like objects and binary files (sent)
+    pass
+
+class HexBinary(bytes):
+    # same for xs:hexBinary
+    pass
+
+def parse_base64(text):
+    if not isinstance(text, str):
+        return text # an xop attachment, already decoded
+    return base64.b64decode(text)
+
+def parse_hex(text):
+    if not isinstance(text, str):
+        return text
+    return binascii.unhexlify(text.strip())
+
+def read_chunks(value, size):
+    # a file's content or a buffer's (sliced, not copied) in pieces of about size
+    if hasattr(value, 'read'):
+        while True:
+            chunk = value.read(size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        view = memoryview(value).cast('B')
+        for i in range(0, len(view), size):
+            yield view[i:i + size]
+
+def encode_binary(value, type_, chunk_size=3 * 2**14):
+    # the lexical form of a binary value as a generator of str pieces, so a
+    # file is never held in memory whole. base64 pieces cover multiples of 3
+    # bytes (whatever read() returned), so they can simply be concatenated
+    if type_ is HexBinary:
+        for chunk in read_chunks(value, chunk_size):
+            yield binascii.hexlify(chunk).decode('ascii').upper()
+        return
+    rest = b''
+    for chunk in read_chunks(value, chunk_size):
+        if rest:
+            chunk = rest + chunk
+        cut = len(chunk) - len(chunk) % 3
+        rest = bytes(chunk[cut:])
+        if cut:
+            yield base64.b64encode(chunk[:cut]).decode('ascii')
+    if rest:
+        yield base64.b64encode(rest).decode('ascii')
+
+def format_base64(value):
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    return ''.join(encode_binary(value, Base64Binary))
+
+def format_hex(value):
+    if isinstance(value, bytes):
+        return binascii.hexlify(value).decode('ascii').upper()
+    return ''.join(encode_binary(value, HexBinary))
+
+# binary fields format whatever they're given by the field's type, not the value's
+binary = {Base64Binary: format_base64, HexBinary: format_hex}
+
+def format_value(value):
+    return formatters[type(value)](value)
+
+parsers = collections.defaultdict(lambda: str, {
+    str: str,
+    bool: parse_bool,
+    int: int,
+    float: float,
+    decimal.Decimal: decimal.Decimal,
+    datetime.datetime: parse_datetime,
+    datetime.date: parse_date,
+    datetime.time: parse_time,
+    dateutil.relativedelta.relativedelta: parse_duration,
+    Base64Binary: parse_base64,
+    HexBinary: parse_hex,
+})
+
+formatters = collections.defaultdict(lambda: str, {
+    str: str,
+    bool: lambda v: 'true' if v else 'false',
+    int: int.__str__,
+    float: format_float,
+    decimal.Decimal: format_decimal,
+    type(None): lambda v: None,
+    # seconds precision, as this has always been sent
+    datetime.datetime: lambda v: v.isoformat(timespec='seconds'),
+    datetime.date: datetime.date.isoformat,
+    datetime.time: lambda v: v.isoformat(timespec='seconds'),
+    dateutil.relativedelta.relativedelta: format_duration,
+    # callables are formatted by what they return when sent
+    type(lambda : None): lambda v: format_value(v()),
+    type(repr): lambda v: format_value(v()),
+    list: lambda v: encode_list(v),
+    tuple: lambda v: encode_list(v),
+    bytes: format_base64,
+    bytearray: format_base64,
+    memoryview: format_base64,
+    Base64Binary: format_base64,
+    HexBinary: format_hex,
+})
+
+def formatter(type_):
+    # the formatter for values of type_, picked once; values of other types
+    # (a str for an int field, say) still go through the generic lookup
+    fast = formatters[type_]
+    if type_ in binary:
+        return fast
+    def format(value):
+        if type(value) is type_:
+            return fast(value)
+        return formatters[type(value)](value)
+    return format
+
+# batches: xs:list values (whitespace separated items in one text) and
+# columns (the texts of one repeated element). in a column None stands for
+# nil and, as for single values, empty text parses to None unless it's a str
+
+def decode_list(text, type_=str):
+    return list(map(parsers[type_], text.split()))
+
+def encode_list(values, type_=None):
+    return ' '.join(map(formatter(type_) if type_ is not None else format_value, values))
+
+class List(list):
+    # the Leaf.type of xs:list simple types, whatever their item type: there's
+    # one subclass per item type (see list_type), an attribute of this class
+    # so type trees holding it can be pickled
+    item = str
+
+def list_type(item):
+    # the List of items of type item; items of types without a parser are str
+    return List.of.get(item) or List.of[str]
+
+List.of = {}
+for _item in list(parsers):
+    _type = type(_item.__name__, (List,), {'item': _item, '__module__': __name__})
+    _type.__qualname__ = 'List.' + _item.__name__
+    setattr(List, _item.__name__, _type)
+    List.of[_item] = _type
+for _type in List.of.values():
+    parsers[_type] = functools.partial(decode_list, type_=_type.item)
+    formatters[_type] = functools.partial(encode_list, type_=_type.item)
+del _item, _type
+
+def decode_column(texts, type_=str):
+    if type_ is str:
+        return list(texts)
+    parse = parsers[type_]
+    return [parse(text) if text else None for text in texts]
+
+def encode_column(values, type_=None):
+    format = formatter(type_) if type_ is not None else format_value
+    return [None if value is None else format(value) for value in values]
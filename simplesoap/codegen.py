@@ -0,0 +1,942 @@
+# python -m simplesoap.codegen WSDL [WSDL ...] [-o module.py]
+#
+# ahead-of-time client generation: the WSDLs are parsed once, here, and what
+# get_soap_calls makes of them is written out as a plain python module:
+# - one Struct subclass (slots, no dict) per complex type
+# - a writer and a reader per complex type, unrolled from the Serializer's
+#   plan of it / specialized on its fields, and a serializer and a decoder
+#   per operation, with its namespace map computed in advance
+# - the type trees themselves, as code that only runs when something the
+#   generated functions don't do needs them (streamed envelopes, MTOM
+#   responses, views, records...)
+# - Client / AsyncClient: `from service import Client; Client().GetItems(body=...)`
+#   starts without reading or parsing anything, and takes the same
+#   transport / observers / policy as simplesoap's own
+# the rest of this module is what generated modules run on
+import re, sys, decimal, threading, datetime, keyword, builtins, argparse, collections, collections.abc, lxml.etree
+from simplesoap import client, codec, metrics
+from simplesoap.client import SOAP, Leaf, Node, Restriction, Serializer, Decoder, WsdlParser, WsdlLoader
+
+NIL = Decoder.nil_attrib
+XSI = '{%s}' % SOAP.namespaces['xsi']
+_missing = object()
+
+class Struct(collections.abc.Mapping):
+    # base of the generated classes: a complex type's fields are slots, named
+    # after the schema keys ('@id' -> id, '#text' -> text, see identifier());
+    # unset ones read as None. as a read-only mapping it has the keys and
+    # values Decoder gives, so results compare equal to the generic client's,
+    # and it can be sent wherever a dict is taken. keys the type doesn't
+    # declare are kept aside, in _extra
+    __slots__ = ('_extra',)
+    _keys = ()
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._attrs = collections.OrderedDict(zip(cls._keys, cls.__slots__))
+        cls._members = tuple((key, cls.__dict__[attr]) for key, attr in cls._attrs.items())
+        cls._by_key = dict(cls._members)
+        cls._names = frozenset(cls.__slots__)
+    
+    def __init__(self, **fields):
+        self._extra = None
+        for name, value in fields.items():
+            setattr(self, name, value)
+    
+    @classmethod
+    def of(cls, values):
+        # from a dict of schema keys
+        obj = cls.__new__(cls)
+        by_key = cls._by_key
+        extra = None
+        for key, value in values.items():
+            member = by_key.get(key)
+            if member is not None:
+                member.__set__(obj, value)
+            else:
+                extra = extra or {}
+                extra[key] = value
+        obj._extra = extra
+        return obj
+    
+    def __getattr__(self, name):
+        # only called for unset slots (and what doesn't exist)
+        if name in self._names or name == '_extra':
+            return None
+        raise AttributeError("'{}' object has no attribute '{}'".format(self.__class__.__name__, name))
+    
+    def get(self, key, default=None):
+        member = self._by_key.get(key)
+        if member is not None:
+            try:
+                return member.__get__(self)
+            except AttributeError:
+                return default
+        extra = self._extra
+        return extra.get(key, default) if extra else default
+    
+    def __getitem__(self, key):
+        value = self.get(key, _missing)
+        if value is _missing:
+            raise KeyError(key)
+        return value
+    
+    def __iter__(self):
+        for key, member in self._members:
+            try:
+                member.__get__(self)
+            except AttributeError:
+                continue
+            yield key
+        if self._extra:
+            yield from self._extra
+    
+    def __len__(self):
+        return sum(1 for _ in self)
+    
+    def to_dict(self):
+        return {key: plain(value) for key, value in self.items()}
+    
+    def __reduce__(self):
+        return (self.__class__.of, (dict(self.items()),))
+    
+    def __repr__(self):
+        fields = ['{}={!r}'.format(self._attrs.get(key, key), value) for key, value in self.items()]
+        return '{}({})'.format(self.__class__.__name__, ', '.join(fields))
+
+def plain(value):
+    # Structs (in lists) -> dicts
+    if isinstance(value, Struct):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [plain(v) for v in value]
+    return value
+
+# what the generated code calls
+
+def leaf_type(qualname):
+    # the python type of an xsd type, None for Leaf.unknown
+    return SOAP.types[qualname].type if qualname is not None else Leaf.unknown
+
+formatter = codec.formatter
+list_type = codec.list_type
+
+def format_value(value):
+    return codec.format_value(value)
+
+def text_parser(type_):
+    # Decoder.parse_value for one type
+    parse = SOAP.type_parsers[type_]
+    empty = '' if type_ is str else None
+    def parse_text(text):
+        if not text:
+            return empty
+        return parse(text)
+    return parse_text
+
+def leaf_reader(type_):
+    parse = text_parser(type_)
+    def read(elem):
+        if elem.get(NIL) == 'true':
+            return None
+        return parse(elem.text)
+    return read
+
+def column_reader(type_):
+    # the items of a repeated leaf, as Decoder's columns have them
+    parse = codec.parsers[type_]
+    def read(elem):
+        if elem.get(NIL) == 'true':
+            return None
+        text = elem.text
+        if type_ is str:
+            return text or ''
+        return parse(text) if text else None
+    return read
+
+def read_children(elem, fields):
+    # the child elements of elem, by name, as Decoder attaches them; fields:
+    # name -> (reader, repeated), unknown elements are read untyped
+    values = None
+    for child in elem:
+        tag = child.tag
+        if tag.__class__ is not str:
+            continue
+        name = tag[tag.rfind('}') + 1:]
+        read, repeated = fields.get(name, UNTYPED)
+        value = read(child)
+        if values is None:
+            values = {}
+        if repeated:
+            items = values.get(name)
+            if items is None:
+                values[name] = [value]
+            else:
+                items.append(value)
+        elif name in values:
+            # repeated although the schema says otherwise
+            if not isinstance(values[name], list):
+                values[name] = [values[name]]
+            values[name].append(value)
+        else:
+            values[name] = value
+    return values
+
+def read_any(elem):
+    # an element the schema doesn't describe: dicts and strings
+    if elem.get(NIL) == 'true':
+        return None
+    values = read_children(elem, {})
+    for key, text in elem.items():
+        if key.startswith(XSI):
+            continue
+        if values is None:
+            values = {}
+        values['@' + key[key.rfind('}') + 1:]] = text
+    text = elem.text
+    if values is None:
+        return text
+    if text is not None and text.strip():
+        values['#text'] = text
+    return values
+
+UNTYPED = (read_any, False)
+
+class Parsers(object):
+    # lxml parsers aren't to be shared between threads
+    local = threading.local()
+    
+    @staticmethod
+    def get():
+        parser = getattr(Parsers.local, 'parser', None)
+        if parser is None:
+            parser = Parsers.local.parser = lxml.etree.XMLParser(huge_tree=True)
+        return parser
+
+def document(source):
+    if isinstance(source, lxml.etree._Element):
+        return source
+    if isinstance(source, str):
+        source = source.encode()
+    if isinstance(source, (bytes, bytearray)):
+        return lxml.etree.fromstring(bytes(source), Parsers.get())
+    return lxml.etree.parse(source, Parsers.get()).getroot()
+
+def decode(source, read, operation=None):
+    # Decoder.parse with a generated reader for the payload; faults go through
+    # Decoder itself, with the operation's fault types
+    root = document(source)
+    if root.tag != Decoder.envelope_tag:
+        return read(root)
+    value = None
+    for body in root.iterchildren(Decoder.body_tag):
+        for elem in body:
+            if elem.tag.__class__ is not str:
+                continue
+            if elem.tag == Decoder.fault_tag:
+                Decoder(faults=operation.faults if operation is not None else None).parse(elem)
+            value = read(elem)
+    return value
+
+# the checks are Serializer's, with the same messages
+check = Serializer.check
+not_a_dict = Serializer.not_a_dict
+unknown_fields = Serializer.unknown_fields
+missing_fields = Serializer.missing_fields
+count = Serializer.count
+iterable = Serializer.iterable
+Errors = Serializer.Errors
+raise_errors = Serializer.raise_errors
+
+def check_items(validator, path, values, errors):
+    for i, value in enumerate(values):
+        if value is not None:
+            check(validator, '{}[{}]'.format(path, i), value, errors)
+
+# envelopes are written as text, a list of strings joined at the end: the
+# generated writers know every tag and attribute, and what's left to do per
+# value is escaping it as lxml would (and refusing what it refuses)
+INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff\ud800-\udfff]')
+
+def escape(text):
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    if '\r' in text:
+        text = text.replace('\r', '&#13;')
+    return text
+
+def escape_attribute(text):
+    text = escape(text)
+    if '"' in text:
+        text = text.replace('"', '&quot;')
+    if '\n' in text:
+        text = text.replace('\n', '&#10;')
+    if '\t' in text:
+        text = text.replace('\t', '&#9;')
+    return text
+
+# the types whose values format to text that never needs escaping
+PLAIN = frozenset([bool, int, float, decimal.Decimal, datetime.datetime, datetime.date, datetime.time]) | frozenset(codec.binary)
+
+def text_formatter(type_):
+    # a field's formatter (see Serializer.format), escaped
+    format = codec.formatter(type_)
+    if type_ in codec.binary:
+        return format
+    if type_ in PLAIN:
+        fast = codec.formatters[type_]
+        def text(value):
+            if type(value) is type_:
+                return fast(value)
+            return escape(format(value) or '')
+        return text
+    def text(value):
+        return escape(format(value) or '')
+    return text
+
+def format_text(value):
+    return escape(codec.format_value(value) or '')
+
+def envelope_start(nsmap):
+    return "<?xml version='1.0' encoding='UTF-8'?>\n<soapenv:Envelope{}>".format(
+        ''.join(' xmlns:{}="{}"'.format(prefix, escape_attribute(ns)) for prefix, ns in nsmap.items()))
+
+def finish(out):
+    text = ''.join(out)
+    invalid = INVALID.search(text)
+    if invalid is not None:
+        if '\ud800' <= invalid.group() <= '\udfff':
+            raise UnicodeEncodeError('utf-8', text, invalid.start(), invalid.end(), 'surrogates not allowed')
+        raise ValueError('All strings must be XML compatible: Unicode or ASCII, no NULL bytes or control characters')
+    return text.encode('utf-8')
+
+def clark(nsmap):
+    # 'ns0:name' -> '{urn:...}name', for messages
+    def clark(tag):
+        prefix, _, name = tag.rpartition(':')
+        return '{%s}%s' % (nsmap[prefix], name) if prefix else name
+    return clark
+
+def write_leaf(out, tag, value, format, validator, path, errors):
+    if errors is not None and validator is not None and value is not None:
+        check(validator, path, value, errors)
+    if value is None:
+        out.append('<{} xsi:nil="true"/>'.format(tag))
+    else:
+        out.append('<{0}>{1}</{0}>'.format(tag, escape(format(value) or '')))
+
+def leaf_writer(format, validator):
+    # a header / body that's a simple type
+    def write(out, tag, value, path, errors):
+        write_leaf(out, tag, value, format, validator, path, errors)
+    return write
+
+def write_column(out, tag, type_, values):
+    start, end, nil = '<{}>'.format(tag), '</{}>'.format(tag), '<{} xsi:nil="true"/>'.format(tag)
+    out.extend(nil if text is None else start + escape(text) + end for text in codec.encode_column(values, type_))
+
+def write_leaves(out, tag, format, validator, path, values, errors, bounds=None):
+    # a repeated leaf given as a generator (see Serializer.Errors); path: the
+    # field's, its items' are path[i]
+    i = 0
+    for i, value in enumerate(values, 1):
+        if errors is not None and errors.deferred is None and validator is not None and value is not None:
+            problems = []
+            check(validator, '{}[{}]'.format(path, i - 1), value, problems)
+            errors.deferred = problems or None
+        write_leaf(out, tag, value, format, None, None, None)
+    if errors is not None and bounds is not None:
+        count(path, i, bounds, errors)
+
+def write_items(write, out, tag, path, values, errors, bounds=None):
+    # the same for a repeated complex type
+    i = 0
+    for i, value in enumerate(values, 1):
+        if errors is None:
+            write(out, tag, value, None, None)
+            continue
+        problems = Errors()
+        write(out, tag, value, '{}[{}]'.format(path, i - 1), problems)
+        if errors.deferred is None:
+            errors.deferred = list(problems) or problems.deferred
+    if errors is not None and bounds is not None:
+        count(path, i, bounds, errors)
+
+class Tree(object):
+    # one of an operation's type trees, from the module's types() (built on first use)
+    def __init__(self, index):
+        self.index = index
+    
+    def __get__(self, soap_call, cls):
+        return cls.types()[cls.name][self.index]
+
+class Operation(object):
+    # mixed into SoapCall / AsyncSoapCall by Client: envelopes are built and
+    # responses decoded by the generated functions; the rest goes through
+    # the usual machinery, on the type trees
+    name = ''
+    serialize = None
+    decode = None
+    has_input_header = False
+    has_input_body = False
+    input_header = Tree(0)
+    input_body = Tree(1)
+    output_header = Tree(2)
+    output_body = Tree(3)
+    faults = Tree(4)
+    types = None
+    
+    def build_envelope(self, header=None, body=None, stream=False, **kwargs):
+        if stream:
+            return super().build_envelope(header, body, stream, **kwargs)
+        if header and not self.has_input_header:
+            raise ValueError('No header can be parsed from the WSDL; give me a header!')
+        if body and not self.has_input_body:
+            raise ValueError('No body can be parsed from the WSDL; give me a body!')
+        return self.serialize(header, body)
+    
+    def parse_response(self, content, attachments=None):
+        if attachments:
+            return super().parse_response(content, attachments)
+        return self.decode(content)
+
+class Client(client.Client):
+    # base of a generated module's Client
+    wsdls = ()
+    operations = ()
+    soap_call_class = client.SoapCall
+    _classes = {}
+    
+    def __init__(self, transport=None, observers=None, policy=None):
+        start = metrics.clock()
+        self._wsdls = list(self.wsdls)
+        self.transport = transport or client.Transport()
+        self.observers = list(observers or ())
+        self.policy = policy
+        self._operations = client.BoundSoapCalls(self.templates(), self.transport, None, self.observers, policy)
+        self.check_names()
+        if self.observers:
+            metrics.emit(self.observers, metrics.StartupEvent(self._wsdls, {}, metrics.clock() - start))
+    
+    @classmethod
+    def templates(cls):
+        # never modified (calls are bound per client), so made once per class
+        templates = cls.__dict__.get('_templates')
+        if templates is None:
+            templates = client.SoapCalls((op.name, cls.soap_call(op)()) for op in cls.operations)
+            cls._templates = templates
+        return templates
+    
+    @classmethod
+    def soap_call(cls, operation):
+        key = (operation, cls.soap_call_class)
+        soap_call_class = Client._classes.get(key)
+        if soap_call_class is None:
+            soap_call_class = Client._classes.setdefault(key, type(operation.name, key, {'__module__': operation.__module__}))
+        return soap_call_class
+
+class AsyncClient(Client, client.AsyncClient):
+    soap_call_class = client.AsyncSoapCall
+    
+    def __init__(self, transport=None, concurrency=None, observers=None, policy=None):
+        super().__init__(transport=transport or client.AsyncTransport(concurrency=concurrency), observers=observers,
+                         policy=policy)
+
+# the generator
+
+RESERVED = frozenset(dir(builtins)) | {'Client', 'AsyncClient', 'WSDLS', 'NSMAP', 'functools'}
+STRUCT_RESERVED = frozenset(dir(Struct)) | {'_extra'}
+
+def identifier(key, taken, reserved=frozenset()):
+    # a python name for a schema name, not in taken (which it's added to)
+    name = re.sub(r'\W', '_', key.lstrip('@#')) or 'field'
+    if name[0].isdigit() or name.startswith('__'):
+        name = 'f' + name
+    if keyword.iskeyword(name) or name in reserved:
+        name += '_'
+    while name in taken:
+        name += '_'
+    taken.add(name)
+    return name
+
+class Generator(object):
+    def __init__(self, soap_calls, type_tree=None, wsdls=()):
+        self.soap_calls = soap_calls
+        self.wsdls = wsdls
+        self.serializer = Serializer()
+        self.lines = []
+        self.constants = collections.OrderedDict() # expression -> name
+        self.nodes = collections.OrderedDict()     # id(node) -> node, every reachable one
+        self.leaves = collections.OrderedDict()
+        self.names = {}                            # id(node) -> class name
+        self.tables = []                           # emitted after the functions using them
+        qualnames = {}
+        for qualname, type_ in (type_tree or {}).items():
+            qualnames.setdefault(id(type_), qualname)
+        taken = set()
+        for call in soap_calls:
+            for tree in (call.input_header, call.input_body, call.output_header, call.output_body):
+                self.collect(tree)
+            for _, tree in (call.faults or {}).values():
+                self.collect(tree)
+        for node in self.nodes.values():
+            qualname = qualnames.get(id(node))
+            name = '_'.join(part.rpartition('}')[2] for part in qualname.split('/')) if qualname else 'Type'
+            self.names[id(node)] = identifier(name, taken, RESERVED)
+        taken = set()
+        self.operations = [identifier(call.name, taken) for call in soap_calls]
+        self.type_names = {}
+        for qualname, leaf in SOAP.types.items():
+            self.type_names.setdefault(leaf.type, qualname)
+        # one namespace map for the module, in Serializer's order: for the
+        # usual single namespace service envelopes come out as the generic
+        # client's, byte for byte
+        for call in soap_calls:
+            self.serializer.compile_root(call.input_header, call.input_header_name)
+            self.serializer.compile_root(call.input_body, call.input_body_name)
+        self.plans = {id(self.serializer.compile(node)): node for node in self.nodes.values()}
+        self.nsmap = {'soapenv': SOAP.namespaces['soapenv'], 'xsi': SOAP.namespaces['xsi']}
+        for i, ns in enumerate(self.serializer.namespaces):
+            self.nsmap['ns%d' % i] = ns
+        self.prefixes = {ns: prefix for prefix, ns in self.nsmap.items()}
+    
+    def collect(self, type_):
+        if isinstance(type_, list):
+            type_ = type_[0]
+        if isinstance(type_, Leaf):
+            self.leaves.setdefault(id(type_), type_)
+        if not isinstance(type_, Node) or id(type_) in self.nodes:
+            return
+        self.nodes[id(type_)] = type_
+        for k, v in dict.items(type_):
+            if k != '#namespace':
+                self.collect(v)
+        if isinstance(type_.base, Node):
+            self.collect(type_.base)
+        for base in (type_.inherited or {}).values():
+            self.collect(base)
+    
+    def emit(self, line='', indent=0):
+        self.lines.append('    ' * indent + line if line else '')
+    
+    def constant(self, prefix, expression):
+        # a module level name for expression, defined once
+        name = self.constants.get(expression)
+        if name is None:
+            name = self.constants[expression] = '_{}{}'.format(prefix, len(self.constants))
+        return name
+    
+    def type_(self, type_):
+        if type_ is Leaf.unknown:
+            return self.constant('t', '_rt.leaf_type(None)')
+        if isinstance(type_, type) and issubclass(type_, codec.List):
+            return self.constant('t', '_rt.list_type({})'.format(self.type_(type_.item)))
+        if type_ not in self.type_names:
+            raise ValueError('no xsd type for {!r}'.format(type_))
+        return self.constant('t', '_rt.leaf_type({!r})'.format(self.type_names[type_]))
+    
+    def formatter(self, formatter):
+        if formatter is None:
+            return '_rt.format_value'
+        return self.constant('format', '_rt.formatter({})'.format(self.type_(formatter[0])))
+    
+    def text(self, formatter):
+        if formatter is None:
+            return '_rt.format_text'
+        return self.constant('text', '_rt.text_formatter({})'.format(self.type_(formatter[0])))
+    
+    def parser(self, type_):
+        if type_ is None:
+            return self.constant('parse', '_rt.text_parser(None)')
+        return self.constant('parse', '_rt.text_parser({})'.format(self.type_(type_)))
+    
+    def reader(self, type_, repeated=False):
+        if isinstance(type_, Node):
+            return '_read_' + self.names[id(type_)]
+        if isinstance(type_, Leaf):
+            reader = 'column_reader' if repeated else 'leaf_reader'
+            return self.constant('read', '_rt.{}({})'.format(reader, self.type_(type_.type)))
+        return '_rt.read_any'
+    
+    def restriction(self, restriction):
+        if restriction is None or restriction is Restriction.empty:
+            return '_Restriction.empty'
+        return self.constant('restriction', '_Restriction(**{!r})'.format(restriction.facet_values()))
+    
+    def validator(self, check, type_):
+        # Serializer.validator(type_), when it has anything to check
+        if check is None:
+            return None
+        value_type = self.type_(type_.type) if isinstance(type_, Leaf) else 'None'
+        return self.constant('check', '_client.Serializer.compiled({}, {})'.format(
+            value_type, self.restriction(getattr(type_, 'restriction', None))))
+    
+    def text_validator(self, plan):
+        if plan.text_check is None:
+            return None
+        return self.constant('check', '_client.Serializer.compiled({}, None)'.format(self.type_(plan.text[0])))
+    
+    def generate(self):
+        body = self.lines
+        for node in self.nodes.values():
+            self.struct(node)
+        for node in self.nodes.values():
+            self.writer(node)
+            self.reader_function(node)
+        for call, name in zip(self.soap_calls, self.operations):
+            self.operation(call, name)
+        self.types()
+        self.clients()
+        self.lines = []
+        self.header()
+        for expression, name in self.constants.items():
+            self.emit('{} = {}'.format(name, expression))
+        return '\n'.join(self.lines + body) + '\n'
+    
+    def header(self):
+        self.emit('# generated by python -m simplesoap.codegen from {} (simplesoap {}); regenerate it when'.format(
+            ', '.join(self.wsdls) or 'a WSDL', client.__version__))
+        self.emit('# the WSDL changes rather than editing it')
+        self.emit('import functools, collections.abc')
+        self.emit('from simplesoap import client as _client, codegen as _rt')
+        self.emit('from simplesoap.client import Node as _Node, Leaf as _Leaf, Restriction as _Restriction, SOAP as _SOAP')
+        self.emit()
+        self.emit('WSDLS = {!r}'.format(tuple(self.wsdls)))
+        self.emit()
+        self.emit('NSMAP = {!r}'.format(self.nsmap))
+        self.emit()
+        self.emit('_ENVELOPE = _rt.envelope_start(NSMAP)')
+        self.emit('_clark = _rt.clark(NSMAP)')
+        self.emit('_escape_attribute = _rt.escape_attribute')
+        self.emit('_Mapping = collections.abc.Mapping')
+        self.emit('_missing = _rt._missing')
+        self.emit('_NIL = {!r}'.format(NIL))
+        self.emit('_XSI = {!r}'.format(XSI))
+    
+    def struct(self, node):
+        name = self.names[id(node)]
+        keys = [k for k in dict.keys(node) if k != '#namespace']
+        if '#text' not in keys and node.type is not None:
+            keys.append('#text')
+        taken = set()
+        attrs = [identifier(k, taken, STRUCT_RESERVED) for k in keys]
+        self.emit()
+        self.emit('class {}(_rt.Struct):'.format(name))
+        self.emit('__slots__ = {!r}'.format(tuple(attrs)), 1)
+        self.emit('_keys = {!r}'.format(tuple(keys)), 1)
+    
+    def plan(self, node):
+        return self.serializer.compile(node)
+    
+    def tag(self, tag):
+        # Clark notation -> prefixed, as written
+        if not tag or not tag.startswith('{'):
+            return tag
+        ns, _, name = tag[1:].partition('}')
+        return '{}:{}'.format(self.prefixes[ns], name)
+    
+    def writer(self, node):
+        # Serializer.write and .check unrolled for one node: out is the list
+        # of strings the envelope is joined from, errors the messages of
+        # restriction violations (strict mode) or None
+        name = self.names[id(node)]
+        plan = self.plan(node)
+        self.emit()
+        self.emit('_FIELDS_{} = frozenset({!r})'.format(name, sorted(plan.fields)))
+        self.emit()
+        self.emit('def _write_{}(out, tag, value, path, errors):'.format(name))
+        self.emit('if value is None:', 1)
+        self.emit("out.append('<' + tag + ' xsi:nil=\"true\"/>')", 2)
+        self.emit('return', 2)
+        check = self.validator(plan.check, node)
+        if check is not None:
+            self.emit('if errors is not None:', 1)
+            self.emit('_rt.check({}, path, value, errors)'.format(check), 2)
+        text_check = self.text_validator(plan)
+        self.emit('if not isinstance(value, _Mapping):', 1)
+        if plan.text is None:
+            self.emit('_rt.not_a_dict(_clark(tag), path, value, errors)', 2)
+        else:
+            if text_check is not None:
+                self.emit('if errors is not None:', 2)
+                self.emit('_rt.check({}, path, value, errors)'.format(text_check), 3)
+            self.emit("out.append('<' + tag + '>' + {}(value) + '</' + tag + '>')".format(self.text(plan.text)), 2)
+        self.emit('return', 2)
+        self.emit('if not _FIELDS_{}.issuperset(value):'.format(name), 1)
+        self.emit('_rt.unknown_fields(_clark(tag), path, value, _FIELDS_{}, errors)'.format(name), 2)
+        if plan.required:
+            self.emit('if errors is not None:', 1)
+            self.emit('_rt.missing_fields(path, value, {!r}, errors)'.format(plan.required), 2)
+        self.emit('get = value.get', 1)
+        self.emit('w = out.append', 1)
+        if not plan.attributes:
+            self.emit("w('<' + tag)", 1)
+        else:
+            self.emit("start = '<' + tag", 1)
+            for key, attribute, formatter, attribute_check in plan.attributes:
+                self.emit('v = get({!r})'.format(key), 1)
+                self.emit('if v is not None:', 1)
+                check = self.validator(attribute_check, node[key])
+                if check is not None:
+                    self.emit('if errors is not None:', 2)
+                    self.emit('_rt.check({}, path + {!r}, v, errors)'.format(check, '/' + key), 3)
+                self.emit("start += ' {}=\"' + _escape_attribute({}(v) or '') + '\"'".format(
+                    attribute, self.formatter(formatter)), 2)
+            self.emit('w(start)', 1)
+        # '>' or, if nothing follows, '/>'
+        self.emit("w('>')", 1)
+        self.emit('mark = len(out)', 1)
+        if plan.text is not None:
+            self.emit("v = get('#text')", 1)
+            self.emit('if v is not None:', 1)
+            if text_check is not None:
+                self.emit('if errors is not None:', 2)
+                self.emit('_rt.check({}, path, v, errors)'.format(text_check), 3)
+            self.emit('w({}(v))'.format(self.text(plan.text)), 2)
+        for key, tag, repeated, sub_plan, formatter, default, element_check, bounds in plan.elements:
+            field = node[key][0] if repeated else node[key]
+            tag = self.tag(tag)
+            self.emit('v = get({!r}, _missing)'.format(key), 1)
+            if default is not Leaf._sentinel:
+                self.emit('if v is _missing:', 1)
+                self.emit('v = {!r}'.format(default), 2)
+            self.emit('if v is not _missing:', 1)
+            check = self.validator(element_check, field)
+            write = '_write_' + self.names[id(self.plans[id(sub_plan)])] if sub_plan is not None else None
+            format = self.formatter(formatter) if sub_plan is None else None
+            if repeated:
+                self.emit('if isinstance(v, (list, tuple)):', 2)
+                if bounds is not None:
+                    self.emit('if errors is not None:', 3)
+                    self.emit('_rt.count(path + {!r}, len(v), {!r}, errors)'.format('/' + key, bounds), 4)
+                if write is not None:
+                    self.emit('for i, item in enumerate(v):', 3)
+                    self.emit("{}(out, {!r}, item, '{{}}/{}[{{}}]'.format(path, i), errors)".format(write, tag, key), 4)
+                else:
+                    if check is not None:
+                        self.emit('if errors is not None:', 3)
+                        self.emit('_rt.check_items({}, path + {!r}, v, errors)'.format(check, '/' + key), 4)
+                    self.emit('_rt.write_column(out, {!r}, {}, v)'.format(tag, self.type_(formatter[0])), 3)
+                self.emit('elif _rt.iterable(v):', 2)
+                # the field's path (and bounds, for the number of items)
+                counted = ', {!r}'.format(bounds) if bounds is not None else ''
+                # (path is None when nothing is checked)
+                field_path = "'{{}}/{}'.format(path)".format(key)
+                if write is not None:
+                    self.emit('_rt.write_items({}, out, {!r}, {}, v, errors{})'.format(write, tag, field_path, counted), 3)
+                else:
+                    self.emit('_rt.write_leaves(out, {!r}, {}, {}, {}, v, errors{})'.format(tag, format, check, field_path, counted), 3)
+                self.emit('else:', 2)
+                indent = 3
+                if bounds is not None:
+                    self.emit('if errors is not None:', indent)
+                    self.emit('_rt.count(path + {!r}, 1, {!r}, errors)'.format('/' + key, bounds), indent + 1)
+            else:
+                indent = 2
+            if write is not None:
+                self.emit('{}(out, {!r}, v, path + {!r}, errors)'.format(write, tag, '/' + key), indent)
+            else:
+                if check is not None:
+                    self.emit('if errors is not None and v is not None:', indent)
+                    self.emit('_rt.check({}, path + {!r}, v, errors)'.format(check, '/' + key), indent + 1)
+                self.emit('if v is None:', indent)
+                self.emit('w({!r})'.format('<{} xsi:nil="true"/>'.format(tag)), indent + 1)
+                self.emit('else:', indent)
+                self.emit('w({!r} + {}(v) + {!r})'.format('<{}>'.format(tag), self.text(formatter), '</{}>'.format(tag)), indent + 1)
+        self.emit('if len(out) == mark:', 1)
+        self.emit("out[-1] = '/>'", 2)
+        self.emit('else:', 1)
+        self.emit("w('</' + tag + '>')", 2)
+    
+    def reader_function(self, node):
+        name = self.names[id(node)]
+        fields = []
+        attributes = []
+        for k, v in dict.items(node):
+            if k.startswith('#'):
+                continue
+            if k.startswith('@'):
+                # as Decoder.parse_value has it
+                attributes.append('{!r}: {}'.format(k, self.parser(v.type if isinstance(v, Leaf) else getattr(v, 'type', str))))
+                continue
+            repeated = isinstance(v, list)
+            fields.append('{!r}: ({}, {})'.format(k, self.reader(v[0] if repeated else v, repeated), repeated))
+        self.emit()
+        self.emit('def _read_{}(elem):'.format(name))
+        self.emit('if elem.get(_NIL) == {!r}:'.format('true'), 1)
+        self.emit('return None', 2)
+        self.emit('values = _rt.read_children(elem, _READ_{})'.format(name), 1)
+        self.emit('for key, text in elem.items():', 1)
+        self.emit('if key.startswith(_XSI):', 2)
+        self.emit('continue', 3)
+        self.emit("key = '@' + key[key.rfind('}') + 1:]", 2)
+        self.emit('if values is None:', 2)
+        self.emit('values = {}', 3)
+        if attributes:
+            self.emit('parse = _ATTRIBUTES_{}.get(key)'.format(name), 2)
+            self.emit('values[key] = parse(text) if parse is not None else text', 2)
+        else:
+            self.emit('values[key] = text', 2)
+        self.emit('text = elem.text', 1)
+        self.emit('if values is None:', 1)
+        self.emit('return {}(text)'.format(self.parser(node.type)) if node.type is not None else 'return text', 2)
+        self.emit('if text is not None and text.strip():', 1)
+        self.emit("values['#text'] = {}(text)".format(self.parser(node.type)) if node.type is not None else "values['#text'] = text", 2)
+        self.emit('return {}.of(values)'.format(name), 1)
+        # the tables point at readers defined further down, so they go last
+        self.tables.append('_READ_{} = {{{}}}'.format(name, ', '.join(fields)))
+        if attributes:
+            self.tables.append('_ATTRIBUTES_{} = {{{}}}'.format(name, ', '.join(attributes)))
+    
+    def root_writer(self, type_):
+        # the function writing a header / body root into `out`
+        if isinstance(type_, Node):
+            return '_write_{}'.format(self.names[id(type_)])
+        formatter = Serializer.leaf_formatter(type_)
+        check = self.validator(Serializer.validator(type_), type_)
+        return self.constant('write', '_rt.leaf_writer({}, {})'.format(self.formatter(formatter), check))
+    
+    def operation(self, call, name):
+        self.emit()
+        self.emit('def _serialize_{}(header=None, body=None):'.format(name))
+        self.emit('errors = _rt.Errors() if _client.STRICT_MODE else None', 1)
+        self.emit('out = [_ENVELOPE]', 1)
+        if call.input_header is not None:
+            root, path = call.input_header_name, client.XML.stripns(call.input_header_name or '') or 'body'
+            self.emit('if header is not None:', 1)
+            self.emit("out.append('<soapenv:Header>')", 2)
+            self.emit('{}(out, {!r}, header, {!r}, errors)'.format(self.root_writer(call.input_header), self.tag(root), path), 2)
+            self.emit("out.append('</soapenv:Header>')", 2)
+        if call.input_body is not None:
+            root, path = call.input_body_name, client.XML.stripns(call.input_body_name or '') or 'body'
+            self.emit("out.append('<soapenv:Body>')", 1)
+            # no body, no checks: it's sent empty
+            self.emit('{}(out, {!r}, {{}} if body is None else body, {!r}, None if body is None else errors)'.format(
+                self.root_writer(call.input_body), self.tag(root), path), 1)
+            self.emit("out.append('</soapenv:Body></soapenv:Envelope>')", 1)
+        else:
+            self.emit("out.append('<soapenv:Body/></soapenv:Envelope>')", 1)
+        self.emit('_rt.raise_errors(errors)', 1)
+        self.emit('return _rt.finish(out)', 1)
+        self.emit()
+        self.emit('def _decode_{}(source):'.format(name))
+        self.emit('return _rt.decode(source, {}, _op_{})'.format(self.reader(call.output_body), name), 1)
+        self.emit()
+        self.emit('class _op_{}(_rt.Operation):'.format(name))
+        self.emit('name = {!r}'.format(call.name), 1)
+        self.emit('url = {!r}'.format(call.url), 1)
+        self.emit('SOAPAction = {!r}'.format(call.SOAPAction), 1)
+        self.emit('input_header_name = {!r}'.format(call.input_header_name), 1)
+        self.emit('input_body_name = {!r}'.format(call.input_body_name), 1)
+        self.emit('has_input_header = {!r}'.format(call.input_header is not None), 1)
+        self.emit('has_input_body = {!r}'.format(call.input_body is not None), 1)
+        self.emit('serialize = staticmethod(_serialize_{})'.format(name), 1)
+        self.emit('decode = staticmethod(_decode_{})'.format(name), 1)
+        self.emit('types = staticmethod(lambda: _types())', 1)
+    
+    def types(self):
+        # code rebuilding the type trees: every node first, so that recursive
+        # and shared ones come out as they were
+        nodes = {id(node): i for i, node in enumerate(self.nodes.values())}
+        leaves = {id(leaf): i for i, leaf in enumerate(self.leaves.values())}
+        persistent = {id(leaf): qualname for qualname, leaf in SOAP.types.items()}
+        lists = {}
+        
+        def ref(type_):
+            if isinstance(type_, list):
+                if id(type_) not in lists:
+                    lists[id(type_)] = ('lists[{}]'.format(len(lists)), ref(type_[0]))
+                return lists[id(type_)][0]
+            if isinstance(type_, Node):
+                return 'n[{}]'.format(nodes[id(type_)])
+            if id(type_) in persistent:
+                return '_SOAP.types[{!r}]'.format(persistent[id(type_)])
+            return 'l[{}]'.format(leaves[id(type_)])
+        
+        self.emit()
+        for table in self.tables:
+            self.emit(table)
+        self.emit()
+        self.emit('@functools.lru_cache(None)')
+        self.emit('def _types():')
+        self.emit("# operation name -> its type trees (input header / body, output header / body) and faults", 1)
+        self.emit('n = [{}]'.format(', '.join('_Node({})'.format(self.restriction(node.restriction))
+                                              for node in self.nodes.values())), 1)
+        self.emit('l = [{}]'.format(', '.join(self.leaf(leaf) for leaf in self.leaves.values() if id(leaf) not in persistent)), 1)
+        # persistent leaves don't take a slot
+        leaves.clear()
+        for leaf in self.leaves.values():
+            if id(leaf) not in persistent:
+                leaves[id(leaf)] = len(leaves)
+        statements = []
+        for i, node in enumerate(self.nodes.values()):
+            items = ', '.join('({!r}, {})'.format(k, repr(v) if k == '#namespace' else ref(v)) for k, v in dict.items(node))
+            statements.append('dict.update(n[{}], [{}])'.format(i, items))
+            if node.type is not None:
+                statements.append('n[{}].type = {}'.format(i, self.type_(node.type)))
+            if isinstance(node.base, Node):
+                statements.append('n[{}].base = {}'.format(i, ref(node.base)))
+            if node.inherited is not None:
+                statements.append('n[{}].inherited = {{{}}}'.format(i, ', '.join('{!r}: {}'.format(k, ref(v)) for k, v in node.inherited.items())))
+            if node.occurs is not None:
+                statements.append('n[{}].occurs = {{{}}}'.format(i, ', '.join('{!r}: {}'.format(k, self.restriction(v)) for k, v in node.occurs.items())))
+        self.emit('lists = [{}]'.format(', '.join('[{}]'.format(item) for _, item in lists.values())), 1)
+        for statement in statements:
+            self.emit(statement, 1)
+        trees = []
+        for call in self.soap_calls:
+            refs = ', '.join(ref(tree) if tree is not None else 'None'
+                             for tree in (call.input_header, call.input_body, call.output_header, call.output_body))
+            faults = ', '.join('{!r}: ({!r}, {})'.format(name, element, ref(tree)) for name, (element, tree) in (call.faults or {}).items())
+            refs += ', {{{}}}'.format(faults) if faults else ', None'
+            trees.append('{!r}: ({})'.format(call.name, refs))
+        self.emit('return {{{}}}'.format(', '.join(trees)), 1)
+    
+    def leaf(self, leaf):
+        args = [self.type_(leaf.type)]
+        if leaf.default is not Leaf._sentinel:
+            args.append('default={!r}'.format(leaf.default))
+        if leaf.documentation:
+            args.append('documentation={!r}'.format(leaf.documentation))
+        if leaf.restriction is not None:
+            args.append('restriction={}'.format(self.restriction(leaf.restriction)))
+        return '_Leaf({})'.format(', '.join(args))
+    
+    def clients(self):
+        operations = ', '.join('_op_' + name for name in self.operations)
+        self.emit()
+        self.emit('class Client(_rt.Client):')
+        self.emit('wsdls = WSDLS', 1)
+        self.emit('operations = ({}{})'.format(operations, ',' if len(self.soap_calls) == 1 else ''), 1)
+        self.emit()
+        self.emit('class AsyncClient(_rt.AsyncClient):')
+        self.emit('wsdls = WSDLS', 1)
+        self.emit('operations = Client.operations', 1)
+
+def generate(wsdls):
+    # the module's source, for WSDL locations (paths / urls)
+    documents = WsdlLoader().load(wsdls)
+    xmls = [document.xml for document in documents]
+    # the type tree's qualnames name the classes
+    soap_calls, type_tree = WsdlParser.get_soap_calls_and_types(xmls)
+    return Generator(soap_calls, type_tree, wsdls).generate()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m simplesoap.codegen',
+                                     description='generate a client module from WSDLs')
+    parser.add_argument('wsdls', nargs='+', help='WSDL paths or urls')
+    parser.add_argument('-o', '--output', help='the module to write (default: stdout)')
+    args = parser.parse_args(argv)
+    source = generate(args.wsdls)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(source)
+    else:
+        sys.stdout.write(source)
+
+if __name__ == '__main__':
+    main()
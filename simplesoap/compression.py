@@ -0,0 +1,45 @@
+import zlib
+
+# compressed request bodies (Content-Encoding). responses need nothing of the
+# kind: requests and aiohttp ask for gzip / deflate (Accept-Encoding) and
+# decompress as the body is read, urllib3 a chunk at a time, so a compressed
+# response streams into the parser like any other
+
+class Compression(object):
+    # bodies of at least `threshold` bytes are sent compressed with `encoding`;
+    # streamed ones, whose size isn't known up front, always are. set per
+    # endpoint (Client.compress): not every server accepts compressed requests.
+    # envelopes are repetitive enough that the fastest level gets most of it
+    wbits = {'gzip': 16 + zlib.MAX_WBITS, 'deflate': zlib.MAX_WBITS} # deflate: zlib-wrapped, as http has it
+    
+    def __init__(self, threshold=16 * 2**10, encoding='gzip', level=1):
+        if encoding not in self.wbits:
+            raise ValueError('unsupported encoding {}, use one of {}'.format(encoding, ', '.join(self.wbits)))
+        self.threshold = threshold
+        self.encoding = encoding
+        self.level = level
+    
+    def compressor(self):
+        return zlib.compressobj(self.level, zlib.DEFLATED, self.wbits[self.encoding])
+    
+    def encode(self, data, headers):
+        # the body as it's sent (bytes or an iterable of chunks) and its headers
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            if len(data) < self.threshold:
+                return data, headers
+            compressor = self.compressor()
+            data = compressor.compress(data) + compressor.flush()
+        else:
+            data = self.stream(data)
+        return data, dict(headers, **{'Content-Encoding': self.encoding})
+    
+    def stream(self, chunks):
+        compressor = self.compressor()
+        for chunk in chunks:
+            chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        yield compressor.flush()
+    
+    def __repr__(self):
+        return 'Compression(threshold={}, encoding={!r}, level={})'.format(self.threshold, self.encoding, self.level)
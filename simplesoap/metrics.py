@@ -0,0 +1,165 @@
+import time, bisect, threading, contextlib, collections
+
+# timings reported to a Client's observers: callables taking one event, a
+# CallEvent per operation call and a StartupEvent per Client. durations are
+# in seconds, None for the phases a failed call didn't reach
+# - serialize: building the envelope (while sending it, when streamed)
+# - network: sending the request and waiting for / reading the response
+# - parse: decoding the response, reads excluded
+# request / response_bytes are the envelopes' sizes, *_wire_bytes what went
+# over the wire: less than those when compressed (None when unknown)
+CallEvent = collections.namedtuple('CallEvent', ['operation', 'url', 'serialize', 'network', 'parse', 'total',
+                                                 'request_bytes', 'response_bytes', 'error',
+                                                 'request_wire_bytes', 'response_wire_bytes'],
+                                   defaults=(None, None))
+# phases: fetch (WsdlLoader), snapshot (load / save), parse (the WSDL xml),
+# build_type_tree and get_soap_calls (the rest of it); only those that ran,
+# a client sharing already built calls has fetch alone
+StartupEvent = collections.namedtuple('StartupEvent', ['wsdls', 'phases', 'total'])
+
+clock = time.perf_counter
+
+class Phases(collections.OrderedDict):
+    # name -> seconds, added up over every `with phases(name):`
+    @contextlib.contextmanager
+    def __call__(self, name):
+        start = clock()
+        try:
+            yield
+        finally:
+            self[name] = self.get(name, 0.0) + clock() - start
+
+class Meter(object):
+    # counts the bytes that went through a source and the time spent getting them
+    def __init__(self, source):
+        self.source = source
+        self.bytes = 0
+        self.seconds = 0.0
+
+class ReadMeter(Meter):
+    # ... of a file
+    def read(self, *args):
+        start = clock()
+        data = self.source.read(*args)
+        self.seconds += clock() - start
+        self.bytes += len(data)
+        return data
+    
+    def read1(self, *args):
+        start = clock()
+        data = self.source.read1(*args)
+        self.seconds += clock() - start
+        self.bytes += len(data)
+        return data
+
+class IterMeter(Meter):
+    # ... of an iterable of chunks
+    def __iter__(self):
+        chunks = iter(self.source)
+        while True:
+            start = clock()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                self.seconds += clock() - start
+            self.bytes += len(chunk)
+            yield chunk
+
+def emit(observers, event):
+    for observer in observers:
+        observer(event)
+
+class Histogram(object):
+    # counts per bucket of fixed upper bounds (seconds), plus count and sum
+    bounds = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+    
+    def __init__(self):
+        self.buckets = [0] * len(self.bounds)
+        self.count = 0
+        self.sum = 0.0
+    
+    def add(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+    
+    def quantile(self, q):
+        # the upper bound of the bucket the q-th value falls in
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.buckets):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self.bounds[-1]
+    
+    def summary(self):
+        return {'count': self.count, 'sum': self.sum, 'mean': self.sum / self.count if self.count else None,
+                'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99),
+                'buckets': dict(zip(self.bounds, self.buckets))}
+
+class Metrics(object):
+    # the built-in observer: per (operation, url) call counts, errors, bytes
+    # and a histogram per phase, plus histograms of the startup phases.
+    # Client(wsdls, observers=[metrics]); metrics.summary()
+    phases = ('serialize', 'network', 'parse', 'total')
+    
+    class Stats(object):
+        def __init__(self):
+            self.count = 0
+            self.errors = collections.Counter()
+            self.request_bytes = 0
+            self.response_bytes = 0
+            self.request_wire_bytes = 0
+            self.response_wire_bytes = 0
+            self.phases = collections.defaultdict(Histogram)
+    
+    def __init__(self):
+        self.calls = collections.defaultdict(self.Stats)
+        self.startup = collections.defaultdict(Histogram)
+        self.lock = threading.Lock()
+    
+    def __call__(self, event):
+        with self.lock:
+            if isinstance(event, StartupEvent):
+                for name, seconds in event.phases.items():
+                    self.startup[name].add(seconds)
+                self.startup['total'].add(event.total)
+                return
+            stats = self.calls[event.operation, event.url]
+            stats.count += 1
+            if event.error is not None:
+                stats.errors[type(event.error).__name__] += 1
+            stats.request_bytes += event.request_bytes or 0
+            stats.response_bytes += event.response_bytes or 0
+            # uncompressed when it isn't known
+            stats.request_wire_bytes += event.request_wire_bytes if event.request_wire_bytes is not None else event.request_bytes or 0
+            stats.response_wire_bytes += event.response_wire_bytes if event.response_wire_bytes is not None else event.response_bytes or 0
+            for name in self.phases:
+                seconds = getattr(event, name)
+                if seconds is not None:
+                    stats.phases[name].add(seconds)
+    
+    def summary(self):
+        with self.lock:
+            calls = {}
+            for (operation, url), stats in self.calls.items():
+                errors = sum(stats.errors.values())
+                calls[operation, url] = {'count': stats.count,
+                                         'errors': dict(stats.errors),
+                                         'error_rate': errors / stats.count,
+                                         'request_bytes': stats.request_bytes,
+                                         'response_bytes': stats.response_bytes,
+                                         'request_wire_bytes': stats.request_wire_bytes,
+                                         'response_wire_bytes': stats.response_wire_bytes,
+                                         'phases': {name: h.summary() for name, h in stats.phases.items()}}
+            return {'calls': calls, 'startup': {name: h.summary() for name, h in self.startup.items()}}
+    
+    def clear(self):
+        with self.lock:
+            self.calls.clear()
+            self.startup.clear()
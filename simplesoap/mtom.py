@@ -0,0 +1,111 @@
+import io, re, tempfile, urllib.parse
+
+# MTOM / XOP responses: a multipart/related body whose root part is the soap
+# envelope, with every binary field replaced by an <xop:Include href="cid:..."/>
+# pointing at one of the other parts. the body is read in chunks and each
+# part goes straight into a SpooledTemporaryFile (in memory up to spool_size,
+# on disk beyond), so an attachment is never held as one bytes object
+
+XOP_INCLUDE = '{http://www.w3.org/2004/08/xop/include}Include'
+
+def is_multipart(content_type):
+    return (content_type or '').lower().startswith('multipart/related')
+
+def parameters(content_type):
+    # the parameters of a Content-Type header, names lowercased
+    params = {}
+    for m in re.finditer(r';\s*([^=\s;]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^;]*)', content_type):
+        value = m.group(2).strip()
+        if value.startswith('"'):
+            value = value[1:-1].replace('\\"', '"')
+        params[m.group(1).lower()] = value
+    return params
+
+def content_id(value):
+    return value.strip().strip('<>')
+
+def resolve(href, attachments):
+    # the attachment an xop:Include points at
+    if href.startswith('cid:'):
+        href = urllib.parse.unquote(href[4:])
+    return attachments[href]
+
+def parse(source, content_type, chunk_size=64 * 2**10, spool_size=2**20):
+    # returns (root, attachments): the envelope part and {content id: part},
+    # all spooled files positioned at their start
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    params = parameters(content_type)
+    delimiter = b'\r\n--' + params['boundary'].encode()
+    start = content_id(params['start']) if 'start' in params else None
+
+    parts = []
+    part = None # the file being written, None while reading headers / the preamble
+    headers = None
+    # the body starts with the delimiter, minus its CRLF
+    buffer = b'\r\n'
+    done = False
+    while not done:
+        chunk = source.read(chunk_size)
+        buffer += chunk
+        while True:
+            if headers is not None:
+                if buffer.startswith(b'\r\n'):
+                    end = -2 # no headers at all
+                else:
+                    end = buffer.find(b'\r\n\r\n')
+                    if end < 0:
+                        break
+                part = tempfile.SpooledTemporaryFile(max_size=spool_size)
+                part.headers = headers_dict(buffer[:max(end, 0)])
+                parts.append(part)
+                buffer = buffer[end + 4:]
+                headers = None
+            i = buffer.find(delimiter)
+            if i < 0:
+                # keep what could be the start of a delimiter
+                keep = len(delimiter) + 1
+                if len(buffer) > keep:
+                    if part is not None:
+                        part.write(buffer[:-keep])
+                    buffer = buffer[-keep:]
+                break
+            if part is not None:
+                part.write(buffer[:i])
+            rest = buffer[i + len(delimiter):]
+            if chunk and (len(rest) < 2 or (not rest.startswith(b'--') and b'\r\n' not in rest)):
+                # wait for the rest of the delimiter line
+                buffer = buffer[i:]
+                break
+            part = None
+            if rest.startswith(b'--'):
+                done = True
+                break
+            headers = True
+            # the delimiter line may end in transport padding
+            buffer = rest.partition(b'\r\n')[2]
+        if not chunk and not done:
+            if part is not None or headers is not None or not parts:
+                raise ValueError('truncated multipart body')
+            done = True
+
+    root = None
+    attachments = {}
+    for part in parts:
+        part.seek(0)
+        cid = content_id(part.headers.get('content-id', ''))
+        if root is None and (start is None or cid == start):
+            root = part
+        else:
+            attachments[cid] = part
+    if root is None:
+        raise ValueError('multipart body without its root part {}'.format(start))
+    return root, attachments
+
+def headers_dict(data):
+    headers = {}
+    for line in data.decode('latin-1').split('\r\n'):
+        name, _, value = line.partition(':')
+        if name.strip():
+            headers[name.strip().lower()] = value.strip()
+    return headers
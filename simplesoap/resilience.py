@@ -0,0 +1,336 @@
+import time, random, asyncio, threading, collections, concurrent.futures, requests, urllib3.exceptions
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+class CircuitOpen(Exception):
+    # the endpoint failed too often lately, the call wasn't even tried
+    def __init__(self, url, retry_in):
+        super().__init__('circuit open for {}, retrying in {:.1f}s'.format(url, retry_in))
+        self.url = url
+        self.retry_in = retry_in
+
+class CircuitBreaker(object):
+    # closed -> open after `threshold` consecutive failures: calls fail fast
+    # for `reset_timeout` seconds, then one trial call goes through (half
+    # open); its success closes the circuit again, its failure reopens it
+    def __init__(self, url, threshold=5, reset_timeout=30):
+        self.url = url
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened = None
+        self.trial = False
+        self.lock = threading.Lock()
+    
+    @property
+    def state(self):
+        if self.opened is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened >= self.reset_timeout else 'open'
+    
+    def check(self):
+        # True when this call is the half-open trial: it has to end_trial()
+        # however it ends
+        with self.lock:
+            if self.opened is None:
+                return False
+            waited = time.monotonic() - self.opened
+            if waited < self.reset_timeout or self.trial:
+                raise CircuitOpen(self.url, max(self.reset_timeout - waited, 0))
+            self.trial = True
+            return True
+    
+    def end_trial(self):
+        # neither success() nor failure(): the next call is the trial
+        with self.lock:
+            self.trial = False
+    
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened = None
+            self.trial = False
+    
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened = time.monotonic()
+            self.trial = False
+
+class Policy(object):
+    # how the calls of the operations it's given to (Client(policy=...) or
+    # SoapCall.policy) are made:
+    # - deadline: seconds for the whole call, retries and hedges included
+    #   (a call's own deadline=... takes precedence)
+    # - retries: attempts after the first on connection errors, timeouts and
+    #   502 / 503 / 504 / 429s, after a full-jitter exponential backoff
+    #   (random in [0, min(max_backoff, backoff * 2**attempt)]) that has to
+    #   fit in what's left of the deadline. faults and other http errors
+    #   are answers, not failures: the endpoint is up
+    # - hedge: if an attempt hasn't returned after hedge_delay seconds
+    #   (default: the hedge_quantile of the operation's recent latencies,
+    #   once there are hedge_samples of them) a second one is sent, the
+    #   first answer wins
+    # - circuit breaking per url, see CircuitBreaker (breaker=False: none)
+    # retries and hedges send the request again: only for idempotent
+    # operations, and never for streamed requests
+    retry_statuses = frozenset([429, 502, 503, 504])
+    
+    def __init__(self, deadline=None, retries=0, backoff=0.05, max_backoff=2.0, hedge=False, hedge_delay=None,
+                 hedge_quantile=0.95, hedge_samples=20, breaker=True, failure_threshold=5, reset_timeout=30, window=200,
+                 hedge_workers=32):
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_quantile = hedge_quantile
+        self.hedge_samples = hedge_samples
+        self.breaker = breaker
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge_workers = hedge_workers
+        self.breakers = {}
+        self.latencies = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self.lock = threading.Lock()
+        self._executor = None
+    
+    def circuit(self, url):
+        if not self.breaker:
+            return None
+        breaker = self.breakers.get(url)
+        if breaker is None:
+            with self.lock:
+                breaker = self.breakers.setdefault(url, CircuitBreaker(url, self.failure_threshold, self.reset_timeout))
+        return breaker
+    
+    def retriable(self, error):
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return True
+        if isinstance(error, (urllib3.exceptions.TimeoutError, urllib3.exceptions.ProtocolError)):
+            return True
+        if isinstance(error, requests.HTTPError):
+            return error.response is not None and error.response.status_code in self.retry_statuses
+        if aiohttp is not None:
+            if isinstance(error, aiohttp.ClientResponseError):
+                return error.status in self.retry_statuses
+            if isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+                return True
+        return False
+    
+    @staticmethod
+    def answered(error):
+        # whether error is the endpoint's answer (errors saying so, as faults
+        # do with `answered = True`, and http errors)
+        if getattr(error, 'answered', False) or isinstance(error, requests.HTTPError):
+            return True
+        return aiohttp is not None and isinstance(error, aiohttp.ClientResponseError)
+    
+    def delay(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+    
+    def observe(self, name, seconds):
+        with self.lock:
+            self.latencies[name].append(seconds)
+    
+    def hedge_after(self, name):
+        # seconds to wait before hedging, None: no hedging (yet)
+        if not self.hedge:
+            return None
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        with self.lock:
+            latencies = sorted(self.latencies[name])
+        if len(latencies) < self.hedge_samples:
+            return None
+        return latencies[min(int(self.hedge_quantile * len(latencies)), len(latencies) - 1)]
+    
+    @property
+    def executor(self):
+        # threads for hedged attempts
+        if self._executor is None:
+            with self.lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(self.hedge_workers, 'simplesoap-hedge')
+        return self._executor
+    
+    def run(self, name, url, attempt, deadline=None):
+        # calls attempt(timeout) as the policy says; timeout: seconds left
+        deadline = deadline if deadline is not None else self.deadline
+        until = time.monotonic() + deadline if deadline is not None else None
+        breaker = self.circuit(url)
+        retry = 0
+        while True:
+            remaining = until - time.monotonic() if until is not None else None
+            if remaining is not None and remaining <= 0:
+                raise DeadlineExceeded('{}: deadline of {}s exceeded'.format(name, deadline))
+            trial = breaker is not None and breaker.check()
+            try:
+                result = self.hedged(name, attempt, remaining)
+            except Exception as e:
+                expired = until is not None and time.monotonic() >= until
+                retriable = self.retriable(e)
+                if breaker is not None:
+                    if expired or retriable:
+                        breaker.failure()
+                    elif self.answered(e):
+                        breaker.success()
+                if expired and not isinstance(e, DeadlineExceeded):
+                    raise DeadlineExceeded('{}: deadline of {}s exceeded'.format(name, deadline)) from e
+                if expired or not retriable or retry >= self.retries:
+                    raise
+                pause = self.delay(retry)
+                if until is not None and time.monotonic() + pause >= until:
+                    raise
+                retry += 1
+                time.sleep(pause)
+                continue
+            finally:
+                if trial:
+                    breaker.end_trial()
+            if breaker is not None:
+                breaker.success()
+            return result
+    
+    def timed(self, name, attempt, timeout):
+        start = time.monotonic()
+        result = attempt(timeout)
+        self.observe(name, time.monotonic() - start)
+        return result
+    
+    def hedged(self, name, attempt, remaining):
+        delay = self.hedge_after(name)
+        if delay is None or (remaining is not None and delay >= remaining):
+            return self.timed(name, attempt, remaining)
+        start = time.monotonic()
+        pending = {self.executor.submit(self.timed, name, attempt, remaining)}
+        done, _ = concurrent.futures.wait(pending, timeout=delay)
+        if not done:
+            left = remaining - (time.monotonic() - start) if remaining is not None else None
+            pending.add(self.executor.submit(self.timed, name, attempt, left))
+        error = None
+        while pending:
+            left = remaining - (time.monotonic() - start) if remaining is not None else None
+            if left is not None and left <= 0:
+                raise DeadlineExceeded('{}: deadline exceeded'.format(name))
+            done, pending = concurrent.futures.wait(pending, timeout=left, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+    
+    async def arun(self, name, url, attempt, deadline=None):
+        # run() for coroutines: attempt(timeout) is a coroutine function
+        deadline = deadline if deadline is not None else self.deadline
+        until = time.monotonic() + deadline if deadline is not None else None
+        breaker = self.circuit(url)
+        retry = 0
+        while True:
+            remaining = until - time.monotonic() if until is not None else None
+            if remaining is not None and remaining <= 0:
+                raise DeadlineExceeded('{}: deadline of {}s exceeded'.format(name, deadline))
+            trial = breaker is not None and breaker.check()
+            try:
+                result = await asyncio.wait_for(self.ahedged(name, attempt, remaining), remaining)
+            except Exception as e:
+                expired = until is not None and time.monotonic() >= until
+                retriable = self.retriable(e)
+                if breaker is not None:
+                    if expired or retriable:
+                        breaker.failure()
+                    elif self.answered(e):
+                        breaker.success()
+                if expired and not isinstance(e, DeadlineExceeded):
+                    raise DeadlineExceeded('{}: deadline of {}s exceeded'.format(name, deadline)) from e
+                if expired or not retriable or retry >= self.retries:
+                    raise
+                pause = self.delay(retry)
+                if until is not None and time.monotonic() + pause >= until:
+                    raise
+                retry += 1
+                await asyncio.sleep(pause)
+                continue
+            finally:
+                if trial:
+                    breaker.end_trial()
+            if breaker is not None:
+                breaker.success()
+            return result
+    
+    async def atimed(self, name, attempt, timeout):
+        start = time.monotonic()
+        result = await attempt(timeout)
+        self.observe(name, time.monotonic() - start)
+        return result
+    
+    async def ahedged(self, name, attempt, remaining):
+        delay = self.hedge_after(name)
+        if delay is None or (remaining is not None and delay >= remaining):
+            return await self.atimed(name, attempt, remaining)
+        tasks = [asyncio.ensure_future(self.atimed(name, attempt, remaining))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                left = remaining - delay if remaining is not None else None
+                tasks.append(asyncio.ensure_future(self.atimed(name, attempt, left)))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # the slower attempt isn't waited for, nor its error
+            for task in tasks:
+                task.cancel()
+                task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+class Body(object):
+    # a streamed response's raw (urllib3) body, read within a deadline: each
+    # read waits at most what's left of it (until: time.monotonic() terms),
+    # and a body still coming in past it raises DeadlineExceeded. urllib3's
+    # own errors are raised as the requests ones the policy retries
+    def __init__(self, raw, until=None):
+        self.raw = raw
+        self.until = until
+    
+    def read(self, *args):
+        return self.reading(self.raw.read, *args)
+    
+    def read1(self, *args):
+        return self.reading(self.raw.read1, *args)
+    
+    def reading(self, read, *args):
+        if self.until is not None:
+            remaining = self.until - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded('deadline exceeded while reading the response')
+            sock = getattr(getattr(self.raw, '_connection', None), 'sock', None)
+            if sock is not None:
+                sock.settimeout(remaining)
+        try:
+            return read(*args)
+        except urllib3.exceptions.ReadTimeoutError as e:
+            if self.until is not None and time.monotonic() >= self.until:
+                raise DeadlineExceeded('deadline exceeded while reading the response') from e
+            raise requests.exceptions.ReadTimeout(e) from e
+        except urllib3.exceptions.ProtocolError as e:
+            raise requests.ConnectionError(e) from e
+    
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+# for calls given a deadline without a policy
+Policy.plain = Policy(breaker=False)
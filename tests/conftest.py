@@ -0,0 +1,235 @@
+import os, sys, time, threading, importlib.util, collections, http.server, pytest
+from simplesoap import client, codegen
+
+TNS = 'urn:simplesoap:test'
+
+# EchoRequest -> EchoResponse, the shape most tests use: a required name, an
+# optional count, repeated tags and a paging token in, repeated items and the
+# next token out
+SCHEMA = '''
+<xs:complexType name="Item">
+  <xs:sequence>
+    <xs:element name="id" type="xs:int"/>
+    <xs:element name="label" type="xs:string" minOccurs="0"/>
+  </xs:sequence>
+</xs:complexType>
+<xs:element name="EchoRequest">
+  <xs:complexType>
+    <xs:sequence>
+      <xs:element name="name" type="xs:string"/>
+      <xs:element name="count" type="xs:int" minOccurs="0"/>
+      <xs:element name="tags" type="xs:string" minOccurs="0" maxOccurs="unbounded"/>
+      <xs:element name="token" type="xs:string" minOccurs="0"/>
+    </xs:sequence>
+  </xs:complexType>
+</xs:element>
+<xs:element name="EchoResponse">
+  <xs:complexType>
+    <xs:sequence>
+      <xs:element name="name" type="xs:string" minOccurs="0"/>
+      <xs:element name="count" type="xs:int" minOccurs="0"/>
+      <xs:element name="item" type="tns:Item" minOccurs="0" maxOccurs="unbounded"/>
+      <xs:element name="next" type="xs:string" minOccurs="0"/>
+    </xs:sequence>
+  </xs:complexType>
+</xs:element>
+'''
+
+WSDL = '''<?xml version="1.0" encoding="UTF-8"?>
+<wsdl:definitions xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/" xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/"
+                  xmlns:xs="http://www.w3.org/2001/XMLSchema" xmlns:tns="{tns}" targetNamespace="{tns}">
+  <wsdl:types>
+    <xs:schema targetNamespace="{tns}" elementFormDefault="qualified">{schema}</xs:schema>
+  </wsdl:types>
+  {messages}
+  <wsdl:portType name="TestPortType">{port_operations}</wsdl:portType>
+  <wsdl:binding name="TestBinding" type="tns:TestPortType">
+    <soap:binding style="document" transport="http://schemas.xmlsoap.org/soap/http"/>
+    {binding_operations}
+  </wsdl:binding>
+  <wsdl:service name="TestService">
+    <wsdl:port name="TestPort" binding="tns:TestBinding"><soap:address location="{url}"/></wsdl:port>
+  </wsdl:service>
+</wsdl:definitions>
+'''
+
+def wsdl(url, schema=SCHEMA, operations=None, faults=None):
+    # operations: name -> (request element, response element), by default
+    # Echo and Lookup, both EchoRequest -> EchoResponse. faults: operation
+    # name -> (fault name, element)
+    operations = operations or {'Echo': ('EchoRequest', 'EchoResponse'), 'Lookup': ('EchoRequest', 'EchoResponse')}
+    faults = faults or {}
+    messages, port_operations, binding_operations = [], [], []
+    for name, (request, response) in operations.items():
+        messages.append('<wsdl:message name="{0}Input"><wsdl:part name="parameters" element="tns:{1}"/></wsdl:message>'
+                        '<wsdl:message name="{0}Output"><wsdl:part name="parameters" element="tns:{2}"/></wsdl:message>'
+                        .format(name, request, response))
+        port_fault = binding_fault = ''
+        if name in faults:
+            fault, element = faults[name]
+            messages.append('<wsdl:message name="{0}Message"><wsdl:part name="fault" element="tns:{1}"/></wsdl:message>'
+                            .format(fault, element))
+            port_fault = '<wsdl:fault name="{0}" message="tns:{0}Message"/>'.format(fault)
+            binding_fault = '<wsdl:fault name="{0}"><soap:fault name="{0}" use="literal"/></wsdl:fault>'.format(fault)
+        port_operations.append('<wsdl:operation name="{0}"><wsdl:input message="tns:{0}Input"/>'
+                               '<wsdl:output message="tns:{0}Output"/>{1}</wsdl:operation>'.format(name, port_fault))
+        binding_operations.append('<wsdl:operation name="{0}"><soap:operation soapAction="{1}#{0}"/>'
+                                  '<wsdl:input><soap:body use="literal"/></wsdl:input>'
+                                  '<wsdl:output><soap:body use="literal"/></wsdl:output>{2}</wsdl:operation>'
+                                  .format(name, TNS, binding_fault))
+    return WSDL.format(tns=TNS, schema=schema, url=url, messages='\n  '.join(messages),
+                       port_operations=''.join(port_operations), binding_operations='\n    '.join(binding_operations)).encode()
+
+def envelope(payload):
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:tns="{}">'
+            '<soapenv:Body>{}</soapenv:Body></soapenv:Envelope>'.format(TNS, payload)).encode()
+
+def echo(name='echo', items=(), next=None):
+    # an EchoResponse envelope: items are (id, label)
+    parts = ['<tns:name>{}</tns:name>'.format(name)]
+    parts.extend('<tns:item><tns:id>{}</tns:id><tns:label>{}</tns:label></tns:item>'.format(id, label) for id, label in items)
+    if next is not None:
+        parts.append('<tns:next>{}</tns:next>'.format(next))
+    return envelope('<tns:EchoResponse>{}</tns:EchoResponse>'.format(''.join(parts)))
+
+def fault(code='soapenv:Server', string='failed', detail=''):
+    return envelope('<soapenv:Fault><faultcode>{}</faultcode><faultstring>{}</faultstring>{}</soapenv:Fault>'.format(
+        code, string, '<detail>{}</detail>'.format(detail) if detail else ''))
+
+Request = collections.namedtuple('Request', ['path', 'headers', 'body', 'client_address'])
+
+class Stub(object):
+    # a local http server: POSTs are recorded and answered with
+    # respond(request) -> (status, headers, body). a body that isn't bytes is
+    # an iterable of chunks, each written and flushed as it comes, so tests
+    # can make slow responses. GETs serve `documents` by path
+    def __init__(self):
+        self.requests = []
+        self.documents = {}
+        self.respond = lambda request: (200, {}, echo())
+        self.lock = threading.Lock()
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), self.Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self.url = 'http://127.0.0.1:{}/service'.format(self.httpd.server_address[1])
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+    
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        wbufsize = -1
+        
+        def do_GET(self):
+            content = self.server.stub.documents.get(self.path)
+            if content is None:
+                self.reply(404, {}, b'not found')
+            else:
+                self.reply(200, {}, content)
+        
+        def do_POST(self):
+            if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+                chunks = []
+                while True:
+                    size = int(self.rfile.readline().split(b';')[0], 16)
+                    chunks.append(self.rfile.read(size + 2)[:size])
+                    if not size:
+                        break
+                body = b''.join(chunks)
+            else:
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            stub = self.server.stub
+            request = Request(self.path, dict(self.headers), body, self.client_address)
+            with stub.lock:
+                stub.requests.append(request)
+            self.reply(*stub.respond(request))
+        
+        def reply(self, status, headers, body):
+            self.send_response(status)
+            headers = dict(headers)
+            headers.setdefault('Content-Type', 'text/xml; charset=utf-8')
+            if self.close_connection:
+                # as servers do: clients only drop the connection when told
+                headers['Connection'] = 'close'
+            for k, v in headers.items():
+                self.send_header(k, v)
+            if isinstance(body, bytes):
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                self.wfile.flush()
+                return
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            self.wfile.flush()
+            try:
+                for chunk in body:
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                    self.wfile.flush()
+                self.wfile.write(b'0\r\n\r\n')
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+        
+        def log_message(self, *args):
+            pass
+
+def later(delay, response):
+    # respond() answering `response` after delay seconds
+    def respond(request):
+        time.sleep(delay)
+        return response
+    return respond
+
+def slowly(content, pieces=10, delay=0.1):
+    # content in `pieces` chunks, `delay` seconds apart
+    size = max(1, len(content) // pieces)
+    for i in range(0, len(content), size):
+        time.sleep(delay)
+        yield content[i:i + size]
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    # downloads, snapshots and shared calls of one test don't leak into the next
+    monkeypatch.setattr(client.WsdlParser, 'cache', client.WsdlCache(str(tmp_path / 'wsdls')))
+    monkeypatch.setattr(client.Snapshot, 'directory', str(tmp_path / 'snapshots'))
+    client.Registry.clear()
+    yield
+    client.Registry.clear()
+
+@pytest.fixture
+def stub():
+    stub = Stub()
+    yield stub
+    stub.close()
+
+@pytest.fixture
+def service(tmp_path, stub):
+    # service(**wsdl options) -> path of a WSDL whose endpoint is the stub
+    def service(name='service.wsdl', **options):
+        path = os.path.join(str(tmp_path), name)
+        with open(path, 'wb') as f:
+            f.write(wsdl(stub.url, **options))
+        return path
+    return service
+
+@pytest.fixture
+def generated(tmp_path):
+    # generated(wsdl path, name) -> the module codegen makes of it, imported
+    modules = []
+    def generated(path, name='generated_service'):
+        filename = os.path.join(str(tmp_path), name + '.py')
+        codegen.main([path, '-o', filename])
+        spec = importlib.util.spec_from_file_location(name, filename)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        modules.append(name)
+        spec.loader.exec_module(module)
+        return module
+    yield generated
+    for name in modules:
+        sys.modules.pop(name, None)
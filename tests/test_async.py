@@ -0,0 +1,54 @@
+import time, asyncio, threading, pytest
+from simplesoap.client import Client, AsyncClient, AsyncTransport, Fault
+from conftest import echo, fault
+
+def test_operations_are_awaitable(service):
+    async def main():
+        async with AsyncClient(service()) as client:
+            return await client.Echo(body={'name': 'a', 'tags': ['x', 'y']})
+    assert asyncio.run(main()) == {'name': 'echo'}
+
+def test_envelopes_and_results_match_the_sync_client(service, stub):
+    stub.respond = lambda request: (200, {}, echo(items=[(1, 'one'), (2, 'two')]))
+    path = service()
+    body = {'name': 'a', 'count': 3, 'tags': ['x']}
+    result = Client(path).Echo(body=body)
+    async def main():
+        async with AsyncClient(path) as client:
+            return await client.Echo(body=body)
+    assert asyncio.run(main()) == result
+    assert stub.requests[0].body == stub.requests[1].body
+    assert stub.requests[1].headers['SOAPAction'] == stub.requests[0].headers['SOAPAction']
+
+def test_faults_are_raised(service, stub):
+    stub.respond = lambda request: (500, {}, fault(string='no such name'))
+    async def main():
+        async with AsyncClient(service()) as client:
+            await client.Echo(body={'name': 'a'})
+    with pytest.raises(Fault) as error:
+        asyncio.run(main())
+    assert error.value.faultstring == 'no such name'
+
+def test_concurrency_limit(service, stub):
+    lock = threading.Lock()
+    state = {'in_flight': 0, 'peak': 0}
+    def respond(request):
+        with lock:
+            state['in_flight'] += 1
+            state['peak'] = max(state['peak'], state['in_flight'])
+        time.sleep(0.05)
+        with lock:
+            state['in_flight'] -= 1
+        return 200, {}, echo()
+    stub.respond = respond
+    async def main():
+        async with AsyncClient(service(), concurrency=3) as client:
+            return await asyncio.gather(*[client.Echo(body={'name': str(i)}) for i in range(12)])
+    assert len(asyncio.run(main())) == 12
+    assert state['peak'] == 3
+
+def test_sync_context_manager_is_refused(service):
+    client = AsyncClient(service(), transport=AsyncTransport())
+    with pytest.raises(TypeError):
+        with client:
+            pass
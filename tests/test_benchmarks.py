@@ -0,0 +1,50 @@
+import json, requests, lxml.etree
+from simplesoap import client
+from simplesoap.client import Client, WsdlParser
+from benchmarks import memory, suite, synthetic
+from benchmarks.server import Server
+
+def test_memory_is_measured(capsys):
+    results = memory.main(types=500, operations=20)
+    output = capsys.readouterr().out
+    assert '500 types, 20 operations' in output and 'now: type tree' in output and 'before' not in output
+    tree, snapshot = results['now']
+    assert tree > 0 and snapshot > 0
+    # the tree of a larger schema holds more
+    assert memory.measure(client, [lxml.etree.XML(synthetic.wsdl(types=2000, operations=20))])[0] > tree
+
+def test_an_unknown_baseline_is_reported(capsys):
+    results = memory.main('no-such-revision', types=50, operations=5)
+    assert 'before (no-such-revision): not available' in capsys.readouterr().out
+    assert list(results) == ['now']
+
+def test_synthetic_wsdls_are_reproducible():
+    assert synthetic.wsdl(types=30, operations=5, seed=1) == synthetic.wsdl(types=30, operations=5, seed=1)
+    assert synthetic.wsdl(types=30, operations=5, seed=1) != synthetic.wsdl(types=30, operations=5, seed=2)
+    calls = WsdlParser.get_soap_calls([lxml.etree.XML(synthetic.wsdl(types=30, operations=5))])
+    assert [call.name for call in calls] == ['Op{}'.format(i) for i in range(5)]
+
+def test_the_server_answers_every_operation():
+    with Server(types=20, operations=3, compress=True) as server:
+        assert requests.get(server.url + '?wsdl').content == server.wsdl
+        client = Client(server.url + '?wsdl')
+        for name in ('Op0', 'Op1', 'Op2'):
+            call = getattr(client, name)
+            assert call(body=synthetic.sample(call.input_body)) == call.parse_response(server.responses[call.SOAPAction])
+        assert server.requests == 3
+        response = requests.post(server.url, data=b'<x/>', headers={'SOAPAction': 'nope', 'Accept-Encoding': 'gzip'})
+        assert response.status_code == 404
+        response = requests.post(server.url, data=b'<x/>', headers={'SOAPAction': client.Op0.SOAPAction})
+        assert response.headers['Content-Encoding'] == 'gzip' and response.content == server.responses[client.Op0.SOAPAction]
+
+def test_the_suite_writes_its_results(tmp_path):
+    output = str(tmp_path / 'results.json')
+    document = suite.main(['--types', '20', '--operations', '3', '--calls', '20', '--concurrency', '1,2',
+                           '--repeat', '1', '--output', output])
+    with open(output) as f:
+        assert json.load(f) == json.loads(json.dumps(document))
+    names = {result['name'] for result in document['results']}
+    assert {'startup.cold', 'startup.snapshot', 'startup.shared', 'call.serialize', 'call.parse', 'call.parse_view',
+            'e2e.throughput', 'memory.startup.peak', 'memory.parse.peak'} <= names
+    assert [result['params']['errors'] for result in document['results'] if result['name'] == 'e2e.throughput'] == [0, 0]
+    assert document['meta']['knobs']['types'] == 20
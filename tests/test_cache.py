@@ -0,0 +1,164 @@
+import os, time, asyncio, threading, requests, pytest
+from simplesoap import cache
+from simplesoap.cache import WsdlCache
+from simplesoap.client import Client, AsyncClient, Fault
+from simplesoap.metrics import CallEvent
+from simplesoap.resilience import Policy, DeadlineExceeded
+from conftest import echo, fault, later
+
+class Response(object):
+    def __init__(self, status_code=200, content=b'', headers=None):
+        self.status_code, self.content, self.headers = status_code, content, headers or {}
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(self.status_code)
+
+class Session(object):
+    # answers every GET with `content`, after `delay` seconds
+    def __init__(self, content=b'<wsdl/>', delay=0, headers=None):
+        self.content, self.delay, self.headers = content, delay, headers
+        self.requests = []
+        self.lock = threading.Lock()
+    def get(self, url, headers=None, timeout=None):
+        with self.lock:
+            self.requests.append((url, headers))
+        time.sleep(self.delay)
+        return Response(200, self.content, self.headers)
+
+def files(directory):
+    return sorted(os.listdir(directory))
+
+def test_documents_are_fetched_once_and_served_from_disk(tmp_path):
+    session = Session()
+    wsdls = WsdlCache(str(tmp_path), session=session)
+    assert wsdls.get('http://a/service?wsdl') == b'<wsdl/>'
+    assert wsdls.get('http://a/service?wsdl') == b'<wsdl/>'
+    assert len(session.requests) == 1
+    assert wsdls.stats()['hits'] == 1 and wsdls.stats()['misses'] == 1
+
+def test_stale_documents_are_revalidated(tmp_path):
+    session = Session(headers={'ETag': '"1"'})
+    wsdls = WsdlCache(str(tmp_path), ttl=0, session=session)
+    wsdls.get('http://a/service?wsdl')
+    session.get = lambda url, headers=None, timeout=None: Response(304)
+    assert wsdls.get('http://a/service?wsdl') == b'<wsdl/>'
+    assert wsdls.stats()['revalidations'] == 1
+
+def test_no_lock_files_are_left(tmp_path):
+    wsdls = WsdlCache(str(tmp_path), ttl=0, session=Session())
+    for i in range(5):
+        wsdls.get('http://a/{}?wsdl'.format(i))
+        wsdls.get('http://a/{}?wsdl'.format(i))
+    assert not [name for name in files(str(tmp_path)) if name.endswith('.lock')]
+    assert len(files(str(tmp_path))) == 10 # documents and their .meta
+
+@pytest.mark.skipif(cache.fcntl is None, reason='no file locks')
+def test_one_fetch_for_concurrent_gets(tmp_path):
+    session = Session(delay=0.2)
+    wsdls = WsdlCache(str(tmp_path), session=session)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(wsdls.get('http://a/service?wsdl'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [b'<wsdl/>'] * 8
+    assert len(session.requests) == 1
+    assert not [name for name in files(str(tmp_path)) if name.endswith('.lock')]
+
+@pytest.mark.skipif(cache.fcntl is None, reason='no file locks')
+def test_the_lock_is_taken_again_when_its_file_was_removed(tmp_path):
+    filename = str(tmp_path / 'entry')
+    held = WsdlCache.Lock(filename).__enter__()
+    entered, locked = threading.Event(), []
+    def wait():
+        with WsdlCache.Lock(filename) as lock:
+            # the waiter locked the file that's at the path now
+            locked.append(os.path.samestat(os.fstat(lock.f.fileno()), os.stat(filename + '.lock')))
+            entered.set()
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    time.sleep(0.1)
+    assert not entered.is_set()
+    held.__exit__(None, None, None)
+    assert entered.wait(5)
+    waiter.join()
+    assert locked == [True]
+    assert not os.path.exists(filename + '.lock')
+
+def test_cached_responses_are_served_without_a_request(service, stub):
+    client = Client(service())
+    cache = client.cache('Echo')
+    assert client.Echo(body={'name': 'a'}) == client.Echo(body={'name': 'a'}) == {'name': 'echo'}
+    assert len(stub.requests) == 1 and cache.stats()['hits'] == 1
+    client.Echo(body={'name': 'b'})
+    assert len(stub.requests) == 2
+
+def test_concurrent_misses_send_one_request(service, stub):
+    stub.respond = later(0.3, (200, {}, echo()))
+    client = Client(service())
+    cache = client.cache('Echo')
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.Echo(body={'name': 'a'}))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [{'name': 'echo'}] * 5 and len(stub.requests) == 1
+    assert cache.stats()['merged'] == 4
+
+def test_misses_keep_to_the_deadline(service, stub):
+    stub.respond = later(1, (200, {}, echo()))
+    client = Client(service(), policy=Policy(deadline=0.3))
+    client.cache('Echo')
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        client.Echo(body={'name': 'a'})
+    assert time.monotonic() - start < 0.9
+    # and so does a call's own deadline
+    client.Echo.policy = None
+    with pytest.raises(DeadlineExceeded):
+        client.Echo(body={'name': 'a'}, deadline=0.3)
+
+def test_misses_are_retried_by_the_policy(service, stub):
+    answers = [(503, {}, b'busy'), (200, {}, echo())]
+    stub.respond = lambda request: answers.pop(0)
+    client = Client(service(), policy=Policy(retries=2, backoff=0.01))
+    client.cache('Echo')
+    assert client.Echo(body={'name': 'a'}) == {'name': 'echo'}
+    assert client.Echo(body={'name': 'a'}) == {'name': 'echo'}
+    assert len(stub.requests) == 2
+
+def test_misses_are_observed_and_hits_are_not(service, stub):
+    events = []
+    client = Client(service(), observers=[events.append])
+    client.cache('Echo')
+    client.Echo(body={'name': 'a'})
+    client.Echo(body={'name': 'a'})
+    calls = [event for event in events if isinstance(event, CallEvent)]
+    assert len(calls) == 1 and calls[0].error is None and calls[0].response_bytes == len(echo())
+
+def test_faults_are_raised_and_not_kept(service, stub):
+    stub.respond = lambda request: (500, {}, fault(string='refused'))
+    events = []
+    client = Client(service(), observers=[events.append])
+    client.cache('Echo')
+    for _ in range(2):
+        with pytest.raises(Fault):
+            client.Echo(body={'name': 'a'})
+    assert len(stub.requests) == 2
+    assert [type(event.error) for event in events if isinstance(event, CallEvent)] == [Fault, Fault]
+
+def test_async_misses_keep_to_the_deadline(service, stub):
+    stub.respond = later(1, (200, {}, echo()))
+    events = []
+    async def run():
+        async with AsyncClient(service(), policy=Policy(deadline=0.3), observers=[events.append]) as client:
+            client.cache('Echo')
+            with pytest.raises(DeadlineExceeded):
+                await client.Echo(body={'name': 'a'})
+            stub.respond = lambda request: (200, {}, echo())
+            assert await client.Echo(body={'name': 'a'}) == await client.Echo(body={'name': 'a'})
+    asyncio.run(run())
+    assert len(stub.requests) == 2
+    assert len([event for event in events if isinstance(event, CallEvent)]) == 2
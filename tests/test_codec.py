@@ -0,0 +1,97 @@
+import io, pickle, lxml.etree, decimal, datetime, warnings, importlib, dateutil.relativedelta, pytest
+from simplesoap import codec
+from simplesoap.client import Client, SOAP, WsdlParser
+from conftest import wsdl, envelope
+
+# a space separated list of ints, by itemType and by an inline item type
+LISTS = '''
+<xs:simpleType name="Ids"><xs:list itemType="xs:int"/></xs:simpleType>
+<xs:element name="EchoRequest">
+  <xs:complexType>
+    <xs:sequence>
+      <xs:element name="name" type="xs:string"/>
+      <xs:element name="ids" type="tns:Ids" minOccurs="0"/>
+      <xs:element name="days" minOccurs="0">
+        <xs:simpleType>
+          <xs:list><xs:simpleType><xs:restriction base="xs:date"><xs:minInclusive value="2000-01-01"/></xs:restriction></xs:simpleType></xs:list>
+        </xs:simpleType>
+      </xs:element>
+    </xs:sequence>
+  </xs:complexType>
+</xs:element>
+<xs:element name="EchoResponse">
+  <xs:complexType><xs:sequence><xs:element name="ids" type="tns:Ids" minOccurs="0"/></xs:sequence></xs:complexType>
+</xs:element>
+'''
+
+@pytest.mark.parametrize('type_, text, value', [
+    (int, '-5', -5),
+    (bool, 'true', True),
+    (decimal.Decimal, '1.50', decimal.Decimal('1.50')),
+    (datetime.date, '2020-01-02', datetime.date(2020, 1, 2)),
+    (datetime.datetime, '2020-01-02T03:04:05+00:00', datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)),
+    (datetime.time, '03:04:05', datetime.time(3, 4, 5)),
+    (dateutil.relativedelta.relativedelta, 'P1Y2M3DT4H5M6S',
+     dateutil.relativedelta.relativedelta(years=1, months=2, days=3, hours=4, minutes=5, seconds=6)),
+    (codec.HexBinary, '0AFF', b'\n\xff'),
+])
+def test_scalars_round_trip(type_, text, value):
+    assert codec.parsers[type_](text) == value
+    assert codec.formatter(type_)(value) == text
+
+def test_negative_durations():
+    assert codec.parse_duration('-P1D') == -dateutil.relativedelta.relativedelta(days=1)
+
+def test_binary_is_encoded_in_pieces():
+    content = bytes(range(256)) * 1000
+    pieces = list(codec.encode_binary(io.BytesIO(content), codec.Base64Binary, chunk_size=1000))
+    assert len(pieces) > 1
+    assert codec.parse_base64(''.join(pieces)) == content
+
+def test_columns():
+    assert codec.decode_column(['1', '', '3'], int) == [1, None, 3]
+    assert codec.encode_column([1, None, '3'], int) == ['1', None, '3']
+
+def test_lists():
+    assert codec.decode_list(' 1 2\n3 ', int) == [1, 2, 3]
+    assert codec.encode_list([1, 2, 3], int) == '1 2 3'
+    ints = codec.list_type(int)
+    assert issubclass(ints, codec.List) and ints.item is int and codec.list_type(int) is ints
+    assert codec.list_type(object) is codec.list_type(str)
+    assert pickle.loads(pickle.dumps(ints)) is ints
+
+def test_no_invalid_escapes():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        for module in ('simplesoap.codec', 'simplesoap.client'):
+            spec = importlib.util.find_spec(module)
+            compile(spec.loader.get_source(module), spec.origin, 'exec')
+
+def test_xs_list_fields_are_lists():
+    type_tree = WsdlParser.build_type_tree([lxml.etree.XML(wsdl('http://localhost/service', schema=LISTS))])
+    request = type_tree['{urn:simplesoap:test}EchoRequest']
+    assert request['ids'].type is codec.list_type(int)
+    assert request['days'].type is codec.list_type(datetime.date)
+    # the item type's facets aren't the list's
+    assert request['days'].restriction is None
+
+def test_xs_lists_are_sent_and_decoded(service, stub):
+    stub.respond = lambda request: (200, {}, envelope('<tns:EchoResponse><tns:ids>4 5 6</tns:ids></tns:EchoResponse>'))
+    call = Client(service(schema=LISTS)).Echo
+    content = call.build_envelope(body={'name': 'a', 'ids': [1, 2, 3], 'days': [datetime.date(2020, 1, 2)]})
+    assert b'>1 2 3<' in content and b'>2020-01-02<' in content
+    assert call(body={'name': 'a'}) == {'ids': [4, 5, 6]}
+    assert SOAP.parse(envelope('<tns:EchoResponse><tns:ids/></tns:EchoResponse>'), call.output_body) == {'ids': None}
+
+def test_xs_list_items_are_checked(service):
+    call = Client(service(schema=LISTS)).Echo
+    [result] = call.validate_many([{'name': 'a', 'ids': [1, 'x']}])
+    assert result.error.errors == ["EchoRequest/ids: [1, 'x'] does not satisfy value must be a valid list of integer"]
+
+def test_generated_client_handles_xs_lists(service, stub, generated):
+    stub.respond = lambda request: (200, {}, envelope('<tns:EchoResponse><tns:ids>4 5 6</tns:ids></tns:EchoResponse>'))
+    path = service(schema=LISTS)
+    call = generated(path).Client().Echo
+    body = {'name': 'a', 'ids': [1, 2, 3]}
+    assert call.build_envelope(body=body) == Client(path).Echo.build_envelope(body=body)
+    assert call(body={'name': 'a'}) == {'ids': [4, 5, 6]}
@@ -0,0 +1,81 @@
+import os, pickle, asyncio, lxml.etree, pytest
+from simplesoap import codegen
+from simplesoap.client import Client, WsdlParser
+from simplesoap.metrics import CallEvent, StartupEvent
+from benchmarks import synthetic
+from conftest import echo
+
+def c14n(content):
+    return lxml.etree.canonicalize(content.decode(), rewrite_prefixes=True)
+
+def test_a_struct_per_complex_type(service, generated):
+    module = generated(service())
+    assert module.Item.__slots__ == ('id', 'label') and module.EchoRequest._keys == ('name', 'count', 'tags', 'token')
+    item = module.Item(id=1)
+    assert not hasattr(item, '__dict__')
+    assert item.id == 1 and item.label is None and item == {'id': 1}
+    assert module.Item.of({'id': 2, 'other': 'x'}).to_dict() == {'id': 2, 'other': 'x'}
+    assert pickle.loads(pickle.dumps(item)) == item
+    with pytest.raises(AttributeError):
+        item.nope
+
+def test_calls_agree_with_the_generic_client(service, stub, generated):
+    path = service()
+    generic, module = Client(path), generated(path)
+    body = {'name': 'a', 'count': 2, 'tags': ['x', 'y']}
+    assert module.Client().Echo.build_envelope(body=body) == generic.Echo.build_envelope(body=body)
+    stub.respond = lambda request: (200, {}, echo(items=[(1, 'one'), (2, 'two')], next='n'))
+    result = module.Client().Echo(body=body)
+    assert isinstance(result, module.EchoResponse) and isinstance(result.item[0], module.Item)
+    assert result == generic.Echo(body=body)
+    assert stub.requests[0].body == stub.requests[1].body
+
+def test_synthetic_envelopes_agree(tmp_path, generated):
+    path = os.path.join(str(tmp_path), 'synthetic.wsdl')
+    with open(path, 'wb') as f:
+        f.write(synthetic.wsdl(types=10, operations=10))
+    module = generated(path, 'generated_synthetic')
+    calls = WsdlParser.get_soap_calls([lxml.etree.parse(path).getroot()])
+    client = module.Client()
+    for call in calls:
+        body = synthetic.sample(call.input_body, depth=2)
+        assert c14n(getattr(client, call.name).build_envelope(body=body)) == c14n(call.build_envelope(body=body)), call.name
+
+def test_the_calls_come_with_their_type_tree(service):
+    xmls = [lxml.etree.parse(service()).getroot()]
+    calls, type_tree = WsdlParser.get_soap_calls_and_types(xmls)
+    assert [call.name for call in calls] == [call.name for call in WsdlParser.get_soap_calls(xmls)]
+    assert all(any(node is call.input_body for node in type_tree.values()) for call in calls)
+
+def test_clients_start_without_the_wsdl(service, stub, generated):
+    path = service()
+    module = generated(path)
+    os.remove(path)
+    events = []
+    client = module.Client(observers=[events.append])
+    assert client.Echo(body={'name': 'a'}) == {'name': 'echo'}
+    assert isinstance(events[0], StartupEvent) and events[0].phases == {}
+    assert isinstance(events[1], CallEvent) and events[1].operation == 'Echo'
+    assert sorted(client._operations) == ['Echo', 'Lookup']
+
+def test_the_generic_machinery_uses_the_type_trees(service, stub, generated):
+    module = generated(service())
+    call = module.Client().Echo
+    body = {'name': 'a', 'tags': ['x']}
+    assert c14n(b''.join(call.build_envelope(body=body, stream=True))) == c14n(call.build_envelope(body=body))
+    stub.respond = lambda request: (200, {}, echo(items=[(i, 'x') for i in range(3)]))
+    assert [record['id'] for record in call.records(body=body)] == [0, 1, 2]
+    assert call(body=body, view=True)['item'][2]['id'] == 2
+
+def test_async_client(service, stub, generated):
+    module = generated(service())
+    async def run():
+        async with module.AsyncClient() as client:
+            return await client.Echo(body={'name': 'a'})
+    assert asyncio.run(run()) == {'name': 'echo'}
+
+def test_main_writes_to_stdout(service, capsys):
+    codegen.main([service()])
+    source = capsys.readouterr().out
+    assert source.startswith('# generated by python -m simplesoap.codegen')
+    compile(source, 'generated', 'exec')
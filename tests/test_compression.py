@@ -0,0 +1,82 @@
+import gzip, zlib, asyncio, lxml.etree, pytest
+from simplesoap.client import Client, AsyncClient
+from simplesoap.compression import Compression
+from simplesoap.metrics import CallEvent
+from conftest import echo, slowly
+
+BODY = {'name': 'a', 'tags': ['tag'] * 2000}
+
+def test_only_bodies_over_the_threshold_are_compressed():
+    compression = Compression(threshold=100)
+    assert compression.encode(b'x' * 99, {'A': 'b'}) == (b'x' * 99, {'A': 'b'})
+    data, headers = compression.encode(b'x' * 100, {'A': 'b'})
+    assert headers == {'A': 'b', 'Content-Encoding': 'gzip'} and gzip.decompress(data) == b'x' * 100
+    data, headers = Compression(threshold=0, encoding='deflate').encode(b'y' * 10, {})
+    assert headers['Content-Encoding'] == 'deflate' and zlib.decompress(data) == b'y' * 10
+
+def test_streamed_bodies_are_always_compressed():
+    data, headers = Compression(threshold=10**9).encode(iter([b'a' * 10, b'b' * 10]), {})
+    assert headers['Content-Encoding'] == 'gzip' and gzip.decompress(b''.join(data)) == b'a' * 10 + b'b' * 10
+
+def test_unknown_encodings_are_refused():
+    with pytest.raises(ValueError):
+        Compression(encoding='br')
+
+def test_requests_are_compressed_per_endpoint(service, stub):
+    client = Client(service())
+    client.compress(url='http://elsewhere/service')
+    client.Echo(body=BODY)
+    assert 'Content-Encoding' not in stub.requests[-1].headers
+    client.compress(threshold=1024)
+    client.Echo(body=BODY)
+    request = stub.requests[-1]
+    assert request.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(request.body) == client.Echo.build_envelope(body=BODY)
+    # small envelopes go as they are
+    client.Echo(body={'name': 'a'})
+    assert 'Content-Encoding' not in stub.requests[-1].headers
+    client.compress(compression=False)
+    client.Echo(body=BODY)
+    assert 'Content-Encoding' not in stub.requests[-1].headers
+
+def test_streamed_requests_are_compressed(service, stub):
+    client = Client(service())
+    client.compress(encoding='deflate')
+    client.Echo(body=BODY, stream=True)
+    request = stub.requests[-1]
+    assert request.headers['Content-Encoding'] == 'deflate' and request.headers['Transfer-Encoding'] == 'chunked'
+    sent, expected = zlib.decompress(request.body), client.Echo.build_envelope(body=BODY)
+    assert lxml.etree.canonicalize(sent.decode(), rewrite_prefixes=True) == \
+        lxml.etree.canonicalize(expected.decode(), rewrite_prefixes=True)
+
+def test_compressed_responses_are_decompressed_as_read(service, stub):
+    content = echo(items=[(i, 'x') for i in range(200)])
+    stub.respond = lambda request: (200, {'Content-Encoding': 'gzip'}, slowly(gzip.compress(content), pieces=5, delay=0.05))
+    client = Client(service())
+    assert len(client.Echo(body={'name': 'a'})['item']) == 200
+    assert 'gzip' in stub.requests[-1].headers['Accept-Encoding']
+    assert [record['id'] for record in client.Echo.records(body={'name': 'a'})] == list(range(200))
+
+def test_metrics_report_wire_and_raw_bytes(service, stub):
+    content = echo(items=[(i, 'x') for i in range(200)])
+    stub.respond = lambda request: (200, {'Content-Encoding': 'gzip'}, gzip.compress(content))
+    events = []
+    client = Client(service(), observers=[events.append])
+    client.compress(threshold=0)
+    client.Echo(body=BODY)
+    event = [event for event in events if isinstance(event, CallEvent)][-1]
+    assert event.request_bytes == len(client.Echo.build_envelope(body=BODY))
+    assert event.request_wire_bytes == len(stub.requests[-1].body) < event.request_bytes / 10
+    assert event.response_bytes == len(content)
+    assert event.response_wire_bytes == len(gzip.compress(content)) < event.response_bytes
+
+def test_async_compression(service, stub):
+    content = echo(items=[(i, 'x') for i in range(50)])
+    stub.respond = lambda request: (200, {'Content-Encoding': 'gzip'}, gzip.compress(content))
+    async def run():
+        async with AsyncClient(service()) as client:
+            client.compress(threshold=0)
+            return client.Echo.build_envelope(body=BODY), await client.Echo(body=BODY)
+    envelope, result = asyncio.run(run())
+    assert len(result['item']) == 50
+    assert gzip.decompress(stub.requests[-1].body) == envelope
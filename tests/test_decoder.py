@@ -0,0 +1,96 @@
+import io, time, asyncio, decimal, datetime, tracemalloc, lxml.etree, pytest
+from simplesoap.client import Client, AsyncClient, Decoder, SOAP, Node, Leaf
+from simplesoap.metrics import CallEvent
+from simplesoap.resilience import Policy, DeadlineExceeded
+from conftest import envelope, echo, slowly
+
+def types():
+    item = Node(None, id=Leaf(type=int), label=Leaf(type=str))
+    return Node(None, name=Leaf(type=str), count=Leaf(type=int), item=[item], next=Leaf(type=str))
+
+def test_responses_are_decoded_with_their_types(service, stub):
+    stub.respond = lambda request: (200, {}, echo(items=[(1, 'one'), (2, 'two')], next='n2'))
+    result = Client(service()).Echo(body={'name': 'a'})
+    assert result == {'name': 'echo', 'item': [{'id': 1, 'label': 'one'}, {'id': 2, 'label': 'two'}], 'next': 'n2'}
+
+def test_single_repeated_elements_are_lists():
+    result = SOAP.parse(echo(items=[(1, 'one')]), types())
+    assert result['item'] == [{'id': 1, 'label': 'one'}]
+
+def test_scalars_nil_and_attributes():
+    tree = Node(None, amount=Leaf(type=decimal.Decimal), at=Leaf(type=datetime.date), flag=Leaf(type=bool),
+                gone=Leaf(type=int), size=Leaf(type=int), note=Node(None, **{'@lang': Leaf(type=str)}))
+    tree['note'].type = str
+    payload = ('<tns:R xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"><tns:amount>1.50</tns:amount>'
+               '<tns:at>2020-01-02</tns:at><tns:flag>true</tns:flag><tns:gone xsi:nil="true"/><tns:size/>'
+               '<tns:note lang="en">hi</tns:note></tns:R>')
+    assert SOAP.parse(envelope(payload), tree) == {
+        'amount': decimal.Decimal('1.50'), 'at': datetime.date(2020, 1, 2), 'flag': True, 'gone': None, 'size': None,
+        'note': {'@lang': 'en', '#text': 'hi'}}
+
+def test_bare_payloads_and_trees():
+    payload = '<EchoResponse><name>a</name><count>3</count></EchoResponse>'
+    assert SOAP.parse(payload.encode(), types()) == {'name': 'a', 'count': 3}
+    assert SOAP.parse(lxml.etree.XML(echo(name='b')), types()) == {'name': 'b'}
+
+def test_headers_are_decoded():
+    content = envelope('<tns:EchoResponse><tns:name>a</tns:name></tns:EchoResponse>').replace(
+        b'<soapenv:Body>', b'<soapenv:Header><tns:Session><tns:id>7</tns:id></tns:Session></soapenv:Header><soapenv:Body>')
+    decoder = Decoder(types(), Node(None, id=Leaf(type=int)))
+    assert decoder.parse(content) == {'name': 'a'}
+    assert decoder.header == {'Session': {'id': 7}}
+
+def test_records_are_yielded_one_at_a_time():
+    content = echo(items=[(i, 'x') for i in range(5)], next='more')
+    decoder = Decoder(types(), records='item')
+    assert list(decoder.decode(content)) == [{'id': i, 'label': 'x'} for i in range(5)]
+    # the rest of the body is kept, without them
+    assert decoder.body == {'name': 'echo', 'next': 'more'}
+
+def test_records_are_decoded_while_the_response_is_read(service, stub):
+    content = echo(items=[(i, 'x') for i in range(200)])
+    stub.respond = lambda request: (200, {}, slowly(content, pieces=10, delay=0.1))
+    start = time.monotonic()
+    records = Client(service()).Echo.records(body={'name': 'a'})
+    assert next(records) == {'id': 0, 'label': 'x'}
+    assert time.monotonic() - start < 0.6
+    assert len(list(records)) == 199
+
+def test_records_go_through_the_policy_and_the_observers(service, stub):
+    answers = [(503, {}, b'busy'), (200, {}, echo(items=[(i, 'x') for i in range(3)]))]
+    stub.respond = lambda request: answers.pop(0)
+    events = []
+    client = Client(service(), policy=Policy(retries=1, backoff=0.01), observers=[events.append])
+    assert [record['id'] for record in client.Echo.records(body={'name': 'a'})] == [0, 1, 2]
+    assert len(stub.requests) == 2
+    assert [event.error is None for event in events if isinstance(event, CallEvent)] == [False, True]
+
+def test_records_keep_to_the_deadline(service, stub):
+    content = echo(items=[(i, 'x') for i in range(200)])
+    stub.respond = lambda request: (200, {}, slowly(content, pieces=10, delay=0.2))
+    records = Client(service(), policy=Policy(deadline=0.5)).Echo.records(body={'name': 'a'})
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        list(records)
+    assert time.monotonic() - start < 0.8
+
+def test_async_records(service, stub):
+    stub.respond = lambda request: (200, {}, echo(items=[(i, 'x') for i in range(3)]))
+    async def run():
+        async with AsyncClient(service()) as client:
+            return [record['id'] async for record in client.Echo.records(body={'name': 'a'})]
+    assert asyncio.run(run()) == [0, 1, 2]
+
+def test_memory_stays_flat_with_records():
+    content = echo(items=[(i, 'label %d' % i) for i in range(20000)])
+    tracemalloc.start()
+    try:
+        count = 0
+        for record in Decoder(types(), records='item').decode(io.BytesIO(content)):
+            count += 1
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert count == 20000
+    # neither the document nor the records are kept
+    assert peak < len(content) / 4
@@ -0,0 +1,73 @@
+import decimal, lxml.etree
+from simplesoap.client import Client, WsdlParser
+from conftest import TNS, wsdl, envelope
+
+# Special extends Named extends Base; Price is a decimal with a currency
+SCHEMA = '''
+<xs:complexType name="Base">
+  <xs:sequence><xs:element name="id" type="xs:int"/></xs:sequence>
+</xs:complexType>
+<xs:complexType name="Named">
+  <xs:complexContent>
+    <xs:extension base="tns:Base">
+      <xs:sequence><xs:element name="name" type="xs:string" minOccurs="0"/></xs:sequence>
+    </xs:extension>
+  </xs:complexContent>
+</xs:complexType>
+<xs:complexType name="Special">
+  <xs:complexContent>
+    <xs:extension base="tns:Named">
+      <xs:sequence><xs:element name="price" type="tns:Price" minOccurs="0"/></xs:sequence>
+    </xs:extension>
+  </xs:complexContent>
+</xs:complexType>
+<xs:complexType name="Price">
+  <xs:simpleContent>
+    <xs:extension base="xs:decimal"><xs:attribute name="currency" type="xs:string"/></xs:extension>
+  </xs:simpleContent>
+</xs:complexType>
+<xs:element name="EchoRequest">
+  <xs:complexType><xs:sequence><xs:element name="thing" type="tns:Special"/></xs:sequence></xs:complexType>
+</xs:element>
+<xs:element name="EchoResponse">
+  <xs:complexType><xs:sequence><xs:element name="thing" type="tns:Special" minOccurs="0"/></xs:sequence></xs:complexType>
+</xs:element>
+'''
+
+def types():
+    return WsdlParser.build_type_tree([lxml.etree.XML(wsdl('http://localhost/service', schema=SCHEMA))])
+
+def test_derived_types_hold_the_base_fields_first():
+    type_tree = types()
+    base, named, special = (type_tree['{%s}%s' % (TNS, name)] for name in ('Base', 'Named', 'Special'))
+    fields = lambda node: [k for k in node if k != '#namespace']
+    assert fields(special) == ['id', 'name', 'price'] and fields(named) == ['id', 'name']
+    assert special.inherited == {'id': base, 'name': named}
+    assert special['id'] is base['id']
+    # the base's occurs come along
+    assert special.occurs['id'].required and 'name' not in special.occurs
+
+def test_flattened_once():
+    special = types()['{%s}Special' % TNS]
+    fields, inherited = list(special.items()), special.inherited
+    special.flatten()
+    assert list(special.items()) == fields and special.inherited is inherited
+
+def test_simple_content_takes_the_base_type():
+    price = types()['{%s}Price' % TNS]
+    assert price.type is decimal.Decimal and list(price) == ['@currency']
+
+def test_derived_values_are_sent_and_decoded(service, stub):
+    stub.respond = lambda request: (200, {}, envelope(
+        '<tns:EchoResponse><tns:thing><tns:id>7</tns:id><tns:name>a</tns:name>'
+        '<tns:price currency="EUR">1.50</tns:price></tns:thing></tns:EchoResponse>'))
+    call = Client(service(schema=SCHEMA)).Echo
+    content = call.build_envelope(body={'thing': {'price': {'#text': decimal.Decimal('2'), '@currency': 'USD'}, 'id': 1}})
+    thing = lxml.etree.XML(content)[0][0][0]
+    assert [(child.tag, child.text) for child in thing] == [('{%s}id' % TNS, '1'), ('{%s}price' % TNS, '2')]
+    assert call(body={'thing': {'id': 1}}) == {
+        'thing': {'id': 7, 'name': 'a', 'price': {'@currency': 'EUR', '#text': decimal.Decimal('1.50')}}}
+
+def test_missing_base_fields_are_refused(service):
+    [result] = Client(service(schema=SCHEMA)).Echo.validate_many([{'thing': {'name': 'a'}}])
+    assert result.error.errors == ["EchoRequest/thing: missing required field 'id'"]
@@ -0,0 +1,67 @@
+import os, logging, pytest
+from simplesoap.client import Client, LazySoapCalls
+from benchmarks import synthetic
+
+@pytest.fixture
+def many(tmp_path):
+    # a WSDL of 200 operations over 50 types
+    path = os.path.join(str(tmp_path), 'many.wsdl')
+    with open(path, 'wb') as f:
+        f.write(synthetic.wsdl(types=50, operations=200))
+    return path
+
+def test_nothing_is_built_up_front(many):
+    client = Client(many, lazy=True)
+    templates = client._operations.templates
+    assert isinstance(templates, LazySoapCalls)
+    assert templates.soap_calls == {} and not templates.type_tree.built
+    assert len(templates) == 200 and 'Op199' in templates
+    # every operation is listed all the same
+    assert str(client).split('\n  ')[1:] == sorted('Op{}'.format(i) for i in range(200))
+    assert 'Op7' in dir(client)
+
+def test_operations_are_built_on_first_access_and_kept(many):
+    client = Client(many, lazy=True)
+    templates = client._operations.templates
+    call = client.Op3
+    assert list(templates.soap_calls) == ['Op3']
+    assert client.Op3 is call and templates['Op3'] is templates['Op3']
+    # only the types reachable from Op3's messages
+    built = templates.type_tree.built
+    assert '{%s}Op3Request' % synthetic.TNS in built and '{%s}Type3' % synthetic.TNS in built
+    assert '{%s}Op4Request' % synthetic.TNS not in built
+    assert len(built) < 50
+
+def test_lazy_and_eager_calls_agree(many):
+    eager, lazy = Client(many), Client(many, lazy=True)
+    for name in ('Op0', 'Op3', 'Op42', 'Op199'):
+        for tree in ('input_header', 'input_body', 'output_body', 'input_body_name'):
+            assert repr(getattr(getattr(lazy, name), tree)) == repr(getattr(getattr(eager, name), tree))
+        assert getattr(lazy, name).SOAPAction == getattr(eager, name).SOAPAction
+        assert getattr(lazy, name).url == getattr(eager, name).url
+        body = synthetic.sample(getattr(eager, name).input_body)
+        assert getattr(lazy, name).build_envelope(body=body) == getattr(eager, name).build_envelope(body=body)
+
+def test_unknown_operations_are_attribute_errors(many):
+    client = Client(many, lazy=True)
+    with pytest.raises(AttributeError):
+        client.Op200
+    assert not hasattr(client, 'Nope')
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_operations_hidden_by_client_attributes(service, stub, caplog, lazy):
+    operations = {'close': ('EchoRequest', 'EchoResponse'), 'Echo': ('EchoRequest', 'EchoResponse')}
+    with caplog.at_level(logging.WARNING, logger='simplesoap.client'):
+        client = Client(service(operations=operations), lazy=lazy)
+    assert "operation 'close' is hidden" in caplog.text and "'Echo'" not in caplog.text
+    assert client['close'](body={'name': 'a'}) == {'name': 'echo'}
+    assert client['Echo'] is client.Echo
+    with pytest.raises(KeyError):
+        client['Nope']
+
+def test_generated_clients_warn_alike(service, caplog, generated):
+    module = generated(service(operations={'cache': ('EchoRequest', 'EchoResponse')}))
+    with caplog.at_level(logging.WARNING, logger='simplesoap.client'):
+        client = module.Client()
+    assert "operation 'cache' is hidden" in caplog.text
+    assert client['cache'].name == 'cache'
@@ -0,0 +1,46 @@
+import os, logging, pytest
+from simplesoap.client import Client, WsdlLoader
+from conftest import SCHEMA, TNS
+
+ITEM = '''
+<xs:complexType name="Item">
+  <xs:sequence>
+    <xs:element name="id" type="xs:int"/>
+    <xs:element name="label" type="xs:string" minOccurs="0"/>
+  </xs:sequence>
+</xs:complexType>
+'''
+
+def write(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+    return path
+
+def schema(content, tns=TNS):
+    return ('<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" xmlns:tns="{0}" targetNamespace="{0}" '
+            'elementFormDefault="qualified">{1}</xs:schema>'.format(tns, content))
+
+@pytest.fixture
+def split(tmp_path, service):
+    # a service whose Item type is in an included schema, which includes one that isn't there
+    write(str(tmp_path / 'item.xsd'), schema('<xs:include schemaLocation="missing.xsd"/>' + ITEM))
+    return service(schema='<xs:include schemaLocation="item.xsd"/>' + SCHEMA.replace(ITEM, ''))
+
+def test_imports_are_followed(split, tmp_path):
+    loader = WsdlLoader()
+    documents = loader.load([split])
+    assert [os.path.basename(document.location) for document in documents] == ['service.wsdl', 'item.xsd']
+    assert list(loader.failed) == [str(tmp_path / 'missing.xsd')]
+
+def test_failed_imports_are_logged(split, tmp_path, caplog):
+    with caplog.at_level(logging.WARNING, logger='simplesoap.client'):
+        client = Client(split)
+    [record] = caplog.records
+    assert record.levelno == logging.WARNING
+    assert str(tmp_path / 'missing.xsd') in record.getMessage() and str(tmp_path / 'item.xsd') in record.getMessage()
+    # the rest loads all the same
+    assert client.Echo.output_body['item'][0]['id'].type is int
+
+def test_given_documents_must_load(tmp_path):
+    with pytest.raises(Exception):
+        WsdlLoader().load([str(tmp_path / 'nope.wsdl')])
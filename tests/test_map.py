@@ -0,0 +1,58 @@
+import time, asyncio, itertools
+from simplesoap.client import Client, AsyncClient, Fault
+from conftest import echo, fault
+
+def respond(request):
+    # echoes the name back, faults for 'bad', slower for low numbers
+    name = request.body.split(b'<ns0:name>')[1].split(b'</ns0:name>')[0].decode()
+    if name == 'bad':
+        return 500, {}, fault(string='bad name')
+    if name.isdigit():
+        time.sleep(0.01 * (10 - int(name) % 10))
+    return 200, {}, echo(name=name)
+
+def test_ordered_results(service, stub):
+    stub.respond = respond
+    results = list(Client(service()).Echo.map([{'name': str(i)} for i in range(20)], workers=5))
+    assert [r.index for r in results] == list(range(20))
+    assert [r.result['name'] for r in results] == [str(i) for i in range(20)]
+    assert all(r.error is None for r in results)
+
+def test_unordered_results_come_as_they_complete(service, stub):
+    stub.respond = respond
+    results = list(Client(service()).Echo.map([{'name': str(i)} for i in range(10)], workers=10, ordered=False))
+    assert sorted(r.index for r in results) == list(range(10))
+    # the slowest (0) isn't waited for before the others
+    assert results[0].index != 0
+    assert all(r.result['name'] == r.body['name'] for r in results)
+
+def test_errors_are_returned_per_item(service, stub):
+    stub.respond = respond
+    bodies = [{'name': 'a'}, {'name': 'bad'}, {'name': 'c'}]
+    results = list(Client(service()).Echo.map(bodies, workers=2))
+    assert [r.result for r in results] == [{'name': 'a'}, None, {'name': 'c'}]
+    assert isinstance(results[1].error, Fault)
+    assert results[1].body is bodies[1]
+
+def test_bodies_are_pulled_as_results_are_consumed(service, stub):
+    pulled = itertools.count()
+    def bodies():
+        for i in range(1000):
+            next(pulled)
+            yield {'name': 'a'}
+    results = Client(service()).Echo.map(bodies(), workers=2, backlog=4)
+    for _ in range(3):
+        next(results)
+    results.close()
+    # a few results plus the backlog, not the thousand bodies
+    assert next(pulled) <= 3 + 4 + 1
+
+def test_async_map(service, stub):
+    stub.respond = respond
+    async def main():
+        async with AsyncClient(service()) as client:
+            return [r async for r in client.Echo.map([{'name': 'a'}, {'name': 'bad'}, {'name': 'c'}], workers=2)]
+    results = asyncio.run(main())
+    assert [r.index for r in results] == [0, 1, 2]
+    assert results[0].result == {'name': 'a'} and results[2].result == {'name': 'c'}
+    assert isinstance(results[1].error, Fault)
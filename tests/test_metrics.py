@@ -0,0 +1,77 @@
+import asyncio, pytest
+from simplesoap import metrics
+from simplesoap.client import Client, AsyncClient, Fault
+from simplesoap.metrics import Metrics, Histogram, CallEvent, StartupEvent
+from conftest import echo, fault, later
+
+def test_histograms():
+    histogram = Histogram()
+    assert histogram.quantile(0.5) is None
+    for seconds in (0.0002, 0.003, 0.003, 0.2, 40):
+        histogram.add(seconds)
+    summary = histogram.summary()
+    assert summary['count'] == 5 and summary['sum'] == pytest.approx(40.2062)
+    assert summary['p50'] == 0.005 and summary['p90'] == float('inf')
+    assert summary['buckets'][0.0005] == 1 and summary['buckets'][0.25] == 1
+
+def test_startup_phases_are_reported(service):
+    events = []
+    first = Client(service(), observers=[events.append])
+    [event] = events
+    assert isinstance(event, StartupEvent)
+    assert list(event.phases)[0] == 'fetch' and 'build_type_tree' in event.phases
+    assert event.total >= sum(event.phases.values()) * 0.99
+    # a client sharing the calls built already only fetched
+    Client(service(), observers=[events.append])
+    assert list(events[1].phases) == ['fetch']
+
+def test_calls_are_reported_by_phase(service, stub):
+    stub.respond = later(0.2, (200, {}, echo(items=[(1, 'one')])))
+    events = []
+    client = Client(service(), observers=[events.append])
+    client.Echo(body={'name': 'a'})
+    event = events[-1]
+    assert isinstance(event, CallEvent) and event.operation == 'Echo' and event.url == client.Echo.url
+    assert event.error is None
+    assert event.network >= 0.2 and event.serialize < event.network and event.parse < event.network
+    assert event.total >= event.serialize + event.network + event.parse
+    assert event.request_bytes == len(stub.requests[-1].body)
+    assert event.response_bytes == len(echo(items=[(1, 'one')]))
+
+def test_failed_calls_are_reported(service, stub):
+    stub.respond = lambda request: (500, {}, fault())
+    events = []
+    client = Client(service(), observers=[events.append])
+    with pytest.raises(Fault):
+        client.Echo(body={'name': 'a'})
+    assert isinstance(events[-1].error, Fault)
+
+def test_metrics_sum_up_the_events(service, stub):
+    collected = Metrics()
+    client = Client(service(), observers=[collected])
+    for _ in range(3):
+        client.Echo(body={'name': 'a'})
+    stub.respond = lambda request: (500, {}, fault())
+    with pytest.raises(Fault):
+        client.Echo(body={'name': 'a'})
+    summary = collected.summary()
+    stats = summary['calls']['Echo', client.Echo.url]
+    assert stats['count'] == 4 and stats['errors'] == {'Fault': 1} and stats['error_rate'] == 0.25
+    assert stats['phases']['total']['count'] == 4
+    assert stats['request_wire_bytes'] == stats['request_bytes'] > 0
+    assert summary['startup']['total']['count'] == 1
+    collected.clear()
+    assert collected.summary() == {'calls': {}, 'startup': {}}
+
+def test_async_calls_are_reported(service, stub):
+    events = []
+    async def run():
+        async with AsyncClient(service(), observers=[events.append]) as client:
+            await client.Echo(body={'name': 'a'})
+    asyncio.run(run())
+    event = events[-1]
+    assert isinstance(event, CallEvent) and event.error is None and event.network is not None
+
+def test_meters_count_bytes():
+    meter = metrics.IterMeter([b'ab', b'cde'])
+    assert b''.join(meter) == b'abcde' and meter.bytes == 5
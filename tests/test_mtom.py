@@ -0,0 +1,82 @@
+import io, os, asyncio, base64, pytest
+from simplesoap import mtom
+from simplesoap.client import Client, AsyncClient
+from conftest import envelope
+
+SCHEMA = '''
+<xs:element name="EchoRequest">
+  <xs:complexType>
+    <xs:sequence>
+      <xs:element name="data" type="xs:base64Binary"/>
+      <xs:element name="digest" type="xs:hexBinary" minOccurs="0"/>
+    </xs:sequence>
+  </xs:complexType>
+</xs:element>
+<xs:element name="EchoResponse">
+  <xs:complexType>
+    <xs:sequence>
+      <xs:element name="data" type="xs:base64Binary" minOccurs="0"/>
+      <xs:element name="digest" type="xs:hexBinary" minOccurs="0"/>
+    </xs:sequence>
+  </xs:complexType>
+</xs:element>
+'''
+CONTENT = os.urandom(300000)
+BOUNDARY = 'MIMEBoundary_a1b2'
+
+def multipart(attachment=CONTENT):
+    # an MTOM response whose data is an attachment
+    root = envelope('<tns:EchoResponse><tns:data><xop:Include xmlns:xop="http://www.w3.org/2004/08/xop/include" '
+                    'href="cid:data%40example"/></tns:data><tns:digest>0AFF</tns:digest></tns:EchoResponse>')
+    body = (b'--' + BOUNDARY.encode() + b'\r\nContent-Type: application/xop+xml; type="text/xml"\r\n'
+            b'Content-ID: <root@example>\r\n\r\n' + root +
+            b'\r\n--' + BOUNDARY.encode() + b'\r\nContent-Type: application/octet-stream\r\n'
+            b'Content-ID: <data@example>\r\n\r\n' + attachment + b'\r\n--' + BOUNDARY.encode() + b'--\r\n')
+    content_type = 'multipart/related; type="application/xop+xml"; boundary="{}"; start="<root@example>"'.format(BOUNDARY)
+    return body, content_type
+
+def test_binary_values_are_sent_encoded(service):
+    call = Client(service(schema=SCHEMA)).Echo
+    content = call.build_envelope(body={'data': b'\x00\x01binary', 'digest': b'\n\xff'})
+    assert base64.b64encode(b'\x00\x01binary') in content and b'>0AFF<' in content
+    # files are read in pieces, and give the same text as their bytes
+    from_file = call.build_envelope(body={'data': io.BytesIO(CONTENT)})
+    assert from_file == call.build_envelope(body={'data': CONTENT})
+    streamed = b''.join(call.build_envelope(body={'data': io.BytesIO(CONTENT)}, stream=True))
+    assert base64.b64encode(CONTENT) in streamed
+
+def test_inline_binary_is_decoded(service, stub):
+    stub.respond = lambda request: (200, {}, envelope(
+        '<tns:EchoResponse><tns:data>{}</tns:data></tns:EchoResponse>'.format(base64.b64encode(b'abc').decode())))
+    assert Client(service(schema=SCHEMA)).Echo(body={'data': b''}) == {'data': b'abc'}
+
+@pytest.mark.parametrize('chunk_size', [7, 1000, 2**16])
+def test_parts_are_split_whatever_the_chunks(chunk_size):
+    body, content_type = multipart()
+    root, attachments = mtom.parse(io.BytesIO(body), content_type, chunk_size=chunk_size, spool_size=2**10)
+    assert root.read().startswith(b'<?xml') and list(attachments) == ['data@example']
+    assert attachments['data@example'].read() == CONTENT
+    # beyond spool_size parts are on disk
+    assert attachments['data@example']._rolled
+
+def test_truncated_bodies_are_refused():
+    body, content_type = multipart()
+    with pytest.raises(ValueError):
+        mtom.parse(body[:len(body) // 2], content_type)
+
+def test_attachments_are_files_in_results(service, stub):
+    body, content_type = multipart()
+    stub.respond = lambda request: (200, {'Content-Type': content_type}, body)
+    call = Client(service(schema=SCHEMA)).Echo
+    result = call(body={'data': b'x'})
+    assert result['data'].read() == CONTENT and result['digest'] == b'\n\xff'
+    view = call(body={'data': b'x'}, view=True)
+    assert view['data'].read() == CONTENT
+
+def test_async_attachments(service, stub):
+    body, content_type = multipart()
+    stub.respond = lambda request: (200, {'Content-Type': content_type}, body)
+    async def run():
+        async with AsyncClient(service(schema=SCHEMA)) as client:
+            return await client.Echo(body={'data': b'x'})
+    assert asyncio.run(run())['data'].read() == CONTENT
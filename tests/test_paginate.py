@@ -0,0 +1,99 @@
+import re, time, asyncio, pytest
+from simplesoap.client import Client, AsyncClient, Cursor, Fault, SOAP
+from simplesoap.metrics import CallEvent
+from simplesoap.resilience import Policy, DeadlineExceeded
+from conftest import echo, fault, slowly
+
+CURSOR = Cursor('next', request='token')
+
+def paged(count=3, size=4, answer=None):
+    # respond() for a query of `count` pages of `size` items, the token being
+    # the next page's number. answer(page, content) -> what to respond instead
+    def respond(request):
+        token = re.search(rb'token>(\d+)<', request.body)
+        page = int(token.group(1)) if token else 0
+        content = echo(items=[(page * size + i, 'x') for i in range(size)], next=page + 1 if page + 1 < count else None)
+        return answer(page, content) if answer is not None else (200, {}, content)
+    return respond
+
+def ids(records):
+    return [record['id'] for record in records]
+
+def test_records_of_every_page_in_order(service, stub):
+    stub.respond = paged()
+    assert ids(Client(service()).Echo.paginate(CURSOR, body={'name': 'a'})) == list(range(12))
+    tokens = [re.search(rb'token>(\d+)<', request.body) for request in stub.requests]
+    assert [token and token.group(1) for token in tokens] == [None, b'1', b'2']
+
+def test_records_are_yielded_while_the_page_is_read(service, stub):
+    stub.respond = paged(count=1, size=200, answer=lambda page, content: (200, {}, slowly(content, pieces=10, delay=0.1)))
+    start = time.monotonic()
+    records = Client(service()).Echo.paginate(CURSOR, body={'name': 'a'})
+    assert next(records)['id'] == 0
+    assert time.monotonic() - start < 0.6
+    assert len(list(records)) == 199
+
+def test_prefetch_is_bounded(service, stub):
+    stub.respond = paged(count=5)
+    records = Client(service()).Echo.paginate(CURSOR, body={'name': 'a'}, prefetch=1)
+    next(records)
+    time.sleep(0.3)
+    # the page being consumed and the one after it
+    assert len(stub.requests) == 2
+    assert ids(records) == list(range(1, 20))
+
+def test_pages_go_through_the_policy(service, stub):
+    failed = []
+    def answer(page, content):
+        if page == 1 and not failed:
+            failed.append(page)
+            return 503, {}, b'busy'
+        return 200, {}, content
+    stub.respond = paged(answer=answer)
+    client = Client(service(), policy=Policy(retries=2, backoff=0.01))
+    assert ids(client.Echo.paginate(CURSOR, body={'name': 'a'})) == list(range(12))
+    assert len(stub.requests) == 4
+
+def test_pages_keep_to_the_deadline(service, stub):
+    def answer(page, content):
+        time.sleep(1 if page else 0)
+        return 200, {}, content
+    stub.respond = paged(answer=answer)
+    records = Client(service(), policy=Policy(deadline=0.5)).Echo.paginate(CURSOR, body={'name': 'a'})
+    assert ids(next(records) for _ in range(4)) == [0, 1, 2, 3]
+    with pytest.raises(DeadlineExceeded):
+        next(records)
+
+def test_pages_are_observed(service, stub):
+    stub.respond = paged()
+    events = []
+    client = Client(service(), observers=[events.append])
+    assert len(list(client.Echo.paginate(CURSOR, body={'name': 'a'}))) == 12
+    calls = [event for event in events if isinstance(event, CallEvent)]
+    assert len(calls) == 3 and all(call.error is None and call.response_bytes for call in calls)
+
+def test_faults_are_raised_where_their_page_would_be(service, stub):
+    stub.respond = paged(answer=lambda page, content: (500, {}, fault(string='gone')) if page == 2 else (200, {}, content))
+    records = Client(service()).Echo.paginate(CURSOR, body={'name': 'a'})
+    assert ids(next(records) for _ in range(8)) == list(range(8))
+    with pytest.raises(Fault) as error:
+        next(records)
+    assert error.value.faultstring == 'gone'
+
+def test_repeated_attempts_emit_each_record_once(service):
+    call = Client(service()).Echo
+    emitted = []
+    receive = call.pager(SOAP.find_repeated(call.output_body), emitted.append)
+    content = echo(items=[(i, 'x') for i in range(3)], next='n')
+    for _ in range(2):
+        assert receive(200, {}, content, lambda: None, False) == {'name': 'echo', 'next': 'n'}
+    assert ids(emitted) == [0, 1, 2]
+
+def test_async_records_of_every_page(service, stub):
+    stub.respond = paged()
+    events = []
+    async def run():
+        async with AsyncClient(service(), policy=Policy(retries=1), observers=[events.append]) as client:
+            return [record async for record in client.Echo.paginate(CURSOR, body={'name': 'a'})]
+    assert ids(asyncio.run(run())) == list(range(12))
+    assert len([event for event in events if isinstance(event, CallEvent)]) == 3
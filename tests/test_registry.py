@@ -0,0 +1,50 @@
+import gc, threading
+from simplesoap.client import Client, Registry, Transport
+
+def test_clients_of_the_same_wsdls_share_their_calls(service):
+    path = service()
+    first, second = Client(path), Client(path, transport=Transport())
+    assert first._operations.templates is second._operations.templates
+    assert first.Echo is not second.Echo
+    assert first.Echo.input_body is second.Echo.input_body and first.Echo.output_body is second.Echo.output_body
+    assert first.Echo.transport is first.transport and second.Echo.transport is second.transport
+
+def test_per_client_state_stays_per_client(service):
+    path = service()
+    first, second = Client(path), Client(path)
+    first.Echo.url = 'http://elsewhere/service'
+    assert second.Echo.url != first.Echo.url
+    assert Client(path).Echo.url == second.Echo.url
+
+def test_built_once_for_concurrent_clients(service, monkeypatch):
+    path = service()
+    builds = []
+    build = Client.build
+    def counted(*args, **kwargs):
+        builds.append(1)
+        return build(*args, **kwargs)
+    monkeypatch.setattr(Client, 'build', staticmethod(counted))
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(Client(path, snapshot=False))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(clients) == 8 and len(builds) == 1
+    assert len({id(c._operations.templates) for c in clients}) == 1
+
+def test_unshared_and_lazy_clients_build_their_own(service):
+    path = service()
+    shared = Client(path)
+    assert Client(path, shared=False)._operations.templates is not shared._operations.templates
+    lazy = Client(path, lazy=True)
+    assert lazy._operations.templates is not shared._operations.templates
+    assert Client(path, lazy=True)._operations.templates is lazy._operations.templates
+
+def test_released_with_the_last_client(service):
+    path = service()
+    clients = [Client(path), Client(path)]
+    assert len(Registry.templates) == 1
+    del clients
+    gc.collect()
+    assert len(Registry.templates) == 0
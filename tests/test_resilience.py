@@ -0,0 +1,102 @@
+import time, asyncio, requests, pytest
+from simplesoap.client import Client, AsyncClient, Transport, Fault
+from simplesoap.resilience import Policy, CircuitBreaker, CircuitOpen, DeadlineExceeded
+from conftest import echo, fault, slowly, later
+
+def test_503s_are_retried_and_faults_are_not(service, stub):
+    answers = [(503, {}, b'busy'), (503, {}, b'busy'), (200, {}, echo())]
+    stub.respond = lambda request: answers.pop(0)
+    client = Client(service(), policy=Policy(retries=2, backoff=0.01))
+    assert client.Echo(body={'name': 'a'}) == {'name': 'echo'}
+    assert len(stub.requests) == 3
+    stub.respond = lambda request: (500, {}, fault())
+    with pytest.raises(Fault):
+        client.Echo(body={'name': 'a'})
+    assert len(stub.requests) == 4
+
+def test_the_deadline_bounds_a_trickling_body(service, stub):
+    stub.respond = lambda request: (200, {}, slowly(echo(items=[(i, 'x') for i in range(50)]), pieces=10, delay=0.2))
+    client = Client(service(), policy=Policy(deadline=0.5))
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        client.Echo(body={'name': 'a'})
+    assert time.monotonic() - start < 0.8
+    # and so does a call's own, without a policy
+    client.Echo.policy = None
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        client.Echo(body={'name': 'a'}, deadline=0.5)
+    assert time.monotonic() - start < 0.8
+    # the cut connections aren't reused
+    stub.respond = lambda request: (200, {}, echo())
+    assert client.Echo(body={'name': 'a'}) == {'name': 'echo'}
+
+def test_body_read_timeouts_are_requests_timeouts(service, stub):
+    stub.respond = lambda request: (200, {}, slowly(echo(), pieces=2, delay=0.5))
+    client = Client(service(), transport=Transport(timeout=0.2))
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client.Echo(body={'name': 'a'})
+    # which the policy retries
+    client.Echo.policy = Policy(retries=1, backoff=0.01)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client.Echo(body={'name': 'a'})
+    assert len(stub.requests) == 3
+
+def test_the_circuit_opens_and_a_fault_closes_it(service, stub):
+    stub.respond = lambda request: (503, {}, b'busy')
+    policy = Policy(failure_threshold=2, reset_timeout=0.2)
+    client = Client(service(), policy=policy)
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            client.Echo(body={'name': 'a'})
+    with pytest.raises(CircuitOpen):
+        client.Echo(body={'name': 'a'})
+    assert len(stub.requests) == 2
+    time.sleep(0.25)
+    # the trial is answered: the endpoint is up
+    stub.respond = lambda request: (500, {}, fault())
+    with pytest.raises(Fault):
+        client.Echo(body={'name': 'a'})
+    assert policy.circuit(client.Echo.url).state == 'closed'
+
+def test_a_trial_failing_locally_doesnt_keep_the_circuit_open():
+    policy = Policy(failure_threshold=1, reset_timeout=0.1)
+    def unavailable(timeout):
+        raise requests.ConnectionError('down')
+    with pytest.raises(requests.ConnectionError):
+        policy.run('Echo', 'url', unavailable)
+    time.sleep(0.15)
+    def broken(timeout):
+        raise ValueError('not sent')
+    with pytest.raises(ValueError):
+        policy.run('Echo', 'url', broken)
+    # the next call is the trial, not refused
+    assert policy.run('Echo', 'url', lambda timeout: 'ok') == 'ok'
+    assert policy.circuit('url').state == 'closed'
+
+def test_only_one_trial_at_a_time():
+    breaker = CircuitBreaker('url', threshold=1, reset_timeout=0)
+    assert breaker.check() is False
+    breaker.failure()
+    assert breaker.check() is True
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+    breaker.end_trial()
+    assert breaker.check() is True
+
+def test_async_deadline_and_trial(service, stub):
+    stub.respond = later(1, (200, {}, echo()))
+    policy = Policy(deadline=0.3, failure_threshold=1, reset_timeout=0.2)
+    async def run():
+        async with AsyncClient(service(), policy=policy) as client:
+            with pytest.raises(DeadlineExceeded):
+                await client.Echo(body={'name': 'a'})
+            with pytest.raises(CircuitOpen):
+                await client.Echo(body={'name': 'a'})
+            await asyncio.sleep(0.25)
+            stub.respond = lambda request: (500, {}, fault())
+            with pytest.raises(Fault):
+                await client.Echo(body={'name': 'a'})
+            return client.Echo.url
+    url = asyncio.run(run())
+    assert policy.circuit(url).state == 'closed'
@@ -0,0 +1,75 @@
+import lxml.etree, pytest
+from simplesoap.client import Client, WsdlParser, SchemaIndex, Node, Leaf, Fault
+from conftest import SCHEMA, TNS, wsdl, fault
+
+ERROR = '''
+<xs:element name="EchoError">
+  <xs:complexType>
+    <xs:sequence>
+      <xs:element name="code" type="xs:int"/>
+      <xs:element name="reason" type="xs:string" minOccurs="0"/>
+    </xs:sequence>
+  </xs:complexType>
+</xs:element>
+'''
+FAULTS = {'Echo': ('EchoFault', 'EchoError')}
+
+def xmls(**options):
+    return [lxml.etree.XML(wsdl('http://localhost/service', **options))]
+
+def test_index_names_parents_and_namespaces():
+    schema = lxml.etree.XML('''
+    <xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" targetNamespace="urn:a">
+      <xs:complexType name="Outer">
+        <xs:sequence>
+          <xs:element name="inner">
+            <xs:complexType><xs:sequence><xs:element name="leaf" type="xs:string" form="qualified"/></xs:sequence></xs:complexType>
+          </xs:element>
+        </xs:sequence>
+      </xs:complexType>
+    </xs:schema>''')
+    index = SchemaIndex([schema])
+    outer, inner, leaf = index.findall('xs:complexType', 'name') + index.findall('xs:element')
+    assert index.qualname(inner) == '{urn:a}Outer/{urn:a}inner'
+    assert index.qualname(leaf) == '{urn:a}Outer/{urn:a}inner/{urn:a}leaf'
+    assert index.parent(leaf) is inner and index.parent(inner) is outer and index.parent(outer) is None
+    # unqualified local elements have no namespace, unless form says otherwise
+    assert index.namespace(outer) == 'urn:a'
+    assert index.namespace(inner) is None
+    assert index.namespace(leaf) == 'urn:a'
+
+def test_wsdl_elements_are_not_types():
+    type_tree = WsdlParser.build_type_tree(xmls(schema=SCHEMA + ERROR, faults=FAULTS))
+    assert not [k for k in type_tree if k.startswith('{None}')]
+    assert '{%s}EchoFault' % TNS not in type_tree
+    assert not [k for k in type_tree if 'TestPortType' in k or 'TestBinding' in k]
+    assert isinstance(type_tree['{%s}EchoError' % TNS], Node)
+
+def test_faults_are_resolved_in_the_target_namespace():
+    documents = xmls(schema=SCHEMA + ERROR, faults=FAULTS)
+    calls = {call.name: call for call in WsdlParser.get_soap_calls(documents)}
+    element, type_ = calls['Echo'].faults['{%s}EchoFault' % TNS]
+    assert element == '{%s}EchoError' % TNS
+    assert isinstance(type_['code'], Leaf) and type_['code'].type is int
+    assert calls['Lookup'].faults is None
+
+def test_fault_details_are_decoded_with_their_type(service, stub):
+    detail = '<tns:EchoError><tns:code>7</tns:code><tns:reason>closed</tns:reason></tns:EchoError>'
+    stub.respond = lambda request: (500, {}, fault(string='refused', detail=detail))
+    client = Client(service(schema=SCHEMA + ERROR, faults=FAULTS))
+    with pytest.raises(Fault) as error:
+        client.Echo(body={'name': 'a'})
+    assert error.value.faultstring == 'refused'
+    assert error.value.detail == {'EchoError': {'code': 7, 'reason': 'closed'}}
+    # operations without declared faults keep them as text
+    with pytest.raises(Fault) as error:
+        client.Lookup(body={'name': 'a'})
+    assert error.value.detail == {'EchoError': {'code': '7', 'reason': 'closed'}}
+
+def test_generated_client_decodes_faults_alike(service, stub, generated):
+    detail = '<tns:EchoError><tns:code>7</tns:code></tns:EchoError>'
+    stub.respond = lambda request: (500, {}, fault(string='refused', detail=detail))
+    module = generated(service(schema=SCHEMA + ERROR, faults=FAULTS))
+    with pytest.raises(Fault) as error:
+        module.Client().Echo(body={'name': 'a'})
+    assert error.value.detail == {'EchoError': {'code': 7}}
@@ -0,0 +1,65 @@
+import copy, decimal, lxml.etree, pytest
+from simplesoap.client import Client, Serializer, WsdlParser, Node, Leaf
+from benchmarks import synthetic, serializer
+from conftest import TNS
+
+def c14n(content):
+    return lxml.etree.canonicalize(content.decode(), rewrite_prefixes=True)
+
+def payload(content):
+    # the body's payload element of an envelope
+    return lxml.etree.XML(content)[0][0]
+
+def shape(elem):
+    # what's inside elem, without elem itself
+    return [(e.tag, e.text, dict(e.attrib)) for e in elem.iter()][1:]
+
+def test_fields_are_written_in_schema_order(service):
+    content = Client(service()).Echo.build_envelope(body={'tags': ['x', 'y'], 'count': 3, 'name': 'a'})
+    request = payload(content)
+    assert request.tag == '{%s}EchoRequest' % TNS
+    assert [(child.tag, child.text) for child in request] == [
+        ('{%s}name' % TNS, 'a'), ('{%s}count' % TNS, '3'), ('{%s}tags' % TNS, 'x'), ('{%s}tags' % TNS, 'y')]
+
+def test_attributes_text_and_nil():
+    price = Node(None, **{'#text': Leaf(type=decimal.Decimal), '@currency': Leaf(type=str)})
+    body = Node(None, price=price, note=Leaf(type=str))
+    content = Serializer(body_tree=body, body_name='Order').envelope(
+        body={'price': {'#text': decimal.Decimal('1.50'), '@currency': 'EUR'}, 'note': None})
+    order = payload(content)
+    assert order[0].tag == 'price' and order[0].get('currency') == 'EUR' and order[0].text == '1.50'
+    assert order[1].get('{http://www.w3.org/2001/XMLSchema-instance}nil') == 'true'
+
+def test_unknown_fields_are_refused(service):
+    with pytest.raises(ValueError) as error:
+        Client(service()).Echo.build_envelope(body={'name': 'a', 'nope': 1})
+    assert 'nope' in str(error.value)
+
+def test_the_plan_is_compiled_once_and_shared(service):
+    path = service()
+    first, second = Client(path), Client(path)
+    assert first.Echo.serializer is second.Echo.serializer
+    assert first.Echo.serializer is first.Echo.serializer
+
+def test_the_type_tree_is_never_copied(service, monkeypatch):
+    call = Client(service()).Echo
+    before = repr(call.input_body)
+    call.build_envelope(body={'name': 'a'})
+    def refused(*args):
+        raise AssertionError('copied')
+    monkeypatch.setattr(copy, 'deepcopy', refused)
+    call.build_envelope(body={'name': 'b', 'count': 1, 'tags': ['x']})
+    assert repr(call.input_body) == before
+
+def test_stream_writes_the_same_envelope(service):
+    call = Client(service()).Echo
+    body = {'name': 'a', 'count': 2, 'tags': ['x', 'y']}
+    assert c14n(b''.join(call.build_envelope(body=body, stream=True))) == c14n(call.build_envelope(body=body))
+
+def test_same_envelopes_as_the_previous_path():
+    xmls = [lxml.etree.XML(synthetic.wsdl(types=10, operations=10))]
+    for call in WsdlParser.get_soap_calls(xmls):
+        body = synthetic.sample(call.input_body, depth=2)
+        # the previous path wrote the payload's content straight into the Body
+        expected = lxml.etree.XML(serializer.legacy_envelope(call, body))[0]
+        assert shape(payload(call.build_envelope(body=body))) == shape(expected), call.name
@@ -0,0 +1,111 @@
+import os, stat, pickle, logging, pytest
+from simplesoap import client
+from simplesoap.client import Client, Snapshot
+
+planted = []
+
+class Planted(object):
+    # what unpickling a planted snapshot would run
+    def __reduce__(self):
+        return (planted.append, ('ran',))
+
+def startup(path):
+    events = []
+    client.Registry.clear()
+    Client(path, observers=[events.append])
+    return events[0].phases
+
+def snapshots():
+    return [name for name in os.listdir(Snapshot.directory) if name.endswith('.pickle')]
+
+def test_second_start_loads_the_snapshot(service):
+    path = service()
+    assert 'build_type_tree' in startup(path)
+    assert len(snapshots()) == 1
+    phases = startup(path)
+    assert 'snapshot' in phases and 'build_type_tree' not in phases
+    assert Client(path).Echo.input_body_name == '{urn:simplesoap:test}EchoRequest'
+
+def test_changed_wsdl_is_rebuilt(service, stub):
+    path = service()
+    startup(path)
+    with open(path, 'ab') as f:
+        f.write(b'\n<!-- changed -->\n')
+    assert 'build_type_tree' in startup(path)
+    assert len(snapshots()) == 2
+
+def test_snapshots_are_private(service):
+    startup(service())
+    assert stat.S_IMODE(os.stat(Snapshot.directory).st_mode) == 0o700
+    filename = os.path.join(Snapshot.directory, snapshots()[0])
+    assert not os.stat(filename).st_mode & (stat.S_IRWXG | stat.S_IRWXO)
+
+def test_default_directory_is_per_user(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    assert Snapshot.default_directory() == str(tmp_path / 'cache' / 'simplesoap' / 'snapshots')
+    monkeypatch.delenv('XDG_CACHE_HOME')
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    assert Snapshot.default_directory() == str(tmp_path / 'home' / '.cache' / 'simplesoap' / 'snapshots')
+    assert not Snapshot.default_directory().startswith('/tmp/wsdls')
+
+def plant(key, mode=0o600, uid=None):
+    os.makedirs(Snapshot.directory, mode=0o700, exist_ok=True)
+    filename = Snapshot.filename(key)
+    with open(filename, 'wb') as f:
+        pickle.dump(Planted(), f)
+    os.chmod(filename, mode)
+    if uid is not None:
+        os.chown(filename, uid, -1)
+    return filename
+
+def test_writable_by_others_is_refused():
+    del planted[:]
+    plant('a' * 64, mode=0o666)
+    assert Snapshot.load('a' * 64) is None
+    assert planted == []
+
+@pytest.mark.skipif(not hasattr(os, 'getuid') or os.getuid() != 0, reason='needs to give the file away')
+def test_owned_by_another_user_is_refused():
+    del planted[:]
+    plant('b' * 64, uid=os.getuid() + 12345)
+    assert Snapshot.load('b' * 64) is None
+    assert planted == []
+
+def test_directory_writable_by_others_is_refused():
+    del planted[:]
+    plant('c' * 64)
+    os.chmod(Snapshot.directory, 0o777)
+    try:
+        assert Snapshot.load('c' * 64) is None
+        assert planted == []
+        # and nothing is written there either
+        Snapshot.save('d' * 64, [])
+        assert not os.path.exists(Snapshot.filename('d' * 64))
+    finally:
+        os.chmod(Snapshot.directory, 0o700)
+
+def test_an_unusable_directory_leaves_the_client_without_snapshots(service, stub, monkeypatch, tmp_path, caplog):
+    # under a file: neither root nor anyone else can make it
+    blocker = tmp_path / 'blocker'
+    blocker.write_bytes(b'')
+    monkeypatch.setattr(Snapshot, 'directory', str(blocker / 'snapshots'))
+    with caplog.at_level(logging.WARNING, logger='simplesoap.client'):
+        assert 'build_type_tree' in startup(service())
+        assert Client(service()).Echo(body={'name': 'a'}) == {'name': 'echo'}
+    assert 'could not save a snapshot' in caplog.text
+
+def test_an_unreadable_snapshot_is_rebuilt(service, caplog):
+    path = service()
+    startup(path)
+    filename = os.path.join(Snapshot.directory, snapshots()[0])
+    os.unlink(filename)
+    os.mkdir(filename)
+    with caplog.at_level(logging.WARNING, logger='simplesoap.client'):
+        assert 'build_type_tree' in startup(path)
+    assert 'could not load the snapshot' in caplog.text
+
+def test_templates_have_no_transport_of_their_own(service):
+    client = Client(service())
+    assert client._operations.templates['Echo'].transport is None
+    assert client.Echo.transport is client.transport
+    assert Snapshot.load(Snapshot.key([open(service(), 'rb').read()]))[0].transport is None
@@ -0,0 +1,88 @@
+import asyncio, tracemalloc, lxml.etree, pytest
+from simplesoap.client import Client, AsyncClient, ValidationError
+from conftest import echo
+
+# repeated numbers, and repeated entries with a required id
+ITEMS = '''
+<xs:element name="EchoRequest">
+  <xs:complexType>
+    <xs:sequence>
+      <xs:element name="num" type="xs:int" minOccurs="0" maxOccurs="unbounded"/>
+      <xs:element name="entry" minOccurs="0" maxOccurs="unbounded">
+        <xs:complexType><xs:sequence><xs:element name="id" type="xs:int"/></xs:sequence></xs:complexType>
+      </xs:element>
+    </xs:sequence>
+  </xs:complexType>
+</xs:element>
+<xs:element name="EchoResponse">
+  <xs:complexType><xs:sequence><xs:element name="name" type="xs:string" minOccurs="0"/></xs:sequence></xs:complexType>
+</xs:element>
+'''
+
+def c14n(content):
+    return lxml.etree.canonicalize(content.decode(), rewrite_prefixes=True)
+
+def test_streamed_calls_send_chunked_bodies(service, stub):
+    stub.respond = lambda request: (200, {}, echo(name='b'))
+    call = Client(service()).Echo
+    body = {'name': 'a', 'tags': ['t%d' % i for i in range(1000)]}
+    assert call(body=body, stream=True) == {'name': 'b'}
+    request = stub.requests[-1]
+    assert request.headers.get('Transfer-Encoding') == 'chunked' and 'Content-Length' not in request.headers
+    assert c14n(request.body) == c14n(call.build_envelope(body=body))
+
+def test_generators_are_written_as_they_are_consumed(service):
+    call = Client(service()).Echo
+    consumed = []
+    def tags():
+        for i in range(5000):
+            consumed.append(i)
+            yield 'tag %d' % i
+    chunks = call.serializer.stream(body={'name': 'a', 'tags': tags()}, chunk_size=4096)
+    first = next(chunks)
+    assert len(first) >= 4096 and len(consumed) < 5000
+    rest = list(chunks)
+    assert len(rest) > 10 and all(len(chunk) >= 4096 for chunk in rest[:-1])
+    assert lxml.etree.XML(first + b''.join(rest))[0][0][-1].text == 'tag 4999'
+
+def test_memory_stays_flat_while_streaming(service):
+    call = Client(service()).Echo
+    def streamed(n):
+        # (bytes sent, traced peak) for an envelope of n tags
+        tags = ('a longer tag to make the envelope big %d' % i for i in range(n))
+        tracemalloc.start()
+        try:
+            size = 0
+            for chunk in call.build_envelope(body={'name': 'a', 'tags': tags}, stream=True):
+                size += len(chunk)
+            return size, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    small, large = streamed(5000), streamed(20000)
+    assert large[0] > 3 * small[0]
+    assert large[1] < 1.5 * small[1]
+
+def test_async_streamed_calls(service, stub):
+    stub.respond = lambda request: (200, {}, echo(name='b'))
+    async def run():
+        async with AsyncClient(service()) as client:
+            return await client.Echo(body={'name': 'a', 'tags': iter(['x', 'y'])}, stream=True)
+    assert asyncio.run(run()) == {'name': 'b'}
+    assert stub.requests[-1].headers.get('Transfer-Encoding') == 'chunked'
+    assert b'>y</' in stub.requests[-1].body
+
+@pytest.mark.parametrize('way', ['envelope', 'stream', 'generated'])
+def test_generator_items_are_reported_with_their_path(service, generated, way):
+    path = service(schema=ITEMS)
+    call = generated(path).Client().Echo if way == 'generated' else Client(path).Echo
+    def build(body):
+        if way == 'stream':
+            return b''.join(call.build_envelope(body=body, stream=True))
+        return call.build_envelope(body=body)
+    for given in (list, iter):
+        with pytest.raises(ValidationError) as error:
+            build({'num': given([1, 'x'])})
+        assert error.value.errors == ["EchoRequest/num[1]: 'x' does not satisfy value must be a valid integer"]
+        with pytest.raises(ValidationError) as error:
+            build({'entry': given([{'id': 1}, {}])})
+        assert error.value.errors == ["EchoRequest/entry[1]: missing required field 'id'"]
@@ -0,0 +1,54 @@
+import threading, requests, pytest
+from simplesoap.client import Client, Transport
+from conftest import echo, later
+
+def test_operations_share_the_client_transport(service):
+    client = Client(service())
+    assert client.Echo.transport is client.transport
+    assert client.Lookup.transport is client.transport
+
+def test_given_transport_is_used(service, stub):
+    transport = Transport(pool_maxsize=2)
+    client = Client(service(), transport=transport)
+    assert client.Echo.transport is transport
+    assert client.Echo(body={'name': 'a'}) == {'name': 'echo'}
+
+def test_connections_are_kept_alive(service, stub):
+    client = Client(service())
+    for _ in range(3):
+        client.Echo(body={'name': 'a'})
+    assert len({request.client_address for request in stub.requests}) == 1
+
+def test_without_keep_alive_every_call_connects(service, stub):
+    client = Client(service(), transport=Transport(keep_alive=False))
+    for _ in range(3):
+        client.Echo(body={'name': 'a'})
+    assert len({request.client_address for request in stub.requests}) == 3
+    assert all(request.headers['Connection'] == 'close' for request in stub.requests)
+
+def test_timeout(service, stub):
+    stub.respond = later(0.5, (200, {}, echo()))
+    client = Client(service(), transport=Transport(timeout=0.1))
+    with pytest.raises(requests.Timeout):
+        client.Echo(body={'name': 'a'})
+
+def test_threads_share_the_pool_not_the_session(service, stub):
+    client = Client(service(), transport=Transport(pool_maxsize=4))
+    sessions, errors = [], []
+    def work():
+        try:
+            sessions.append(client.transport.session)
+            for _ in range(5):
+                assert client.Echo(body={'name': 'a'}) == {'name': 'echo'}
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(stub.requests) == 40
+    assert len({id(session) for session in sessions}) == 8
+    # one pool for the host, whatever the number of sessions
+    assert len(client.transport.adapter.poolmanager.pools) == 1
@@ -0,0 +1,107 @@
+import decimal, lxml.etree, pytest
+from simplesoap import client
+from simplesoap.client import Client, ValidationError, Restriction
+
+# a required name and attribute, an optional count, between one and two tags
+# and an optional size of at most 10
+SCHEMA = '''
+<xs:element name="EchoRequest">
+  <xs:complexType>
+    <xs:sequence>
+      <xs:element name="name" type="xs:string"/>
+      <xs:element name="count" type="xs:int" minOccurs="0"/>
+      <xs:element name="tags" type="xs:string" maxOccurs="2"/>
+      <xs:element name="size" minOccurs="0">
+        <xs:simpleType><xs:restriction base="xs:int"><xs:maxInclusive value="10"/></xs:restriction></xs:simpleType>
+      </xs:element>
+    </xs:sequence>
+    <xs:attribute name="lang" type="xs:string" use="required"/>
+  </xs:complexType>
+</xs:element>
+<xs:element name="EchoResponse">
+  <xs:complexType><xs:sequence><xs:element name="name" type="xs:string" minOccurs="0"/></xs:sequence></xs:complexType>
+</xs:element>
+'''
+VALID = {'@lang': 'en', 'name': 'a', 'count': 3, 'tags': ['x']}
+
+def c14n(content):
+    return lxml.etree.canonicalize(content.decode(), rewrite_prefixes=True)
+
+def body(**changes):
+    result = dict(VALID, **changes)
+    return {k: v for k, v in result.items() if v is not None}
+
+def errors(call, value):
+    return [result.error.errors if result.error else [] for result in call.validate_many([value])][0]
+
+@pytest.fixture
+def echo(service):
+    return Client(service(schema=SCHEMA)).Echo
+
+def test_valid_bodies_pass(echo):
+    assert errors(echo, VALID) == []
+    assert errors(echo, body(count=None, tags=['x', 'y'])) == []
+    assert errors(echo, body(count='5')) == []
+
+def test_missing_required_fields_fail(echo):
+    assert errors(echo, body(name=None)) == ["EchoRequest: missing required field 'name'"]
+    assert errors(echo, body(tags=None)) == ["EchoRequest: missing required field 'tags'"]
+    assert errors(echo, {'name': 'a', 'tags': ['x']}) == ["EchoRequest: missing required field '@lang'"]
+    with pytest.raises(ValidationError):
+        echo.build_envelope(body=body(name=None))
+
+def test_occurs_are_counted(echo):
+    assert errors(echo, body(tags=['x', 'y', 'z'])) == ['EchoRequest/tags: 3 given, at most 2 are allowed']
+    assert errors(echo, body(tags=[])) == ['EchoRequest/tags: 0 given, at least 1 are required']
+    # generators are counted as they are written
+    with pytest.raises(ValidationError):
+        echo.build_envelope(body=body(tags=(tag for tag in 'xyz')))
+
+def test_lexical_forms_are_checked(echo):
+    assert errors(echo, body(count='x')) == ["EchoRequest/count: 'x' does not satisfy value must be a valid integer"]
+    with pytest.raises(ValidationError):
+        echo.build_envelope(body=body(count='x'))
+
+def test_bounds_are_checked_on_parsed_values(echo, service, generated):
+    assert errors(echo, body(size=10)) == errors(echo, body(size='10')) == []
+    assert errors(echo, body(size=11)) == ["EchoRequest/size: 11 does not satisfy value <= 10"]
+    assert errors(echo, body(size='11')) == ["EchoRequest/size: '11' does not satisfy value <= 10"]
+    assert errors(echo, body(size='x')) == ["EchoRequest/size: 'x' does not satisfy value must be a valid integer"]
+    with pytest.raises(ValidationError):
+        generated(service(schema=SCHEMA)).Client().Echo.build_envelope(body=body(size='11'))
+
+def test_bounds_refuse_what_isnt_a_number():
+    validator = Restriction(maxInclusive=10).validator
+    assert validator(decimal.Decimal('9.5')) == validator('9.5') == []
+    assert validator('11') == validator('abc') == validator([1]) == ['value <= 10']
+
+def test_total_digits_count_trailing_zeros():
+    validator = Restriction(totalDigits=2).validator
+    assert validator(100) == validator(decimal.Decimal('1000')) == validator('100') == ['total digits <= 2']
+    assert validator(99) == validator(decimal.Decimal('9.9')) == validator(decimal.Decimal('0.10')) == validator(0) == []
+    assert Restriction(fractionDigits=1).validator(decimal.Decimal('1.25')) == ['fraction digits <= 1']
+
+def test_required_fields_repr_as_required(echo):
+    tree = repr(echo.input_body)
+    assert [line for line in tree.split('\n') if 'name' in line and 'REQUIRED' in line]
+    assert not [line for line in tree.split('\n') if 'count' in line and 'REQUIRED' in line]
+
+def test_stream_refuses_before_writing_invalid_chunks(echo):
+    written = []
+    with pytest.raises(ValidationError):
+        for chunk in echo.build_envelope(body=body(tags=['x', 'y', 'z']), stream=True):
+            written.append(chunk)
+    assert b'>z<' not in b''.join(written)
+    assert c14n(b''.join(echo.build_envelope(body=VALID, stream=True))) == c14n(echo.build_envelope(body=VALID))
+
+def test_generated_client_checks_alike(service, generated):
+    path = service(schema=SCHEMA)
+    call = generated(path).Client().Echo
+    for value in (body(name=None), body(tags=['x', 'y', 'z']), body(count='x')):
+        with pytest.raises(ValidationError) as error:
+            call.build_envelope(body=value)
+        assert error.value.errors == errors(Client(path).Echo, value)
+
+def test_loose_mode_skips_the_checks(echo, monkeypatch):
+    monkeypatch.setattr(client, 'STRICT_MODE', False)
+    assert echo.build_envelope(body=body(name=None, count='x', tags=['x', 'y', 'z']))
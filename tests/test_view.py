@@ -0,0 +1,47 @@
+import asyncio, collections.abc, pytest
+from simplesoap.client import Client, AsyncClient, ResultView, ResultSequence, Fault
+from conftest import echo, fault
+
+RESPONSE = echo(items=[(1, 'one'), (2, 'two'), (3, 'three')], next='n2')
+
+def test_views_read_as_the_decoded_dicts(service, stub):
+    stub.respond = lambda request: (200, {}, RESPONSE)
+    call = Client(service()).Echo
+    view = call(body={'name': 'a'}, view=True)
+    assert isinstance(view, ResultView) and isinstance(view, collections.abc.Mapping)
+    decoded = call(body={'name': 'a'})
+    assert view == decoded and view.to_dict() == decoded
+    assert list(view) == ['name', 'item', 'next']
+    items = view['item']
+    assert isinstance(items, ResultSequence) and len(items) == 3
+    assert items == [{'id': 1, 'label': 'one'}, {'id': 2, 'label': 'two'}, {'id': 3, 'label': 'three'}]
+    assert items[-1]['id'] == 3 and [item['label'] for item in items[:2]] == ['one', 'two']
+
+def test_values_are_converted_when_read_and_kept(service, stub):
+    stub.respond = lambda request: (200, {}, RESPONSE)
+    view = Client(service()).Echo(body={'name': 'a'}, view=True)
+    assert view._values == {}
+    first = view['item'][0]
+    assert view['item'][0] is first and list(view._values) == ['item']
+    assert first['id'] == 1 and type(first['id']) is int
+
+def test_views_are_read_only(service, stub):
+    stub.respond = lambda request: (200, {}, RESPONSE)
+    view = Client(service()).Echo(body={'name': 'a'}, view=True)
+    with pytest.raises(TypeError):
+        view['name'] = 'b'
+    with pytest.raises(TypeError):
+        view['item'][0] = None
+
+def test_faults_are_raised(service, stub):
+    stub.respond = lambda request: (500, {}, fault(string='refused'))
+    with pytest.raises(Fault):
+        Client(service()).Echo(body={'name': 'a'}, view=True)
+
+def test_async_views(service, stub):
+    stub.respond = lambda request: (200, {}, RESPONSE)
+    async def run():
+        async with AsyncClient(service()) as client:
+            return await client.Echo(body={'name': 'a'}, view=True)
+    view = asyncio.run(run())
+    assert isinstance(view, ResultView) and view['item'][1] == {'id': 2, 'label': 'two'}